@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
@@ -6,13 +6,39 @@ from datetime import datetime
 import os
 from config import Config
 
-app = Flask(__name__, static_folder='client_build', static_url_path='/')
+# client_build is served by serve_client below (SPA fallback, precompressed siblings), not Flask's static route
+app = Flask(__name__, static_folder=None)
 app.config.from_object(Config)
 
-# Initialize extensions
-db = SQLAlchemy(app)
+# orjson when available, ISO 8601 dates either way (see utils/json_provider.py)
+from utils.json_provider import provider_class
+app.json = provider_class(app.config['JSON_PROVIDER'])(app)
+
+# Pool size, recycle, pre-ping and timeouts for the primary and each replica (see utils/db_pool.py)
+from utils.db_pool import engine_options, init_engines
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config)
+app.config['SQLALCHEMY_BINDS'] = {
+    key: {'url': url, **engine_options(url, app.config)} for key, url in app.config['SQLALCHEMY_BINDS'].items()
+}
+
+# Initialize extensions; reads may be routed to replicas (see utils/db_routing.py)
+from utils.db_routing import RoutingSession, replica_router
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+init_engines(app, db)
 jwt = JWTManager(app)
 
+# Per-request query count, SQL time and N+1 detection; Server-Timing in debug (see utils/query_stats.py)
+from utils.query_stats import query_stats
+query_stats.init_app(app, db)
+
+# Statements slower than SLOW_QUERY_MS with their EXPLAIN plans (see utils/slow_queries.py)
+from utils.slow_queries import slow_query_log
+slow_query_log.init_app(app, db)
+
+# Request counts, latency histograms and subsystem stats for GET /api/metrics (see utils/metrics.py)
+from utils.metrics import request_metrics
+request_metrics.init_app(app)
+
 # Configure CORS to allow React frontend + localhost
 CORS(
     app,
@@ -37,6 +63,8 @@ from routes.sites import sites_bp
 from routes.routers import routers_bp
 from routes.analytics import analytics_bp
 from routes.settings import settings_bp
+from routes.activity import activity_bp
+from routes.metrics import metrics_bp
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
@@ -47,8 +75,82 @@ app.register_blueprint(sites_bp, url_prefix='/api/sites')
 app.register_blueprint(routers_bp, url_prefix='/api/routers')
 app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
 app.register_blueprint(settings_bp, url_prefix='/api/settings')
+app.register_blueprint(activity_bp, url_prefix='/api/activity')
+app.register_blueprint(metrics_bp, url_prefix='/api/metrics')
+
+# Send GET requests to a healthy read replica, if any are configured
+from utils.db_routing import sync_replicas_command
+replica_router.init_app(app, db)
+app.cli.add_command(sync_replicas_command)
+
+# gzip/brotli for JSON, CSV and other text responses (see utils/compression.py)
+from utils.compression import compressor
+compressor.init_app(app)
+
+# Manifest of client_build: in-memory lookups, strong ETags, immutable caching of hashed assets
+from utils.static_manifest import client_manifest
+client_manifest.init_app(app)
+
+# Reject non-admin API traffic while maintenance_mode is enabled
+from utils.settings_cache import enforce_maintenance_mode
+app.before_request(enforce_maintenance_mode)
+
+# Run the SLA deadline scheduler in every serving process
+from utils.sla import start_sla_scheduler
+app.before_request(start_sla_scheduler)
 
-# Serve frontend (single page app). Any non-API route will return index.html from the build.
+# Move old completed tickets to the archive tables in the background (or `flask archive-tickets`)
+from utils.archive import start_archiver, archive_command
+app.before_request(start_archiver)
+app.cli.add_command(archive_command)
+
+# Move old activity log entries into compressed monthly segment files (or `flask archive-activity`)
+from utils.activity_archive import start_activity_retention, archive_activity_command
+app.before_request(start_activity_retention)
+app.cli.add_command(archive_activity_command)
+
+# Opt-in SQLite tuning: WAL pragmas and the group-commit writer (SQLITE_WRITE_MODE=group)
+from utils.group_commit import init_write_mode
+with app.app_context():
+    init_write_mode()
+
+# Create missing tables and apply pending schema migrations (`flask schema-migrations` lists them)
+from utils.schema import upgrade_schema, schema_migrations_command
+with app.app_context():
+    upgrade_schema()
+app.cli.add_command(schema_migrations_command)
+
+# `flask generate-data`: replace the database with a synthetic dataset of any size (see utils/datagen.py)
+from utils.datagen import generate_data_command
+app.cli.add_command(generate_data_command)
+
+# Pools, background jobs and caches exported alongside the request metrics
+from utils.db_pool import pool_registry
+from utils.group_commit import group_writer
+from utils.sla import sla_scheduler
+from utils.archive import archiver
+from utils.activity_archive import activity_retention
+from utils.dedup import duplicate_index
+from utils.settings_cache import settings_cache
+from utils.clustering import tile_cache
+from utils.workload import load_index
+request_metrics.add_collector('db_pool', pool_registry.stats, label='pool')
+request_metrics.add_collector('replicas', replica_router.stats)
+request_metrics.add_collector('group_commit', group_writer.stats)
+request_metrics.add_collector('sla_scheduler', sla_scheduler.stats)
+request_metrics.add_collector('archiver', archiver.stats)
+request_metrics.add_collector('activity_retention', activity_retention.stats)
+request_metrics.add_collector('duplicate_index', duplicate_index.stats)
+request_metrics.add_collector('settings_cache', settings_cache.stats)
+request_metrics.add_collector('tile_cache', tile_cache.stats)
+request_metrics.add_collector('technician_load', load_index.snapshot, label='technician')
+request_metrics.add_collector('compression', compressor.stats)
+request_metrics.add_collector('static', client_manifest.stats)
+request_metrics.add_collector('queries', query_stats.stats, label='endpoint')
+request_metrics.add_collector('slow_queries', slow_query_log.stats)
+
+# Serve frontend (single page app) from the in-memory manifest of client_build (see utils/static_manifest.py).
+# Any non-API route without a matching file returns index.html.
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_client(path):
@@ -56,24 +158,30 @@ def serve_client(path):
     if path.startswith('api'):
         return not_found(None)
 
-    client_build_dir = os.path.join(os.path.dirname(__file__), 'client_build')
-
-    # Serve static file if it exists
-    if path != '' and os.path.exists(os.path.join(client_build_dir, path)):
-        return send_from_directory(client_build_dir, path)
-
-    # Serve index.html if it exists
-    index_file = os.path.join(client_build_dir, 'index.html')
-    if os.path.exists(index_file):
-        return send_from_directory(client_build_dir, 'index.html')
+    response = client_manifest.serve(path)
+    if response is not None:
+        return response
 
     # Fallback: return a success message if React build is missing
     return "<h1>Customer Care Backend is running ✅</h1>"
 
-# Health check endpoint
+# Health check endpoint; ?deep=1 also times a round trip to every database and reports pool state
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+    payload = {'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()}
+    if request.args.get('deep', '').lower() not in ('1', 'true'):
+        return jsonify(payload)
+
+    from utils.db_pool import pool_registry
+    databases = pool_registry.ping({key or 'primary': engine for key, engine in db.engines.items()})
+    payload['databases'] = databases
+    payload['pools'] = pool_registry.stats()
+    if not databases['primary']['ok']:
+        payload['status'] = 'unhealthy'
+        return jsonify(payload), 503
+    if not all(result['ok'] for result in databases.values()):
+        payload['status'] = 'degraded'
+    return jsonify(payload)
 
 # Error handlers
 @app.errorhandler(404)
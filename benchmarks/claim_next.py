@@ -0,0 +1,160 @@
+"""Concurrent work-queue benchmark for POST /api/tickets/next.
+
+Creates a throwaway SQLite database, fills it with pending tickets and lets N
+technicians claim concurrently through the Flask test client until the queue
+is empty. Reports double claims and tickets left pending (both must be 0;
+exits 1 otherwise) and claim latency percentiles for each quarter of the
+run, so latency drift as the queue drains is visible.
+
+    python -m benchmarks.claim_next --tickets 5000 --workers 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def setup(app, db, tickets, workers):
+    from sqlalchemy import insert
+    from models import User, Client, Ticket
+
+    now = datetime.utcnow()
+    # Password hashes are irrelevant here; tokens are minted directly
+    db.session.execute(insert(User.__table__), [
+        {'name': f'Tech {i}', 'email': f'tech{i}@bench.local', 'password_hash': '-',
+         'role': 'technician', 'status': 'active', 'created_at': now, 'updated_at': now}
+        for i in range(workers)
+    ] + [{'name': 'Agent', 'email': 'agent@bench.local', 'password_hash': '-',
+          'role': 'agent', 'status': 'active', 'created_at': now, 'updated_at': now}])
+    db.session.execute(insert(Client.__table__).values(
+        name='Bench Client', email='client@bench.local', phone='0', address='-',
+        status='active', created_at=now, updated_at=now
+    ))
+    agent_id = db.session.query(User.id).filter_by(role='agent').scalar()
+    client_id = db.session.query(Client.id).scalar()
+
+    rng = random.Random(42)
+    db.session.execute(insert(Ticket.__table__), [
+        {'title': f'Ticket {i}', 'description': '', 'status': 'pending',
+         'priority': rng.choice(['low', 'medium', 'high', 'critical']),
+         'client_id': client_id, 'created_by_id': agent_id, 'time_spent': 0,
+         'created_at': now - timedelta(seconds=rng.randint(0, 86400)), 'updated_at': now}
+        for i in range(tickets)
+    ])
+    db.session.commit()
+    return [row[0] for row in db.session.query(User.id).filter_by(role='technician').all()]
+
+
+def run(app, tech_ids):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        headers = {
+            tech_id: {'Authorization': f'Bearer {create_access_token(identity=str(tech_id))}'}
+            for tech_id in tech_ids
+        }
+
+    claims = []
+    errors = Counter()
+    contended = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(tech_ids))
+
+    def claimer(tech_id):
+        client = app.test_client()
+        local = []
+        failures = 0
+        barrier.wait()
+        while failures < 100:
+            started = time.perf_counter()
+            response = client.post('/api/tickets/next', headers=headers[tech_id])
+            elapsed = time.perf_counter() - started
+            if response.status_code == 409:
+                # Lost every race this time; the queue is not empty, so come back
+                with lock:
+                    contended[0] += 1
+                continue
+            if response.status_code != 200:
+                failures += 1
+                with lock:
+                    errors[response.get_json().get('error', str(response.status_code))] += 1
+                continue
+            ticket = response.get_json()['ticket']
+            if ticket is None:
+                break
+            local.append((started, elapsed, ticket['id'], tech_id))
+        with lock:
+            claims.extend(local)
+
+    threads = [threading.Thread(target=claimer, args=(tech_id,)) for tech_id in tech_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return claims, errors, contended[0], time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--database-url', help='Empty database to use; defaults to a temporary SQLite file')
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix='claim-bench-'), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('SLA_SCHEDULER_ENABLED', 'false')
+
+    from app import app, db
+    from models import Ticket
+
+    with app.app_context():
+        tech_ids = setup(app, db, args.tickets, args.workers)
+
+    claims, errors, contended, duration = run(app, tech_ids)
+
+    claimed_ids = Counter(ticket_id for _, _, ticket_id, _ in claims)
+    double_claims = sum(1 for count in claimed_ids.values() if count > 1)
+
+    with app.app_context():
+        owners = dict(db.session.query(Ticket.id, Ticket.assigned_tech_id).all())
+        still_pending = Ticket.query.filter_by(status='pending').count()
+    mismatched = sum(1 for _, _, ticket_id, tech_id in claims if owners.get(ticket_id) != tech_id)
+
+    print(f'{len(claims)} claims by {len(tech_ids)} technicians in {duration:.2f}s '
+          f'({len(claims) / duration:.0f} claims/s)')
+    print(f'double claims: {double_claims}  owner mismatches: {mismatched}  '
+          f'left pending: {still_pending}  contended (409): {contended}  errors: {dict(errors) or 0}')
+
+    claims.sort()
+    quarter = max(1, len(claims) // 4)
+    for index in range(0, len(claims), quarter):
+        latencies = [elapsed * 1000 for _, elapsed, _, _ in claims[index:index + quarter]]
+        print(f'  claims {index:>6}-{index + len(latencies) - 1:<6} '
+              f'p50 {percentile(latencies, 50):7.2f} ms  p95 {percentile(latencies, 95):7.2f} ms  '
+              f'p99 {percentile(latencies, 99):7.2f} ms')
+
+    return 1 if double_claims or mismatched or still_pending else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
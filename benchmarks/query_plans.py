@@ -0,0 +1,203 @@
+"""Query-plan regression check: every hot query must be answered from an index.
+
+Fills a throwaway SQLite database (through the app, so the schema comes from
+the same migrations as production), then asks SQLite for the EXPLAIN QUERY
+PLAN of each query from hot_queries() twice: before statistics exist, as on a
+fresh database, and after ANALYZE. The statements come from the same query
+builders the routes and background jobs execute, so editing a query there is
+checked too. A query fails when one of its tables is scanned (the whole table
+or a whole index) or searched through an index other than the ones listed for
+it. Exits 1 on any failure, so it can gate a change to models.py,
+utils/schema.py or the queries themselves.
+
+    python -m benchmarks.query_plans --tickets 20000 --verbose
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Allowed like an index name: a range on the rowid, as in "SEARCH t USING INTEGER PRIMARY KEY (rowid<?)"
+ROWID = 'INTEGER PRIMARY KEY'
+
+
+def setup(db, tickets, seed=1):
+    from sqlalchemy import insert
+    from models import User, Client, Ticket, TicketComment, Router, ActivityLog
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    techs = 20
+    clients = max(tickets // 40, 10)
+    db.session.execute(insert(User.__table__), [
+        {'name': f'User {i}', 'email': f'user{i}@bench.local', 'password_hash': '-',
+         'role': 'technician' if i else 'agent', 'status': 'active', 'created_at': now, 'updated_at': now}
+        for i in range(techs + 1)
+    ])
+    db.session.execute(insert(Client.__table__), [
+        {'name': f'Client {i}', 'email': f'client{i}@bench.local', 'phone': '0', 'address': '-',
+         'status': 'active', 'created_at': now, 'updated_at': now}
+        for i in range(clients)
+    ])
+
+    rows = []
+    for i in range(tickets):
+        # Two years of history, most of it completed
+        created_at = now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+        status = rng.choices(('completed', 'in-progress', 'pending'), (85, 10, 5))[0]
+        rows.append({
+            'title': f'Ticket {i}', 'description': 'Router drops the connection',
+            'priority': rng.choice(('low', 'medium', 'high', 'critical')), 'status': status,
+            'client_id': int(rng.paretovariate(1.2)) % clients + 1,
+            'assigned_tech_id': rng.randint(2, techs + 1) if status != 'pending' else None,
+            'created_by_id': 1, 'time_spent': rng.randint(0, 240),
+            'created_at': created_at, 'updated_at': created_at,
+            'completed_at': created_at + timedelta(hours=rng.randint(1, 72)) if status == 'completed' else None,
+            'due_at': created_at + timedelta(hours=24)
+        })
+    db.session.execute(insert(Ticket.__table__), rows)
+    db.session.execute(insert(TicketComment.__table__), [
+        {'ticket_id': rng.randint(1, tickets), 'user_id': rng.randint(1, techs + 1), 'comment': '-', 'created_at': now}
+        for _ in range(tickets * 2)
+    ])
+    db.session.execute(insert(Router.__table__), [
+        {'model': 'RB4011', 'serial_number': f'SN{i:08d}', 'status': 'online', 'client_id': i % clients + 1,
+         'last_seen': now, 'created_at': now, 'updated_at': now}
+        for i in range(clients * 2)
+    ])
+    db.session.execute(insert(ActivityLog.__table__), [
+        {'user_id': rng.randint(1, techs + 1), 'action': 'update', 'target_type': 'ticket',
+         'target_id': rng.randint(1, tickets), 'created_at': now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))}
+        for _ in range(tickets * 3)
+    ])
+    db.session.commit()
+
+
+def hot_queries():
+    """(name, statement, {table: indexes it may use}) from the builders the routes and background jobs run."""
+    from sqlalchemy import select
+    from sqlalchemy.orm import with_parent
+    from models import Client, Ticket, TicketComment, Router
+    from routes.analytics import (
+        created_between_query, completed_between_query, tech_completed_query, tech_time_spent_query
+    )
+    from utils.activity import activity_page_query
+    from utils.activity_archive import expired_activity_query, last_expired_id_query
+    from utils.dedup import open_tickets_query
+    from utils.serializers import TICKET
+    from utils.sla import at_risk_query, sla_compliance_query
+    from utils.work_queue import next_candidate_query
+    from utils.workload import workloads_query, open_counts_query
+
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+    month_ago = now - timedelta(days=30)
+    client = Client(id=1)
+    by_tech = ['ix_tickets_assigned_tech_id_status_completed_at']
+    # Open tickets are a small share of the table, so any status-led index is as good
+    by_status = ['ix_tickets_status_response_due_at', 'ix_tickets_status_due_at',
+                 'ix_tickets_status_priority_created_at', 'ix_tickets_status_completed_at']
+    by_deadline = ['ix_tickets_status_due_at', 'ix_tickets_status_response_due_at']
+    technician_tickets = Ticket.assigned_tech_id == 3
+
+    return [
+        ('technician ticket list', TICKET.select(technician_tickets), {'tickets': by_tech}),
+        ('technician ticket list: comments', TICKET.nested_select('comments', technician_tickets),
+         {'tickets': by_tech, 'ticket_comments': ['ix_ticket_comments_ticket_id_id']}),
+        ('dashboard: tickets today', created_between_query(today, tomorrow), {'tickets': ['ix_tickets_created_at']}),
+        ('dashboard: completed today', completed_between_query(today, tomorrow),
+         {'tickets': ['ix_tickets_completed_at', 'ix_tickets_status_completed_at']}),
+        ('dashboard: technician totals', tech_completed_query(3), {'tickets': by_tech}),
+        ('performance: completed in window', tech_completed_query(3, since=month_ago), {'tickets': by_tech}),
+        ('performance: time in window', tech_time_spent_query(3, month_ago), {'tickets': by_tech}),
+        ('workload: open tickets per technician and priority', workloads_query(), {'tickets': by_tech + by_status}),
+        ('workload: open tickets per technician', open_counts_query(), {'tickets': by_tech + by_status}),
+        ('work queue: next candidate', next_candidate_query(3), {'tickets': ['ix_tickets_status_priority_created_at']}),
+        ('sla: at risk', at_risk_query(now + timedelta(hours=1), 100), {'tickets': by_deadline}),
+        ('sla: compliance window', sla_compliance_query(month_ago, now), {'tickets': ['ix_tickets_created_at']}),
+        ('duplicates: open tickets of a client', open_tickets_query(1), {'tickets': ['ix_tickets_client_id_status']}),
+        ('client tickets', select(Ticket.id).where(with_parent(client, Client.tickets)),
+         {'tickets': ['ix_tickets_client_id_status']}),
+        ('client routers', select(Router.id).where(with_parent(client, Client.routers)),
+         {'routers': ['ix_routers_client_id']}),
+        ('activity: target history', activity_page_query(50, target_type='ticket', target_id=1),
+         {'activity_logs': ['ix_activity_logs_target_type_target_id_id']}),
+        ('activity: target type history', activity_page_query(50, target_type='ticket'),
+         {'activity_logs': ['ix_activity_logs_target_type_id']}),
+        ('activity: user history', activity_page_query(50, user_id=3),
+         {'activity_logs': ['ix_activity_logs_user_id_id']}),
+        ('activity retention: newest expired id', last_expired_id_query(now - timedelta(days=330)),
+         {'activity_logs': ['ix_activity_logs_created_at']}),
+        ('activity retention: expired batch', expired_activity_query(now - timedelta(days=330), 1000, 5000),
+         {'activity_logs': ['ix_activity_logs_created_at', ROWID]}),
+    ]
+
+
+def check(connection, statement, indexes):
+    """(ok, plan lines) for one query; every table in `indexes` must be read through one of its indexes."""
+    from utils.slow_queries import explain_plan, full_scans
+
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    parameters = tuple(compiled.params[key] for key in compiled.positiontup)
+    plan = explain_plan(connection, str(compiled), parameters)
+    scanned = full_scans(connection.dialect.name, plan)
+    ok = True
+    for table, allowed in indexes.items():
+        uses = [line for line in plan if f' {table} ' in f' {line.strip()} ']
+        ok = ok and (
+            table not in scanned
+            # SCAN walks a whole table or index; only SEARCH reads just the range asked for
+            and all(line.strip().startswith('SEARCH ') and any(
+                f'INDEX {index} ' in f'{line} ' or f'USING {index} ' in f'{line} ' for index in allowed
+            ) for line in uses)
+            and bool(uses)
+        )
+    return ok, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=20000)
+    parser.add_argument('--verbose', action='store_true', help='Print every plan, not only failures')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='query-plans-'), 'plans.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('SLA_SCHEDULER_ENABLED', 'false')
+    os.environ.setdefault('ARCHIVE_ENABLED', 'false')
+    os.environ.setdefault('ACTIVITY_RETENTION_ENABLED', 'false')
+    os.environ.setdefault('SLOW_QUERY_MS', '0')
+
+    from sqlalchemy import text
+    from app import app, db
+
+    with app.app_context():
+        setup(db, args.tickets)
+        queries = hot_queries()
+        failures = 0
+        for stage in ('no statistics', 'after ANALYZE'):
+            if stage == 'after ANALYZE':
+                with db.engine.begin() as connection:
+                    connection.execute(text('ANALYZE'))
+            print(f'-- {stage}')
+            with db.engine.connect() as connection:
+                for name, statement, indexes in queries:
+                    ok, plan = check(connection, statement, indexes)
+                    failures += not ok
+                    print(f'{"ok" if ok else "FAIL":>4}  {name}')
+                    if args.verbose or not ok:
+                        for line in plan:
+                            print(f'        {line}')
+
+    print(f'{failures} failure(s)')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
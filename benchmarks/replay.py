@@ -0,0 +1,491 @@
+"""Traffic replay: throughput, latency percentiles and SQL queries per endpoint, at several dataset sizes.
+
+For each scale (number of tickets) a dataset is built with utils/datagen.py,
+once, and cached under --datasets; every run works on a fresh copy of it.
+T threads then replay a weighted mix of what the frontend does: dashboard
+polls, technicians' ticket lists, ticket details, updates, comments, CSV
+exports and logins, as a pool of generated agents, technicians and admins.
+Requests go through the Flask test client (--target client) or to a local
+gunicorn started on the copy (--target gunicorn --workers N).
+
+SQL query counts come from the Server-Timing header (QUERY_SERVER_TIMING,
+see utils/query_stats.py), so they are measured the same way for both
+targets. Results are written as JSON; --compare prints the change in
+throughput and p95 against an earlier run.
+
+    python -m benchmarks.replay --scales 1000,10000,100000 --requests 2000 --threads 8
+    python -m benchmarks.replay --target gunicorn --workers 4 --output after.json --compare before.json
+    python -m benchmarks.replay --mix dashboard=1,export=1 --env JSON_PROVIDER=stdlib
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import re
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.claim_next import percentile
+
+DEFAULT_MIX = 'dashboard=25,ticket_list=20,ticket_detail=20,ticket_update=12,comment=12,login=3,export=1'
+
+_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+# Operations: (roles that perform it, request builder). A builder gets the
+# session ({'id', 'email', 'role', 'token'}), the dataset and a Random, and
+# returns (method, path, json body or None, send the token?).
+
+def _dashboard(session, data, rng):
+    return 'GET', '/api/analytics/dashboard', None, True
+
+
+def _ticket_list(session, data, rng):
+    # The technician's own queue: the frontend lists every ticket of the user
+    return 'GET', '/api/tickets/', None, True
+
+
+def _ticket_detail(session, data, rng):
+    return 'GET', f'/api/tickets/{rng.randint(1, data["max_ticket_id"])}', None, True
+
+
+def _ticket_update(session, data, rng):
+    ticket_id = rng.choice(data['open_tickets'][session['id']])
+    return 'PUT', f'/api/tickets/{ticket_id}', {'status': 'in-progress', 'time_spent': rng.randint(10, 240)}, True
+
+
+def _comment(session, data, rng):
+    ticket_id = rng.choice(data['open_tickets'][session['id']])
+    return 'POST', f'/api/tickets/{ticket_id}/comments', {'comment': 'Checked the line, waiting on the client.'}, True
+
+
+def _export(session, data, rng):
+    return 'GET', '/api/analytics/reports/csv?type=tickets', None, True
+
+
+def _login(session, data, rng):
+    return 'POST', '/api/auth/login', {'email': session['email'], 'password': session['password']}, False
+
+
+OPERATIONS = {
+    'dashboard': (('admin', 'agent', 'technician'), _dashboard),
+    'ticket_list': (('technician',), _ticket_list),
+    'ticket_detail': (('admin', 'agent'), _ticket_detail),
+    'ticket_update': (('technician',), _ticket_update),
+    'comment': (('technician',), _comment),
+    'export': (('admin',), _export),
+    'login': (('admin', 'agent', 'technician'), _login),
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f'unknown operation {name!r}; choose from {", ".join(OPERATIONS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# Transports: one per thread, request(method, path, body, headers) -> (status, headers, body)
+
+class TestClientTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.headers, response.get_data()
+
+
+class HttpTransport:
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+
+    def request(self, method, path, body, headers):
+        headers = dict(headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        except (ConnectionError, http.client.HTTPException):
+            # Sync workers close the connection after each response; reconnect once
+            self.connection.close()
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+        return response.status, response.headers, response.read()
+
+
+# Datasets
+
+def dataset_path(args, scale):
+    return os.path.join(args.datasets, f'tickets-{scale}-seed-{args.seed}-until-{args.until}.db')
+
+
+def generate(path, scale, seed, until):
+    # In its own process: the app binds DATABASE_URL when it is imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SLOW_QUERY_MS'] = '0'
+    from app import app
+    from utils.datagen import DataGenerator
+
+    with app.app_context():
+        DataGenerator(tickets=scale, seed=seed, until=datetime.strptime(until, '%Y-%m-%d')).run()
+
+
+def ensure_dataset(args, scale):
+    path = dataset_path(args, scale)
+    if os.path.exists(path):
+        return path
+    os.makedirs(args.datasets, exist_ok=True)
+    print(f'-- generating {scale:,} tickets into {path}')
+    temp = f'{path}.tmp'
+    for leftover in (temp, f'{temp}-wal', f'{temp}-shm'):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    process = multiprocessing.get_context('spawn').Process(target=generate, args=(temp, scale, args.seed, args.until))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise SystemExit(f'generating {scale} tickets failed')
+    os.replace(temp, path)
+    return path
+
+
+def load_sessions(path, users, seed):
+    """Accounts to replay as, with their open tickets, read straight from the SQLite file."""
+    from utils.datagen import GENERATED_PASSWORD
+    from utils.seed_data import DEFAULT_USERS
+
+    passwords = {user['email']: user['password'] for user in DEFAULT_USERS}
+    connection = sqlite3.connect(path)
+    try:
+        accounts = connection.execute(
+            "SELECT id, email, role FROM users WHERE status = 'active' ORDER BY id"
+        ).fetchall()
+        open_tickets = {}
+        for tech_id, ticket_id in connection.execute(
+            "SELECT assigned_tech_id, id FROM tickets WHERE status != 'completed' AND assigned_tech_id IS NOT NULL"
+        ):
+            open_tickets.setdefault(tech_id, []).append(ticket_id)
+        max_ticket_id = connection.execute('SELECT max(id) FROM tickets').fetchone()[0]
+    finally:
+        connection.close()
+
+    # Every role is represented; technicians without open tickets cannot update or comment
+    rng = random.Random(seed)
+    by_role = {}
+    for user_id, email, role in accounts:
+        if role != 'technician' or user_id in open_tickets:
+            by_role.setdefault(role, []).append(user_id)
+    picked = set()
+    for role, ids in by_role.items():
+        picked.update(rng.sample(ids, min(len(ids), max(1, users * {'technician': 6, 'agent': 3}.get(role, 1) // 10))))
+    sessions = [
+        {'id': user_id, 'email': email, 'role': role, 'password': passwords.get(email, GENERATED_PASSWORD)}
+        for user_id, email, role in accounts if user_id in picked
+    ]
+    return sessions, {'open_tickets': open_tickets, 'max_ticket_id': max_ticket_id}
+
+
+# Replay
+
+def replay(make_transport, sessions, data, args):
+    """Run the mix on `args.threads` threads; {operation: samples}, seconds."""
+    mix = {name: weight for name, weight in args.mix.items() if weight > 0}
+    eligible = {name: [s for s in sessions if s['role'] in OPERATIONS[name][0]] for name in mix}
+    missing = [name for name, candidates in eligible.items() if not candidates]
+    if missing:
+        raise SystemExit(f'no account can perform: {", ".join(missing)}')
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    # Log every session in once, outside the measurement
+    transport = make_transport()
+    for session in sessions:
+        status, _, body = transport.request('POST', '/api/auth/login',
+                                            {'email': session['email'], 'password': session['password']}, {})
+        if status != 200:
+            raise SystemExit(f'login as {session["email"]} failed with {status}: {body[:200]!r}')
+        session['token'] = json.loads(body)['access_token']
+
+    samples = {name: {'ms': [], 'queries': [], 'bytes': 0, 'statuses': Counter()} for name in names}
+    lock = threading.Lock()
+    remaining = [args.requests]
+    start = threading.Barrier(args.threads + 1)
+
+    def request(transport, rng):
+        name = rng.choices(names, weights)[0]
+        session = rng.choice(eligible[name])
+        method, path, body, authorized = OPERATIONS[name][1](session, data, rng)
+        headers = {'Authorization': f'Bearer {session["token"]}'} if authorized else {}
+        started = time.perf_counter()
+        status, response_headers, content = transport.request(method, path, body, headers)
+        return name, (time.perf_counter() - started) * 1000, status, response_headers, content
+
+    def run(index):
+        rng = random.Random(args.seed * 1000 + index)
+        transport = make_transport()
+        local = {name: {'ms': [], 'queries': [], 'bytes': 0, 'statuses': Counter()} for name in names}
+        for _ in range(args.warmup // args.threads):
+            request(transport, rng)
+        start.wait()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            name, elapsed_ms, status, response_headers, content = request(transport, rng)
+            sample = local[name]
+            sample['ms'].append(elapsed_ms)
+            sample['bytes'] += len(content)
+            sample['statuses'][status] += 1
+            match = _QUERIES.search(response_headers.get('Server-Timing', ''))
+            if match:
+                sample['queries'].append(int(match.group(1)))
+        with lock:
+            for name, sample in local.items():
+                total = samples[name]
+                total['ms'] += sample['ms']
+                total['queries'] += sample['queries']
+                total['bytes'] += sample['bytes']
+                total['statuses'].update(sample['statuses'])
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    # Every thread has done its warm-up requests
+    start.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, duration):
+    endpoints = {}
+    for name, sample in samples.items():
+        ms = sample['ms']
+        if not ms:
+            continue
+        queries = sample['queries']
+        errors = sum(count for status, count in sample['statuses'].items() if status >= 400)
+        endpoints[name] = {
+            'requests': len(ms),
+            'errors': errors,
+            'statuses': {str(status): count for status, count in sorted(sample['statuses'].items())},
+            'throughput_rps': round(len(ms) / duration, 2),
+            'mean_ms': round(sum(ms) / len(ms), 2),
+            'p50_ms': round(percentile(ms, 50), 2),
+            'p95_ms': round(percentile(ms, 95), 2),
+            'p99_ms': round(percentile(ms, 99), 2),
+            'max_ms': round(max(ms), 2),
+            'avg_queries': round(sum(queries) / len(queries), 2) if queries else None,
+            'max_queries': max(queries) if queries else None,
+            'avg_bytes': sample['bytes'] // len(ms),
+        }
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    return {
+        'duration_s': round(duration, 3),
+        'requests': total,
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'throughput_rps': round(total / duration, 2),
+        'endpoints': endpoints,
+    }
+
+
+def app_environment(args, path):
+    environment = {
+        'DATABASE_URL': f'sqlite:///{path}',
+        'QUERY_SERVER_TIMING': 'true',
+        # Background jobs would move the generated history around mid-run
+        'SLA_SCHEDULER_ENABLED': 'false',
+        'ARCHIVE_ENABLED': 'false',
+        'ACTIVITY_RETENTION_ENABLED': 'false',
+        'SLOW_QUERY_MS': '0',
+    }
+    environment.update(args.env)
+    return environment
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_gunicorn(path, args):
+    port = _free_port()
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '-b', f'127.0.0.1:{port}',
+               '--timeout', '300', '--log-level', 'warning', 'app:app']
+    if args.worker_threads > 1:
+        command[4:4] = ['--threads', str(args.worker_threads)]
+    output = None if args.verbose else subprocess.DEVNULL
+    server = subprocess.Popen(command, cwd=ROOT, stdout=output, stderr=output)
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None or time.time() > deadline:
+                    raise SystemExit('gunicorn did not start')
+                time.sleep(0.2)
+        sessions, data = load_sessions(path, args.users, args.seed)
+        samples, duration = replay(lambda: HttpTransport(port), sessions, data, args)
+        return summarize(samples, duration)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_target(path, args, results):
+    # In its own process, for the same reason as generate(); load_sessions needs the app imported
+    os.environ.update(app_environment(args, path))
+    from app import app
+
+    if not args.verbose:
+        # N+1 and slow-request warnings would bury the report; --verbose keeps them
+        app.logger.setLevel(logging.ERROR)
+    if args.target == 'gunicorn':
+        results.put(run_gunicorn(path, args))
+        return
+    sessions, data = load_sessions(path, args.users, args.seed)
+    samples, duration = replay(lambda: TestClientTransport(app), sessions, data, args)
+    results.put(summarize(samples, duration))
+
+
+def run_scale(args, scale):
+    dataset = ensure_dataset(args, scale)
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    path = os.path.join(workdir, 'replay.db')
+    # Updates and comments change the data; every run starts from the same state
+    shutil.copyfile(dataset, path)
+    try:
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        process = context.Process(target=run_target, args=(path, args, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise SystemExit(f'replay at {scale} tickets failed')
+        result = results.get()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result['dataset'] = {'tickets': scale, 'bytes': os.path.getsize(dataset), 'path': dataset}
+    return result
+
+
+def print_result(scale, result, previous=None):
+    print(f'-- {scale:,} tickets: {result["throughput_rps"]:.1f} req/s, {result["requests"]} requests, '
+          f'{result["errors"]} errors in {result["duration_s"]:.1f} s'
+          + (f' (req/s {_change(previous["throughput_rps"], result["throughput_rps"])} vs previous)' if previous else ''))
+    print(f'   {"endpoint":<14} {"req":>6} {"err":>4} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} '
+          f'{"queries":>8}' + ('  vs previous' if previous else ''))
+    for name, endpoint in result['endpoints'].items():
+        queries = '-' if endpoint['avg_queries'] is None else f'{endpoint["avg_queries"]:.1f}'
+        line = (f'   {name:<14} {endpoint["requests"]:>6} {endpoint["errors"]:>4} {endpoint["throughput_rps"]:>8.1f} '
+                f'{endpoint["p50_ms"]:>9.2f} {endpoint["p95_ms"]:>9.2f} {endpoint["p99_ms"]:>9.2f} {queries:>8}')
+        before = (previous or {}).get('endpoints', {}).get(name)
+        if before:
+            line += (f'  p95 {_change(before["p95_ms"], endpoint["p95_ms"])}, '
+                     f'req/s {_change(before["throughput_rps"], endpoint["throughput_rps"])}')
+        print(line)
+
+
+def _change(before, after):
+    if not before:
+        return 'n/a'
+    return f'{(after - before) / before * 100:+.0f}%'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1000,10000,100000', help='Comma-separated ticket counts')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Weighted operations (default {DEFAULT_MIX})')
+    parser.add_argument('--requests', type=int, default=2000, help='Measured requests per scale')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests before them')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent simulated users')
+    parser.add_argument('--users', type=int, default=20, help='Accounts to spread the traffic over')
+    parser.add_argument('--target', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes')
+    parser.add_argument('--worker-threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='App configuration for the run, e.g. SQLITE_WRITE_MODE=group (repeatable)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--until', default=datetime.utcnow().strftime('%Y-%m-%d'),
+                        help='End of the generated history (default: today); part of the cache key')
+    parser.add_argument('--datasets', default=os.path.join(tempfile.gettempdir(), 'customer-care-datasets'),
+                        help='Where generated datasets are cached')
+    parser.add_argument('--verbose', action='store_true', help='Show the app\'s and gunicorn\'s log output')
+    parser.add_argument('--output', default=None, help='Results file (default replay-<timestamp>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    args = parser.parse_args()
+    args.env = dict(item.split('=', 1) for item in args.env)
+    scales = [int(scale) for scale in args.scales.split(',')]
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['scales']
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'target': args.target,
+        'workers': args.workers if args.target == 'gunicorn' else None,
+        'worker_threads': args.worker_threads if args.target == 'gunicorn' else None,
+        'threads': args.threads,
+        'requests': args.requests,
+        'warmup': args.warmup,
+        'users': args.users,
+        'mix': args.mix,
+        'env': args.env,
+        'seed': args.seed,
+        'until': args.until,
+        'scales': {},
+    }
+    for scale in scales:
+        result = run_scale(args, scale)
+        report['scales'][str(scale)] = result
+        print_result(scale, result, previous.get(str(scale)))
+
+    output = args.output or f'replay-{datetime.utcnow():%Y%m%d-%H%M%S}.json'
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""List-response serialization: ORM objects + to_dict + Flask's default JSON vs precompiled serializers + orjson.
+
+Fills a throwaway SQLite database with tickets (each with a few comments and
+a client, technician and creator to join), then times building the body of
+GET /api/tickets/ both ways outside the request cycle, so only query,
+row-to-dict and encoding costs are measured. The mixed combinations show
+how much each half contributes.
+
+    python -m benchmarks.serializers --tickets 5000 --comments 3 --repeat 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def setup(db, tickets, comments):
+    from sqlalchemy import insert
+    from models import User, Client, Ticket, TicketComment
+
+    now = datetime.utcnow()
+    db.session.execute(insert(User.__table__), [
+        {'name': f'User {i}', 'email': f'user{i}@bench.local', 'password_hash': '-',
+         'role': 'technician' if i else 'agent', 'status': 'active', 'created_at': now, 'updated_at': now}
+        for i in range(20)
+    ])
+    db.session.execute(insert(Client.__table__), [
+        {'name': f'Client {i}', 'email': f'client{i}@bench.local', 'phone': '0', 'address': '-',
+         'status': 'active', 'created_at': now, 'updated_at': now}
+        for i in range(100)
+    ])
+    db.session.execute(insert(Ticket.__table__), [
+        {'title': f'Ticket {i}', 'description': 'Router drops the connection every few minutes',
+         'priority': ('low', 'medium', 'high', 'critical')[i % 4], 'status': 'in-progress',
+         'client_id': i % 100 + 1, 'assigned_tech_id': i % 19 + 2, 'created_by_id': 1, 'time_spent': i % 90,
+         'created_at': now - timedelta(minutes=i), 'updated_at': now, 'due_at': now + timedelta(hours=8)}
+        for i in range(tickets)
+    ])
+    if comments:
+        db.session.execute(insert(TicketComment.__table__), [
+            {'ticket_id': i + 1, 'user_id': j % 20 + 1, 'comment': f'Comment {j}', 'created_at': now}
+            for i in range(tickets) for j in range(comments)
+        ])
+    db.session.commit()
+
+
+def timed(app, build, encode, repeat):
+    best = None
+    for _ in range(repeat):
+        with app.app_context():
+            started = time.perf_counter()
+            body = encode({'tickets': build()})
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=3, help='Comments per ticket')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per variant; the best is reported')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix='serializers-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ.setdefault('SLA_SCHEDULER_ENABLED', 'false')
+    os.environ.setdefault('ARCHIVE_ENABLED', 'false')
+    os.environ.setdefault('ACTIVITY_RETENTION_ENABLED', 'false')
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import app, db
+    from models import Ticket
+    from utils.json_provider import provider_class, StdlibJSONProvider
+    from utils.serializers import TICKET
+
+    with app.app_context():
+        setup(db, args.tickets, args.comments)
+
+    default_json = DefaultJSONProvider(app)
+    stdlib_json = StdlibJSONProvider(app)
+    fast_json = provider_class('auto')(app)
+
+    def to_dict():
+        return [ticket.to_dict() for ticket in Ticket.query.order_by(Ticket.id).all()]
+
+    variants = [
+        ('to_dict + Flask default JSON', to_dict, default_json.dumps),
+        (f'to_dict + {type(fast_json).__name__}', to_dict, fast_json.dumps),
+        ('serializer + StdlibJSONProvider', TICKET.all, stdlib_json.dumps),
+        (f'serializer + {type(fast_json).__name__}', TICKET.all, fast_json.dumps),
+    ]
+
+    print(f'{args.tickets} tickets x {args.comments} comments, best of {args.repeat}')
+    baseline = None
+    for name, build, encode in variants:
+        elapsed, size = timed(app, build, encode, args.repeat)
+        baseline = baseline or elapsed
+        print(f'{name:>36}: {elapsed * 1000:9.1f} ms  {baseline / elapsed:5.1f}x  ({size / 1024:.0f} KiB)')
+
+
+if __name__ == '__main__':
+    main()
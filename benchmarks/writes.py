@@ -0,0 +1,144 @@
+"""Concurrent write throughput, default SQLite write path vs SQLITE_WRITE_MODE=group.
+
+Each mode gets a fresh SQLite file. N processes (standing in for gunicorn
+workers) x T threads hammer PUT /api/routers/<id>/status, a typical write
+route: one row update plus an activity log entry. Reports writes/s, latency
+percentiles and failed requests ("database is locked" and friends).
+
+    python -m benchmarks.writes --processes 4 --threads 8 --requests 200
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.claim_next import percentile
+
+
+def setup(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    from datetime import datetime
+    from sqlalchemy import insert
+    from app import app, db
+    from models import User, Client, Router
+
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(insert(User.__table__).values(
+            name='Bench Agent', email='agent@bench.local', password_hash='-',
+            role='agent', status='active', created_at=now, updated_at=now
+        ))
+        db.session.execute(insert(Client.__table__).values(
+            name='Bench Client', email='client@bench.local', phone='0', address='-',
+            status='active', created_at=now, updated_at=now
+        ))
+        db.session.execute(insert(Router.__table__), [
+            {'model': 'Bench', 'serial_number': f'BENCH-{i}', 'status': 'online', 'client_id': 1,
+             'created_at': now, 'updated_at': now, 'last_seen': now}
+            for i in range(64)
+        ])
+        db.session.commit()
+
+
+def worker(database_url, mode, threads, requests, start, results):
+    import threading
+
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_WRITE_MODE'] = mode
+    from flask_jwt_extended import create_access_token
+    from app import app
+
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+    latencies = []
+    errors = Counter()
+    lock = threading.Lock()
+
+    def run(thread_index):
+        client = app.test_client()
+        local = []
+        for i in range(requests):
+            router_id = (os.getpid() + thread_index * 7 + i) % 64 + 1
+            started = time.perf_counter()
+            response = client.put(f'/api/routers/{router_id}/status', headers=headers,
+                                  json={'status': 'online' if i % 2 else 'maintenance'})
+            local.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                with lock:
+                    errors[(response.get_json() or {}).get('error', str(response.status_code))[:60]] += 1
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=run, args=(index,)) for index in range(threads)]
+    start.wait()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((latencies, dict(errors)))
+
+
+def run_mode(mode, args):
+    path = os.path.join(tempfile.mkdtemp(prefix='writes-bench-'), 'bench.db')
+    database_url = f'sqlite:///{path}'
+
+    context = multiprocessing.get_context('spawn')
+    setup_process = context.Process(target=setup, args=(database_url,))
+    setup_process.start()
+    setup_process.join()
+
+    start = context.Event()
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(database_url, mode, args.threads, args.requests, start, results))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # Let every worker import the app before the clock starts
+    time.sleep(args.warmup)
+    started = time.perf_counter()
+    start.set()
+
+    latencies, errors = [], Counter()
+    for _ in processes:
+        worker_latencies, worker_errors = results.get()
+        latencies.extend(worker_latencies)
+        errors.update(worker_errors)
+    duration = time.perf_counter() - started
+    for process in processes:
+        process.join()
+
+    ok = len(latencies) - sum(errors.values())
+    ms = [latency * 1000 for latency in latencies]
+    print(f'{mode:>8}: {ok / duration:8.1f} writes/s  ({ok} ok, {sum(errors.values())} failed in {duration:.2f}s)  '
+          f'p50 {percentile(ms, 50):6.2f} ms  p95 {percentile(ms, 95):6.2f} ms  p99 {percentile(ms, 99):7.2f} ms')
+    for error, count in errors.most_common(3):
+        print(f'          {count} x {error}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per thread')
+    parser.add_argument('--modes', default='default,group')
+    parser.add_argument('--warmup', type=float, default=5.0, help='Seconds to let workers import the app')
+    args = parser.parse_args()
+
+    os.environ.setdefault('SLA_SCHEDULER_ENABLED', 'false')
+    os.environ.setdefault('ARCHIVE_ENABLED', 'false')
+    os.environ.setdefault('ACTIVITY_RETENTION_ENABLED', 'false')
+
+    for mode in args.modes.split(','):
+        run_mode(mode, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,3 +9,102 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
     JWT_ALGORITHM = 'HS256'
     FRONTEND_URL = os.environ.get('FRONTEND_URL') or 'http://localhost:3000'
+    
+    # Map clustering
+    CLUSTER_TILE_CACHE_SIZE = int(os.environ.get('CLUSTER_TILE_CACHE_SIZE', 2048))
+    CLUSTER_TILE_MAX_AGE = int(os.environ.get('CLUSTER_TILE_MAX_AGE', 30))
+    
+    # SQLite write path: 'default', or 'group' for WAL pragmas plus a group-commit writer
+    # that batches short write units (activity log entries) from concurrent requests
+    SQLITE_WRITE_MODE = os.environ.get('SQLITE_WRITE_MODE', 'default')
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('GROUP_COMMIT_MAX_DELAY_MS', 2))
+    
+    # System settings snapshot: seconds between version checks per worker
+    SETTINGS_REVALIDATE_SECONDS = float(os.environ.get('SETTINGS_REVALIDATE_SECONDS', 2))
+    
+    # Technician auto-assignment: seconds between load index rebuilds from the DB
+    WORKLOAD_RECONCILE_SECONDS = float(os.environ.get('WORKLOAD_RECONCILE_SECONDS', 60))
+    
+    # SLA scheduler
+    SLA_SCHEDULER_ENABLED = os.environ.get('SLA_SCHEDULER_ENABLED', 'true').lower() == 'true'
+    SLA_HORIZON_SECONDS = int(os.environ.get('SLA_HORIZON_SECONDS', 3600))
+    SLA_RELOAD_SECONDS = int(os.environ.get('SLA_RELOAD_SECONDS', 60))
+    
+    # Near-duplicate ticket detection: estimated Jaccard similarity to report a match,
+    # seconds before a client's index is rebuilt, and max client indexes kept per worker
+    DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', 0.5))
+    DUPLICATE_INDEX_TTL_SECONDS = int(os.environ.get('DUPLICATE_INDEX_TTL_SECONDS', 300))
+    DUPLICATE_INDEX_MAX_CLIENTS = int(os.environ.get('DUPLICATE_INDEX_MAX_CLIENTS', 5000))
+    
+    # Archival of completed tickets into tickets_archive / ticket_comments_archive.
+    # Off by default: archived tickets drop out of GET /api/tickets unless include_archived=true
+    ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', 'false').lower() == 'true'
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 180))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_INTERVAL_SECONDS = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', 3600))
+    
+    # Activity log retention: older entries move to gzip NDJSON segments (default: instance/activity_archive).
+    # Off by default: it removes rows from the database, so point ACTIVITY_ARCHIVE_DIR at durable storage first
+    ACTIVITY_RETENTION_ENABLED = os.environ.get('ACTIVITY_RETENTION_ENABLED', 'false').lower() == 'true'
+    ACTIVITY_RETENTION_DAYS = int(os.environ.get('ACTIVITY_RETENTION_DAYS', 90))
+    ACTIVITY_RETENTION_BATCH_SIZE = int(os.environ.get('ACTIVITY_RETENTION_BATCH_SIZE', 5000))
+    ACTIVITY_RETENTION_INTERVAL_SECONDS = int(os.environ.get('ACTIVITY_RETENTION_INTERVAL_SECONDS', 3600))
+    ACTIVITY_ARCHIVE_DIR = os.environ.get('ACTIVITY_ARCHIVE_DIR')
+    
+    # Read replicas: comma-separated URLs; GET requests read from a healthy replica
+    # unless the user wrote within REPLICA_STICKY_SECONDS
+    SQLALCHEMY_REPLICA_URIS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {f'replica_{index}': url for index, url in enumerate(SQLALCHEMY_REPLICA_URIS)}
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+    REPLICA_HEALTH_INTERVAL = int(os.environ.get('REPLICA_HEALTH_INTERVAL', 10))
+    
+    # Connection pools (applied to the primary and every replica; see utils/db_pool.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # 0 disables; PostgreSQL statement_timeout, enforced with a progress handler on SQLite
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+    # Extra pragmas for every SQLite connection, e.g. "foreign_keys=ON,cache_size=-16000"
+    SQLITE_PRAGMAS = os.environ.get('SQLITE_PRAGMAS', '')
+    
+    # JSON responses: auto (orjson when installed), orjson or stdlib
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+    
+    # Response compression: gzip, or brotli when installed (see utils/compression.py)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_MIMETYPES = [m.strip() for m in os.environ.get('COMPRESS_MIMETYPES', '').split(',') if m.strip()]
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+    
+    # client_build manifest: files up to this size are kept in memory; >0 re-scans for changes that often
+    STATIC_MEMORY_MAX_BYTES = int(os.environ.get('STATIC_MEMORY_MAX_BYTES', 256 * 1024))
+    STATIC_MANIFEST_RELOAD_SECONDS = float(os.environ.get('STATIC_MANIFEST_RELOAD_SECONDS', 0))
+    
+    # Seconds clients may reuse reference data (settings) before revalidating with their ETag
+    REFERENCE_MAX_AGE = int(os.environ.get('REFERENCE_MAX_AGE', 30))
+    
+    # Per-request query instrumentation (see utils/query_stats.py); Server-Timing defaults to debug mode
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    _timing = os.environ.get('QUERY_SERVER_TIMING')
+    QUERY_SERVER_TIMING = None if _timing is None else _timing.lower() == 'true'
+    QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_N_PLUS_ONE_THRESHOLD', 5))
+    QUERY_SLOWEST_PER_REQUEST = int(os.environ.get('QUERY_SLOWEST_PER_REQUEST', 3))
+    QUERY_LOG_MIN_QUERIES = int(os.environ.get('QUERY_LOG_MIN_QUERIES', 50))
+    
+    # Slow-query log: statements at or above SLOW_QUERY_MS (0 disables) are kept, newest
+    # SLOW_QUERY_BUFFER_SIZE of them, with an EXPLAIN taken in the background
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+    SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', 200))
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+    
+    # Prometheus metrics at /api/metrics (see utils/metrics.py). Under gunicorn set a shared, writable
+    # directory so every worker's counts are merged; a bearer token lets scrapers in without a JWT
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR') or os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
@@ -59,6 +59,24 @@ class Client(db.Model):
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # SLA at-risk lookups (see utils/sla.py)
+        db.Index('ix_tickets_status_due_at', 'status', 'due_at'),
+        db.Index('ix_tickets_status_response_due_at', 'status', 'response_due_at'),
+        # Work queue heads (see utils/work_queue.py)
+        db.Index('ix_tickets_status_priority_created_at', 'status', 'priority', 'created_at'),
+        # Archival candidates (see utils/archive.py)
+        db.Index('ix_tickets_status_completed_at', 'status', 'completed_at'),
+        # Technician lists, workloads and performance windows
+        db.Index('ix_tickets_assigned_tech_id_status_completed_at', 'assigned_tech_id', 'status', 'completed_at'),
+        # A client's tickets and its open tickets (duplicate detection)
+        db.Index('ix_tickets_client_id_status', 'client_id', 'status'),
+        # Date windows: today's tickets and completions, SLA compliance
+        db.Index('ix_tickets_created_at', 'created_at'),
+        db.Index('ix_tickets_completed_at', 'completed_at'),
+        # Archived tickets keep their ids, so SQLite must never hand one out again
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -73,6 +91,17 @@ class Ticket(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     
+    # SLA deadlines, precomputed from the priority's policy
+    response_due_at = db.Column(db.DateTime, nullable=True)
+    due_at = db.Column(db.DateTime, nullable=True)
+    first_response_at = db.Column(db.DateTime, nullable=True)
+    sla_state = db.Column(db.String(20), nullable=True)  # ok, warning, breached
+    sla_breached_at = db.Column(db.DateTime, nullable=True)
+    
+    # Set when the ticket was linked to an earlier near-duplicate (see utils/dedup.py);
+    # not a foreign key because the original may since have moved to tickets_archive
+    duplicate_of_id = db.Column(db.Integer, nullable=True)
+    
     # Relationships
     comments = db.relationship('TicketComment', backref='ticket', lazy=True, cascade='all, delete-orphan')
     
@@ -93,11 +122,22 @@ class Ticket(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'response_due_at': self.response_due_at.isoformat() if self.response_due_at else None,
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'first_response_at': self.first_response_at.isoformat() if self.first_response_at else None,
+            'sla_state': self.sla_state,
+            'sla_breached_at': self.sla_breached_at.isoformat() if self.sla_breached_at else None,
+            'duplicate_of_id': self.duplicate_of_id,
             'comments': [comment.to_dict() for comment in self.comments]
         }
 
 class TicketComment(db.Model):
     __tablename__ = 'ticket_comments'
+    __table_args__ = (
+        # Comments of a ticket in order (serializers, conditional GET validators)
+        db.Index('ix_ticket_comments_ticket_id_id', 'ticket_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
@@ -120,6 +160,10 @@ class TicketComment(db.Model):
 
 class Router(db.Model):
     __tablename__ = 'routers'
+    __table_args__ = (
+        # A client's routers
+        db.Index('ix_routers_client_id', 'client_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     model = db.Column(db.String(100), nullable=False)
@@ -147,6 +191,10 @@ class Router(db.Model):
 
 class Site(db.Model):
     __tablename__ = 'sites'
+    __table_args__ = (
+        # Fallback spatial index for databases without an R*Tree (see utils/spatial.py)
+        db.Index('ix_sites_latitude_longitude', 'latitude', 'longitude'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -177,6 +225,15 @@ class Site(db.Model):
 
 class ActivityLog(db.Model):
     __tablename__ = 'activity_logs'
+    __table_args__ = (
+        # Keyset-paginated history per entity / per user, newest first (see utils/activity.py)
+        db.Index('ix_activity_logs_target_type_target_id_id', 'target_type', 'target_id', 'id'),
+        db.Index('ix_activity_logs_target_type_id', 'target_type', 'id'),
+        db.Index('ix_activity_logs_user_id_id', 'user_id', 'id'),
+        db.Index('ix_activity_logs_created_at', 'created_at'),
+        # Retention skips ids already in the segment files, so an id must never come back
+        {'sqlite_autoincrement': True},
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -223,3 +280,131 @@ class SystemSettings(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+class SiteCluster(db.Model):
+    __tablename__ = 'site_clusters'
+    
+    # Aggregated sites per map grid cell; maintained by utils/clustering.py
+    zoom = db.Column(db.Integer, primary_key=True)
+    cell_x = db.Column(db.Integer, primary_key=True)
+    cell_y = db.Column(db.Integer, primary_key=True)
+    site_type = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    site_count = db.Column(db.Integer, nullable=False, default=0)
+    lat_sum = db.Column(db.Float, nullable=False, default=0)
+    lng_sum = db.Column(db.Float, nullable=False, default=0)
+
+class SiteTileVersion(db.Model):
+    __tablename__ = 'site_tile_versions'
+    
+    # Site edits per map tile at TILE_VERSION_ZOOM; validates cached cluster tiles (see utils/clustering.py)
+    tile_x = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    tile_y = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    
+    # Monotonic counters shared by all workers to validate in-process caches
+    key = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    
+    # Versions from utils/schema.py MIGRATIONS applied to this database
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ArchivedTicket(db.Model):
+    __tablename__ = 'tickets_archive'
+    
+    # Completed tickets moved out of the hot table by utils/archive.py; ids are preserved
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(200), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    priority = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=False, index=True)
+    assigned_tech_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    time_spent = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    response_due_at = db.Column(db.DateTime, nullable=True)
+    due_at = db.Column(db.DateTime, nullable=True)
+    first_response_at = db.Column(db.DateTime, nullable=True)
+    sla_state = db.Column(db.String(20), nullable=True)
+    sla_breached_at = db.Column(db.DateTime, nullable=True)
+    duplicate_of_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    client = db.relationship('Client')
+    assigned_technician = db.relationship('User', foreign_keys=[assigned_tech_id])
+    creator = db.relationship('User', foreign_keys=[created_by_id])
+    comments = db.relationship('ArchivedTicketComment', lazy=True, order_by='ArchivedTicketComment.id')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'priority': self.priority,
+            'status': self.status,
+            'client_id': self.client_id,
+            'client_name': self.client.name if self.client else None,
+            'assigned_tech_id': self.assigned_tech_id,
+            'assigned_tech_name': self.assigned_technician.name if self.assigned_technician else None,
+            'created_by_id': self.created_by_id,
+            'created_by_name': self.creator.name if self.creator else None,
+            'time_spent': self.time_spent,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'response_due_at': self.response_due_at.isoformat() if self.response_due_at else None,
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'first_response_at': self.first_response_at.isoformat() if self.first_response_at else None,
+            'sla_state': self.sla_state,
+            'sla_breached_at': self.sla_breached_at.isoformat() if self.sla_breached_at else None,
+            'duplicate_of_id': self.duplicate_of_id,
+            'archived': True,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+            'comments': [comment.to_dict() for comment in self.comments]
+        }
+
+class ArchivedTicketComment(db.Model):
+    __tablename__ = 'ticket_comments_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ticket_id = db.Column(db.Integer, db.ForeignKey('tickets_archive.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    comment = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=True)
+    
+    # Relationships
+    user = db.relationship('User')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'ticket_id': self.ticket_id,
+            'user_id': self.user_id,
+            'user_name': self.user.name if self.user else None,
+            'comment': self.comment,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class TicketRollup(db.Model):
+    __tablename__ = 'ticket_rollups'
+    
+    # Archived tickets aggregated by completion day, so analytics never scan tickets_archive.
+    # tech_id is 0 for tickets that were never assigned.
+    day = db.Column(db.Date, primary_key=True)
+    tech_id = db.Column(db.Integer, primary_key=True)
+    priority = db.Column(db.String(20), primary_key=True)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    time_spent_sum = db.Column(db.Integer, nullable=False, default=0)
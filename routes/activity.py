@@ -0,0 +1,99 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User
+from utils.activity import activity_page, MAX_PAGE_SIZE
+from utils.activity_archive import segment_store
+from datetime import datetime
+
+activity_bp = Blueprint('activity', __name__)
+
+def optional_int_arg(name):
+    """Integer query parameter or None when absent; malformed values raise ValueError."""
+    value = request.args.get(name)
+    return int(value) if value is not None else None
+
+@activity_bp.route('/', methods=['GET'])
+@jwt_required()
+def get_activity():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        try:
+            limit = int(request.args.get('limit', 50))
+            before = optional_int_arg('before')
+            target_id = optional_int_arg('target_id')
+            filter_user_id = optional_int_arg('user_id')
+        except ValueError:
+            return jsonify({'error': 'limit, before, target_id and user_id must be integers'}), 400
+        
+        if not (0 < limit <= MAX_PAGE_SIZE):
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+        
+        target_type = request.args.get('target_type')
+        if target_id is not None and not target_type:
+            return jsonify({'error': 'target_id requires target_type'}), 400
+        
+        # Technicians only see their own activity
+        if user.role == 'technician':
+            if filter_user_id not in (None, user_id):
+                return jsonify({'error': 'Insufficient permissions'}), 403
+            filter_user_id = user_id
+        
+        entries, next_before = activity_page(
+            limit,
+            before=before,
+            target_type=target_type,
+            target_id=target_id,
+            user_id=filter_user_id
+        )
+        
+        return jsonify({'activities': entries, 'next_before': next_before}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@activity_bp.route('/archive', methods=['GET'])
+@jwt_required()
+def get_archived_activity():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or user.role not in ['admin', 'agent']:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        try:
+            limit = int(request.args.get('limit', 50))
+            before = optional_int_arg('before')
+            target_id = optional_int_arg('target_id')
+            filter_user_id = optional_int_arg('user_id')
+            start = datetime.fromisoformat(request.args['start']) if request.args.get('start') else None
+            end = datetime.fromisoformat(request.args['end']) if request.args.get('end') else None
+        except ValueError:
+            return jsonify({'error': 'start and end must be ISO dates; limit, before, target_id and user_id integers'}), 400
+        
+        if not (0 < limit <= MAX_PAGE_SIZE):
+            return jsonify({'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'}), 400
+        
+        target_type = request.args.get('target_type')
+        if target_id is not None and not target_type:
+            return jsonify({'error': 'target_id requires target_type'}), 400
+        
+        entries, next_before = segment_store.query(
+            limit,
+            start=start,
+            end=end,
+            target_type=target_type,
+            target_id=target_id,
+            user_id=filter_user_id,
+            before=before
+        )
+        
+        return jsonify({'activities': entries, 'next_before': next_before}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
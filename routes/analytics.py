@@ -1,14 +1,38 @@
 from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Ticket, User, Client, Router, Site, ActivityLog
+from models import Ticket, User, Client, Router, Site, ArchivedTicket
 from app import db
+from utils.sla import sla_compliance, sla_scheduler
+from utils.archive import archived_totals_by_priority, archived_totals_by_tech
+from utils.activity import activity_page
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import select, func
 import csv
+import itertools
 import io
 
 analytics_bp = Blueprint('analytics', __name__)
 
+# Statements for the per-request queries below; benchmarks/query_plans.py checks these
+# same builders, so a change that stops them using an index fails the check.
+# Date windows are half-open ranges on the raw columns so they can use their indexes.
+
+def created_between_query(start, end):
+    return select(func.count(Ticket.id)).where(Ticket.created_at >= start, Ticket.created_at < end)
+
+def completed_between_query(start, end):
+    return select(func.count(Ticket.id)).where(Ticket.completed_at >= start, Ticket.completed_at < end)
+
+def tech_completed_query(tech_id, since=None):
+    """Count and time spent of a technician's completed tickets, optionally those completed since a date."""
+    criteria = [Ticket.assigned_tech_id == tech_id, Ticket.status == 'completed']
+    if since is not None:
+        criteria.append(Ticket.completed_at >= since)
+    return select(func.count(Ticket.id), func.sum(Ticket.time_spent)).where(*criteria)
+
+def tech_time_spent_query(tech_id, since):
+    return select(func.sum(Ticket.time_spent)).where(Ticket.assigned_tech_id == tech_id, Ticket.completed_at >= since)
+
 @analytics_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
 def get_dashboard_analytics():
@@ -16,8 +40,12 @@ def get_dashboard_analytics():
         user_id = int(get_jwt_identity())
         user = User.query.get(user_id)
         
+        # Archived tickets are counted from the rollups, never scanned
+        archived_by_priority = archived_totals_by_priority()
+        archived_total = sum(archived_by_priority.values())
+        
         # Basic counts
-        total_tickets = Ticket.query.count()
+        total_tickets = Ticket.query.count() + archived_total
         total_clients = Client.query.count()
         total_routers = Router.query.count()
         total_sites = Site.query.count()
@@ -27,48 +55,47 @@ def get_dashboard_analytics():
             Ticket.status,
             func.count(Ticket.id).label('count')
         ).group_by(Ticket.status).all()
+        ticket_status = dict(ticket_status)
+        if archived_total:
+            ticket_status['completed'] = ticket_status.get('completed', 0) + archived_total
         
         # Ticket priority breakdown
-        ticket_priority = db.session.query(
+        ticket_priority = dict(db.session.query(
             Ticket.priority,
             func.count(Ticket.id).label('count')
-        ).group_by(Ticket.priority).all()
+        ).group_by(Ticket.priority).all())
+        for priority, count in archived_by_priority.items():
+            ticket_priority[priority] = ticket_priority.get(priority, 0) + count
         
-        # Recent activity
-        recent_activities = ActivityLog.query.order_by(
-            ActivityLog.created_at.desc()
-        ).limit(10).all()
+        # Recent activity: top-N on the primary key, names joined in the same query
+        recent_activities, _ = activity_page(10)
         
         # Today's tickets
-        today = datetime.utcnow().date()
-        todays_tickets = Ticket.query.filter(
-            func.date(Ticket.created_at) == today
-        ).count()
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = today + timedelta(days=1)
+        todays_tickets = db.session.execute(created_between_query(today, tomorrow)).scalar()
         
         # Completed tickets today
-        completed_today = Ticket.query.filter(
-            func.date(Ticket.completed_at) == today
-        ).count()
+        completed_today = db.session.execute(completed_between_query(today, tomorrow)).scalar()
         
         # Technician performance (for admin/agent view)
         tech_performance = []
         if user.role in ['admin', 'agent']:
+            archived_by_tech = archived_totals_by_tech()
             technicians = User.query.filter_by(role='technician', status='active').all()
             for tech in technicians:
-                completed_tickets = Ticket.query.filter_by(
-                    assigned_tech_id=tech.id,
-                    status='completed'
-                ).count()
+                completed_tickets, time_spent = db.session.execute(tech_completed_query(tech.id)).one()
                 
-                avg_time = db.session.query(
-                    func.avg(Ticket.time_spent)
-                ).filter_by(assigned_tech_id=tech.id, status='completed').scalar()
+                archived_count, archived_time = archived_by_tech.get(tech.id, (0, 0))
+                completed_tickets += archived_count
+                total_time = (time_spent or 0) + archived_time
+                avg_time = total_time / completed_tickets if completed_tickets else 0
                 
                 tech_performance.append({
                     'id': tech.id,
                     'name': tech.name,
                     'completed_tickets': completed_tickets,
-                    'avg_time_spent': round(avg_time or 0, 2)
+                    'avg_time_spent': round(avg_time, 2)
                 })
         
         return jsonify({
@@ -80,9 +107,9 @@ def get_dashboard_analytics():
                 'todays_tickets': todays_tickets,
                 'completed_today': completed_today
             },
-            'ticket_status': [{'status': status, 'count': count} for status, count in ticket_status],
-            'ticket_priority': [{'priority': priority, 'count': count} for priority, count in ticket_priority],
-            'recent_activities': [activity.to_dict() for activity in recent_activities],
+            'ticket_status': [{'status': status, 'count': count} for status, count in ticket_status.items()],
+            'ticket_priority': [{'priority': priority, 'count': count} for priority, count in ticket_priority.items()],
+            'recent_activities': recent_activities,
             'tech_performance': tech_performance
         }), 200
         
@@ -109,8 +136,9 @@ def export_csv():
             # Export tickets
             writer.writerow(['ID', 'Title', 'Client', 'Priority', 'Status', 'Assigned Tech', 'Created At', 'Completed At', 'Time Spent (min)'])
             
-            tickets = Ticket.query.all()
-            for ticket in tickets:
+            # Archived tickets first (they are the oldest), then the hot table
+            archived = ArchivedTicket.query.order_by(ArchivedTicket.id).yield_per(500)
+            for ticket in itertools.chain(archived, Ticket.query.order_by(Ticket.id).all()):
                 writer.writerow([
                     ticket.id,
                     ticket.title,
@@ -181,40 +209,31 @@ def get_performance_metrics():
         days = int(request.args.get('days', 30))
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Technician performance metrics
+        # Technician performance metrics; archived tickets come from the daily rollups
+        archived_by_tech = archived_totals_by_tech(since=start_date)
         technicians = User.query.filter_by(role='technician', status='active').all()
         performance_data = []
         
         for tech in technicians:
-            # Tickets completed in period
-            completed_tickets = Ticket.query.filter(
-                Ticket.assigned_tech_id == tech.id,
-                Ticket.status == 'completed',
-                Ticket.completed_at >= start_date
-            ).count()
-            
-            # Average resolution time
-            avg_time = db.session.query(
-                func.avg(Ticket.time_spent)
-            ).filter(
-                Ticket.assigned_tech_id == tech.id,
-                Ticket.status == 'completed',
-                Ticket.completed_at >= start_date
-            ).scalar()
+            # Tickets completed in period and their resolution time
+            completed_tickets, completed_time = db.session.execute(
+                tech_completed_query(tech.id, since=start_date)
+            ).one()
             
             # Total time spent
-            total_time = db.session.query(
-                func.sum(Ticket.time_spent)
-            ).filter(
-                Ticket.assigned_tech_id == tech.id,
-                Ticket.completed_at >= start_date
-            ).scalar()
+            total_time = db.session.execute(tech_time_spent_query(tech.id, start_date)).scalar()
+            
+            archived_count, archived_time = archived_by_tech.get(tech.id, (0, 0))
+            completed_tickets += archived_count
+            total_time = (total_time or 0) + archived_time
+            completed_time = (completed_time or 0) + archived_time
+            avg_time = completed_time / completed_tickets if completed_tickets else 0
             
             performance_data.append({
                 'id': tech.id,
                 'name': tech.name,
                 'completed_tickets': completed_tickets,
-                'avg_resolution_time': round(avg_time or 0, 2),
+                'avg_resolution_time': round(avg_time, 2),
                 'total_time_spent': total_time or 0,
                 'efficiency': round((completed_tickets / max(total_time or 1, 1)) * 100, 2)
             })
@@ -222,4 +241,26 @@ def get_performance_metrics():
         return jsonify({'performance_data': performance_data}), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@analytics_bp.route('/sla', methods=['GET'])
+@jwt_required()
+def get_sla_metrics():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if user.role not in ['admin', 'agent']:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        days = int(request.args.get('days', 30))
+        start_date = datetime.utcnow() - timedelta(days=days)
+        
+        return jsonify({
+            'compliance': sla_compliance(start_date),
+            'recent_events': list(sla_scheduler.events)[-50:],
+            'scheduler': sla_scheduler.stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
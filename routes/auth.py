@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import check_password_hash, generate_password_hash
-from models import User, ActivityLog
+from models import User
 from app import db
+from utils.activity import log_activity
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -28,14 +29,12 @@ def login():
         access_token = create_access_token(identity=str(user.id))
 
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user.id,
             action='User logged in',
             target_type='user',
             target_id=user.id
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({
             'access_token': access_token,
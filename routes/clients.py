@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Client, User, ActivityLog
+from models import Client, User, ActivityLog, ArchivedTicket
 from app import db
+from utils.activity import log_activity
+from utils.serializers import CLIENT
+from utils.conditional import client_validators
+from datetime import datetime
 
 clients_bp = Blueprint('clients', __name__)
 
@@ -9,8 +13,12 @@ clients_bp = Blueprint('clients', __name__)
 @jwt_required()
 def get_clients():
     try:
-        clients = Client.query.all()
-        return jsonify({'clients': [client.to_dict() for client in clients]}), 200
+        try:
+            fieldset = CLIENT.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'clients': CLIENT.all(**fieldset)}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -42,15 +50,13 @@ def create_client():
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Created client',
             target_type='client',
             target_id=client.id,
             details=f'Created client: {client.name}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'client': client.to_dict()}), 201
         
@@ -61,12 +67,24 @@ def create_client():
 @jwt_required()
 def get_client(client_id):
     try:
-        client = Client.query.get(client_id)
+        try:
+            fieldset = CLIENT.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not client:
+        validators = client_validators(client_id)
+        if validators is None:
             return jsonify({'error': 'Client not found'}), 404
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return not_modified
         
-        return jsonify({'client': client.to_dict()}), 200
+        client = CLIENT.one(client_id, **fieldset)
+        
+        if client is None:
+            return jsonify({'error': 'Client not found'}), 404
+        
+        return validators.apply(jsonify({'client': client}))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -105,15 +123,13 @@ def update_client(client_id):
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Updated client',
             target_type='client',
             target_id=client.id,
             details=f'Updated client: {client.name}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'client': client.to_dict()}), 200
         
@@ -135,8 +151,8 @@ def delete_client(client_id):
         if not client:
             return jsonify({'error': 'Client not found'}), 404
         
-        # Check if client has active tickets
-        if client.tickets:
+        # Check if client has active tickets (archived ones still reference the client)
+        if client.tickets or ArchivedTicket.query.filter_by(client_id=client.id).first():
             return jsonify({'error': 'Cannot delete client with active tickets'}), 400
         
         # Log activity before deletion
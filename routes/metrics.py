@@ -0,0 +1,88 @@
+import hmac
+from flask import Blueprint, jsonify, request, current_app, Response
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from models import User
+from utils.db_pool import pool_registry
+from utils.db_routing import replica_router
+from utils.query_stats import query_stats
+from utils.slow_queries import slow_query_log
+from utils.metrics import request_metrics, CONTENT_TYPE
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    """Prometheus text format; admins with a JWT, or scrapers sending `Bearer <METRICS_TOKEN>`."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if not (token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')):
+        verify_jwt_in_request()
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Insufficient permissions'}), 403
+
+    if not request_metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+
+    try:
+        return Response(request_metrics.render(), content_type=CONTENT_TYPE)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@metrics_bp.route('/pool', methods=['GET'])
+@jwt_required()
+def get_pool_metrics():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        return jsonify({
+            'pools': pool_registry.stats(),
+            'routing': replica_router.stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@metrics_bp.route('/queries', methods=['GET'])
+@jwt_required()
+def get_query_metrics():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        return jsonify({'endpoints': query_stats.stats()}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@metrics_bp.route('/slow-queries', methods=['GET'])
+@jwt_required()
+def get_slow_queries():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or user.role != 'admin':
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        try:
+            limit = int(request.args['limit']) if 'limit' in request.args else None
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        
+        return jsonify({
+            'stats': slow_query_log.stats(),
+            'queries': slow_query_log.recent(limit)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
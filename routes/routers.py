@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Router, User, Client, ActivityLog
 from app import db
+from utils.activity import log_activity
+from utils.serializers import ROUTER
 from datetime import datetime
 
 routers_bp = Blueprint('routers', __name__)
@@ -10,8 +12,31 @@ routers_bp = Blueprint('routers', __name__)
 @jwt_required()
 def get_routers():
     try:
-        routers = Router.query.all()
-        return jsonify({'routers': [router.to_dict() for router in routers]}), 200
+        try:
+            fieldset = ROUTER.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'routers': ROUTER.all(**fieldset)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@routers_bp.route('/<int:router_id>', methods=['GET'])
+@jwt_required()
+def get_router(router_id):
+    try:
+        try:
+            fieldset = ROUTER.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        router = ROUTER.one(router_id, **fieldset)
+        
+        if router is None:
+            return jsonify({'error': 'Router not found'}), 404
+        
+        return jsonify({'router': router}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -48,15 +73,13 @@ def create_router():
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Created router',
             target_type='router',
             target_id=router.id,
             details=f'Created router: {router.model} ({router.serial_number})'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'router': router.to_dict()}), 201
         
@@ -102,15 +125,13 @@ def update_router(router_id):
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Updated router',
             target_type='router',
             target_id=router.id,
             details=f'Updated router: {router.model} ({router.serial_number})'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'router': router.to_dict()}), 200
         
@@ -172,15 +193,13 @@ def update_router_status(router_id):
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Updated router status',
             target_type='router',
             target_id=router.id,
             details=f'Changed router status to {status}: {router.model}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'router': router.to_dict()}), 200
         
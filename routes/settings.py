@@ -1,7 +1,10 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import SystemSettings, User, ActivityLog
+from models import SystemSettings, User
 from app import db
+from utils.activity import log_activity
+from utils.settings_cache import upsert_settings
+from utils.conditional import settings_validators
 from datetime import datetime
 
 settings_bp = Blueprint('settings', __name__)
@@ -16,8 +19,13 @@ def get_settings():
         if user.role != 'admin':
             return jsonify({'error': 'Insufficient permissions'}), 403
 
+        validators = settings_validators()
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return not_modified
+
         settings = SystemSettings.query.all()
-        return jsonify({'settings': [setting.to_dict() for setting in settings]}), 200
+        return validators.apply(jsonify({'settings': [setting.to_dict() for setting in settings]}))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -37,39 +45,19 @@ def update_settings():
         if not data or not isinstance(data, dict):
             return jsonify({'error': 'Invalid data format'}), 400
 
-        updated_settings = []
-
-        for key, value in data.items():
-            # Find existing setting or create new one
-            setting = SystemSettings.query.filter_by(key=key).first()
-
-            if setting:
-                old_value = setting.value
-                setting.value = str(value)
-                setting.updated_at = datetime.utcnow()
-            else:
-                setting = SystemSettings(
-                    key=key,
-                    value=str(value),
-                    description=get_setting_description(key),
-                    category=get_setting_category(key)
-                )
-                db.session.add(setting)
-
-            updated_settings.append(setting)
+        # One SELECT for all keys; bumps the shared settings version for every worker
+        updated_settings = upsert_settings(data, get_setting_description, get_setting_category)
 
         db.session.commit()
 
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Updated system settings',
             target_type='system',
             target_id=0,
             details=f'Updated {len(updated_settings)} settings'
         )
-        db.session.add(activity)
-        db.session.commit()
 
         return jsonify({
             'message': 'Settings updated successfully',
@@ -90,12 +78,17 @@ def get_setting(key):
         if user.role != 'admin':
             return jsonify({'error': 'Insufficient permissions'}), 403
 
+        validators = settings_validators()
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return not_modified
+
         setting = SystemSettings.query.filter_by(key=key).first()
 
         if not setting:
             return jsonify({'error': 'Setting not found'}), 404
 
-        return jsonify({'setting': setting.to_dict()}), 200
+        return validators.apply(jsonify({'setting': setting.to_dict()}))
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -109,7 +102,9 @@ def get_setting_description(key):
         'max_file_size': 'Maximum file upload size in MB',
         'session_timeout': 'Session timeout in minutes',
         'backup_frequency': 'Database backup frequency (daily, weekly, monthly)',
-        'email_notifications': 'Enable email notifications for important events'
+        'email_notifications': 'Enable email notifications for important events',
+        'sla_policies': 'Response and resolution targets in minutes per ticket priority (JSON)',
+        'sla_warning_percent': 'Percentage of an SLA window after which a ticket is at risk'
     }
     return descriptions.get(key, f'Setting for {key}')
 
@@ -122,6 +117,8 @@ def get_setting_category(key):
         'max_file_size': 'uploads',
         'session_timeout': 'security',
         'backup_frequency': 'maintenance',
-        'email_notifications': 'notifications'
+        'email_notifications': 'notifications',
+        'sla_policies': 'sla',
+        'sla_warning_percent': 'sla'
     }
     return categories.get(key, 'general')
@@ -1,17 +1,130 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, make_response, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Site, User, ActivityLog
 from app import db
+from utils.activity import log_activity
+from utils.spatial import parse_bbox, bbox_filter, nearby_sites
+from utils.serializers import SITE
+from utils.clustering import parse_tile, render_tile
+from utils.settings_cache import get_settings, current_user_role
+from utils.geo_io import iter_site_records, import_sites, iter_site_features, iter_feature_collection
 from datetime import datetime
 
 sites_bp = Blueprint('sites', __name__)
 
+MAX_NEARBY_RADIUS_KM = 500
+MAX_NEARBY_LIMIT = 500
+
+@sites_bp.before_request
+def enforce_tech_site_add():
+    # Technicians may only add sites while enable_tech_site_add is on
+    if request.endpoint not in ['sites.create_site', 'sites.import_sites_file']:
+        return None
+    if get_settings()['enable_tech_site_add']:
+        return None
+    if current_user_role() == 'technician':
+        return jsonify({'error': 'Site creation by technicians is disabled'}), 403
+    return None
+
 @sites_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_sites():
     try:
-        sites = Site.query.all()
-        return jsonify({'sites': [site.to_dict() for site in sites]}), 200
+        bbox = request.args.get('bbox')
+        
+        try:
+            fieldset = SITE.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if bbox:
+            try:
+                criteria = [bbox_filter(*parse_bbox(bbox))]
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        else:
+            criteria = []
+        
+        return jsonify({'sites': SITE.all(*criteria, **fieldset)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sites_bp.route('/<int:site_id>', methods=['GET'])
+@jwt_required()
+def get_site(site_id):
+    try:
+        try:
+            fieldset = SITE.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        site = SITE.one(site_id, **fieldset)
+        
+        if site is None:
+            return jsonify({'error': 'Site not found'}), 404
+        
+        return jsonify({'site': site}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sites_bp.route('/nearby', methods=['GET'])
+@jwt_required()
+def get_nearby_sites():
+    try:
+        try:
+            lat = float(request.args['lat'])
+            lng = float(request.args['lng'])
+            radius_km = float(request.args.get('radius_km', 10))
+            limit = int(request.args.get('limit', 20))
+        except KeyError:
+            return jsonify({'error': 'lat and lng are required'}), 400
+        except ValueError:
+            return jsonify({'error': 'lat, lng, radius_km and limit must be numeric'}), 400
+        
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({'error': 'Coordinates out of range'}), 400
+        if not (0 < radius_km <= MAX_NEARBY_RADIUS_KM):
+            return jsonify({'error': f'radius_km must be between 0 and {MAX_NEARBY_RADIUS_KM}'}), 400
+        if not (0 < limit <= MAX_NEARBY_LIMIT):
+            return jsonify({'error': f'limit must be between 1 and {MAX_NEARBY_LIMIT}'}), 400
+        
+        results = []
+        for site, distance in nearby_sites(lat, lng, radius_km, limit):
+            site_data = site.to_dict()
+            site_data['distance_km'] = round(distance, 3)
+            results.append(site_data)
+        
+        return jsonify({'sites': results}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@sites_bp.route('/clusters', methods=['GET'])
+@jwt_required()
+def get_site_clusters():
+    try:
+        try:
+            z, x, y = parse_tile(request.args['z'], request.args['x'], request.args['y'])
+        except KeyError:
+            return jsonify({'error': 'z, x and y are required'}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        etag, body = render_tile(z, x, y, current_app.json.dumps)
+        
+        # Weak comparison: compression weakens the ETag on the way out
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(body)
+            response.mimetype = 'application/json'
+        
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['CLUSTER_TILE_MAX_AGE']
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -47,21 +160,79 @@ def create_site():
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Created site',
             target_type='site',
             target_id=site.id,
             details=f'Created site: {site.name}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'site': site.to_dict()}), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@sites_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_sites_file():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if user.role not in ['admin', 'technician']:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        # Multipart uploads are spooled to disk by Werkzeug; raw bodies are read from the socket
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        filename = (upload.filename or '') if upload else ''
+        
+        file_format = request.args.get('format')
+        if not file_format:
+            content_type = (upload.mimetype if upload else request.mimetype) or ''
+            if filename.lower().endswith('.csv') or content_type in ['text/csv', 'application/csv']:
+                file_format = 'csv'
+            elif filename.lower().endswith(('.geojson', '.json')) or content_type in ['application/geo+json', 'application/json']:
+                file_format = 'geojson'
+        
+        if file_format not in ['csv', 'geojson']:
+            return jsonify({'error': 'Unsupported format, expected csv or geojson'}), 400
+        
+        summary = import_sites(iter_site_records(stream, file_format))
+        
+        # Log activity
+        log_activity(
+            user_id=user_id,
+            action='Imported sites',
+            target_type='site',
+            target_id=0,
+            details=f"Imported {summary['imported']} sites ({summary['failed']} failed) from {file_format}"
+        )
+        
+        if summary.get('error') and summary['imported'] == 0:
+            return jsonify(summary), 400
+        
+        return jsonify(summary), 200 if summary['failed'] == 0 and not summary.get('error') else 207
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@sites_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_sites_geojson():
+    try:
+        dumps = current_app.json.dumps
+        body = iter_feature_collection(iter_site_features(), dumps)
+        
+        response = Response(stream_with_context(body), mimetype='application/geo+json')
+        response.headers['Content-Disposition'] = f'attachment; filename=sites_{datetime.now().strftime("%Y%m%d")}.geojson'
+        return response
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @sites_bp.route('/<int:site_id>', methods=['PUT'])
 @jwt_required()
 def update_site(site_id):
@@ -101,15 +272,13 @@ def update_site(site_id):
         db.session.commit()
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Updated site',
             target_type='site',
             target_id=site.id,
             details=f'Updated site: {site.name}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'site': site.to_dict()}), 200
         
@@ -1,7 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Ticket, User, Client, TicketComment, ActivityLog
+from models import Ticket, User, Client, TicketComment, ActivityLog, ArchivedTicket
 from app import db
+from utils.activity import log_activity
+from utils.workload import load_index, track_ticket_change
+from utils.sla import compute_deadlines, record_response, sla_scheduler, at_risk_tickets
+from utils.work_queue import claim_next_ticket, ClaimContended
+from utils.dedup import duplicate_index, ticket_signature
+from utils.serializers import TICKET, ARCHIVED_TICKET, ARCHIVED_ONLY_FIELDS
+from utils.conditional import ticket_validators
 from datetime import datetime
 
 tickets_bp = Blueprint('tickets', __name__)
@@ -16,13 +23,26 @@ def get_tickets():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+        try:
+            fieldset = TICKET.fieldset(request.args, ARCHIVED_ONLY_FIELDS if include_archived else ())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Filter tickets based on user role
         if user.role == 'technician':
-            tickets = Ticket.query.filter_by(assigned_tech_id=user_id).all()
+            tickets = TICKET.all(Ticket.assigned_tech_id == user_id, **fieldset)
         else:
-            tickets = Ticket.query.all()
+            tickets = TICKET.all(**fieldset)
+        
+        # Archived (long-completed) tickets are only listed on request
+        if include_archived:
+            if user.role == 'technician':
+                tickets += ARCHIVED_TICKET.all(ArchivedTicket.assigned_tech_id == user_id, **fieldset)
+            else:
+                tickets += ARCHIVED_TICKET.all(**fieldset)
         
-        return jsonify({'tickets': [ticket.to_dict() for ticket in tickets]}), 200
+        return jsonify({'tickets': tickets}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -37,6 +57,32 @@ def create_ticket():
         required_fields = ['title', 'client_id']
         if not all(field in data for field in required_fields):
             return jsonify({'error': 'Missing required fields'}), 400
+
+        # The duplicate index is keyed by the integer id; "7" and 7 must hit the same entry
+        try:
+            data['client_id'] = int(data['client_id'])
+        except (TypeError, ValueError):
+            return jsonify({'error': 'client_id must be an integer'}), 400
+
+        duplicate_action = data.get('duplicate_action')
+        if duplicate_action not in (None, 'link', 'merge'):
+            return jsonify({'error': 'duplicate_action must be link or merge'}), 400
+        
+        # Near-duplicates among the client's open tickets, best match first
+        signature = ticket_signature(data['title'], data.get('description', ''))
+        duplicates = duplicate_index.find(data['client_id'], data['title'], data.get('description', ''), signature=signature)
+        
+        if duplicate_action == 'merge' and duplicates:
+            merged = merge_into_duplicate(user_id, data, duplicates)
+            if merged is not None:
+                return merged
+        
+        # Opt-in: pick the least-loaded active technician when none is given
+        assigned_tech_id = data.get('assigned_tech_id')
+        auto_assigned = False
+        if assigned_tech_id is None and data.get('auto_assign'):
+            assigned_tech_id = load_index.acquire()
+            auto_assigned = assigned_tech_id is not None
         
         ticket = Ticket(
             title=data['title'],
@@ -44,39 +90,166 @@ def create_ticket():
             priority=data.get('priority', 'medium'),
             status=data.get('status', 'pending'),
             client_id=data['client_id'],
-            assigned_tech_id=data.get('assigned_tech_id'),
+            assigned_tech_id=assigned_tech_id,
             created_by_id=user_id
         )
+        if duplicate_action == 'link' and duplicates:
+            ticket.duplicate_of_id = duplicates[0]['id']
+        compute_deadlines(ticket)
         
         db.session.add(ticket)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if auto_assigned:
+                load_index.released(assigned_tech_id)
+            raise
+        
+        if not auto_assigned:
+            track_ticket_change(None, None, ticket.assigned_tech_id, ticket.status)
+        sla_scheduler.schedule(ticket)
+        duplicate_index.track(ticket, signature)
         
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Created ticket',
             target_type='ticket',
             target_id=ticket.id,
             details=f'Created ticket: {ticket.title}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
-        return jsonify({'ticket': ticket.to_dict()}), 201
+        return jsonify({'ticket': ticket.to_dict(), 'possible_duplicates': duplicates}), 201
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def merge_into_duplicate(user_id, data, duplicates):
+    """Record a duplicate report as a comment on the best matching open ticket."""
+    ticket = Ticket.query.get(duplicates[0]['id'])
+    if not ticket or ticket.status not in ('pending', 'in-progress'):
+        # Stale index entry (closed by another worker); create the ticket normally
+        duplicate_index.forget(data['client_id'], duplicates.pop(0)['id'])
+        return None
+    
+    report = data['title']
+    if data.get('description'):
+        report += f"\n\n{data['description']}"
+    comment = TicketComment(
+        ticket_id=ticket.id,
+        user_id=user_id,
+        comment=f'Duplicate report merged: {report}'
+    )
+    db.session.add(comment)
+    db.session.commit()
+    
+    log_activity(
+        user_id=user_id,
+        action='Merged duplicate ticket',
+        target_type='ticket',
+        target_id=ticket.id,
+        details=f'Merged duplicate report into ticket: {ticket.title}'
+    )
+    
+    return jsonify({'ticket': ticket.to_dict(), 'merged_into': ticket.id, 'possible_duplicates': duplicates}), 200
+
+@tickets_bp.route('/at-risk', methods=['GET'])
+@jwt_required()
+def get_at_risk_tickets():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        try:
+            within_minutes = int(request.args.get('within_minutes', 60))
+            limit = min(int(request.args.get('limit', 100)), 500)
+        except ValueError:
+            return jsonify({'error': 'within_minutes and limit must be integers'}), 400
+        
+        # Technicians only see their own tickets
+        tech_id = user_id if user.role == 'technician' else None
+        results, now = at_risk_tickets(within_minutes, limit, tech_id)
+        
+        tickets = []
+        for ticket, deadline in results:
+            ticket_data = ticket.to_dict()
+            ticket_data['next_deadline'] = deadline.isoformat()
+            ticket_data['minutes_remaining'] = round((deadline - now).total_seconds() / 60, 1)
+            tickets.append(ticket_data)
+        
+        return jsonify({'tickets': tickets}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@tickets_bp.route('/next', methods=['POST'])
+@jwt_required()
+def claim_next():
+    try:
+        user_id = int(get_jwt_identity())
+        user = User.query.get(user_id)
+        
+        if not user or user.role != 'technician':
+            return jsonify({'error': 'Only technicians can claim tickets'}), 403
+        
+        try:
+            ticket, previous_tech_id = claim_next_ticket(user_id)
+        except ClaimContended:
+            # Pending tickets exist but other technicians kept winning them
+            response = jsonify({'error': 'Too many concurrent claims, try again'})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        
+        if not ticket:
+            return jsonify({'ticket': None, 'message': 'No pending tickets'}), 200
+        
+        track_ticket_change(previous_tech_id, 'pending', ticket.assigned_tech_id, ticket.status)
+        sla_scheduler.schedule(ticket)
+        
+        # Log activity
+        log_activity(
+            user_id=user_id,
+            action='Claimed ticket',
+            target_type='ticket',
+            target_id=ticket.id,
+            details=f'Claimed ticket: {ticket.title}'
+        )
+        
+        return jsonify({'ticket': ticket.to_dict()}), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @tickets_bp.route('/<int:ticket_id>', methods=['GET'])
 @jwt_required()
 def get_ticket(ticket_id):
     try:
-        ticket = Ticket.query.get(ticket_id)
+        try:
+            fieldset = TICKET.fieldset(request.args, ARCHIVED_ONLY_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not ticket:
+        # Answer If-None-Match / If-Modified-Since before building the body
+        validators = ticket_validators(ticket_id)
+        if validators is None:
             return jsonify({'error': 'Ticket not found'}), 404
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return not_modified
         
-        return jsonify({'ticket': ticket.to_dict()}), 200
+        ticket = TICKET.one(ticket_id, **fieldset)
+        if ticket is None:
+            ticket = ARCHIVED_TICKET.one(ticket_id, **fieldset)
+        
+        if ticket is None:
+            return jsonify({'error': 'Ticket not found'}), 404
+        
+        return validators.apply(jsonify({'ticket': ticket}))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -97,16 +270,21 @@ def update_ticket(ticket_id):
             return jsonify({'error': 'You can only update your assigned tickets'}), 403
 
         data = request.get_json()
+        old_tech_id, old_status = ticket.assigned_tech_id, ticket.status
+        text_changed = 'title' in data or 'description' in data
         
         # Update fields
         if 'title' in data:
             ticket.title = data['title']
         if 'description' in data:
             ticket.description = data['description']
-        if 'priority' in data:
+        if 'priority' in data and data['priority'] != ticket.priority:
             ticket.priority = data['priority']
+            compute_deadlines(ticket)
         if 'status' in data:
             ticket.status = data['status']
+            if data['status'] != 'pending':
+                record_response(ticket)
             if data['status'] == 'completed':
                 ticket.completed_at = datetime.utcnow()
         if 'assigned_tech_id' in data:
@@ -117,16 +295,19 @@ def update_ticket(ticket_id):
         ticket.updated_at = datetime.utcnow()
         db.session.commit()
         
+        track_ticket_change(old_tech_id, old_status, ticket.assigned_tech_id, ticket.status)
+        sla_scheduler.schedule(ticket)
+        if text_changed or ticket.status != old_status:
+            duplicate_index.track(ticket)
+        
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Updated ticket',
             target_type='ticket',
             target_id=ticket.id,
             details=f'Updated ticket: {ticket.title}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'ticket': ticket.to_dict()}), 200
         
@@ -158,9 +339,14 @@ def delete_ticket(ticket_id):
         )
         db.session.add(activity)
         
+        old_tech_id, old_status, client_id = ticket.assigned_tech_id, ticket.status, ticket.client_id
         db.session.delete(ticket)
         db.session.commit()
         
+        track_ticket_change(old_tech_id, old_status, None, None)
+        sla_scheduler.forget(ticket_id)
+        duplicate_index.forget(client_id, ticket_id)
+        
         return jsonify({'message': 'Ticket deleted successfully'}), 200
         
     except Exception as e:
@@ -186,9 +372,14 @@ def add_comment(ticket_id):
             comment=data['comment']
         )
         
+        # The first comment counts as the SLA response
+        record_response(ticket)
+        
         db.session.add(comment)
         db.session.commit()
         
+        sla_scheduler.schedule(ticket)
+        
         return jsonify({'comment': comment.to_dict()}), 201
         
     except Exception as e:
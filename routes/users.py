@@ -3,6 +3,10 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash
 from models import User, ActivityLog
 from app import db
+from utils.activity import log_activity
+from utils.serializers import USER
+from utils.conditional import technicians_validators
+from utils.workload import technician_workloads, empty_workload, age_seconds, load_index
 from datetime import datetime
 
 users_bp = Blueprint('users', __name__)
@@ -17,8 +21,41 @@ def get_users():
         if user.role != 'admin':
             return jsonify({'error': 'Insufficient permissions'}), 403
         
-        users = User.query.all()
-        return jsonify({'users': [user.to_dict() for user in users]}), 200
+        try:
+            fieldset = USER.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({'users': USER.all(**fieldset)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/<int:user_id>', methods=['GET'])
+@jwt_required()
+def get_user(user_id):
+    try:
+        current_user_id = int(get_jwt_identity())
+        current_user = User.query.get(current_user_id)
+        
+        if not current_user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        # Everyone may look themselves up; only admins may look up others
+        if current_user.role != 'admin' and current_user_id != user_id:
+            return jsonify({'error': 'Insufficient permissions'}), 403
+        
+        try:
+            fieldset = USER.fieldset(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        user = USER.one(user_id, **fieldset)
+        
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        
+        return jsonify({'user': user}), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -54,16 +91,17 @@ def create_user():
         db.session.add(user)
         db.session.commit()
         
+        if user.role == 'technician':
+            load_index.invalidate()
+        
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=user_id,
             action='Created user',
             target_type='user',
             target_id=user.id,
             details=f'Created user: {user.name} ({user.role})'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'user': user.to_dict()}), 201
         
@@ -108,16 +146,17 @@ def update_user(user_id):
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
+        # Role or status changes can add/remove a technician from auto-assignment
+        load_index.invalidate()
+        
         # Log activity
-        activity = ActivityLog(
+        log_activity(
             user_id=current_user_id,
             action='Updated user',
             target_type='user',
             target_id=user.id,
             details=f'Updated user: {user.name}'
         )
-        db.session.add(activity)
-        db.session.commit()
         
         return jsonify({'user': user.to_dict()}), 200
         
@@ -155,6 +194,8 @@ def delete_user(user_id):
         db.session.delete(user)
         db.session.commit()
         
+        load_index.invalidate()
+        
         return jsonify({'message': 'User deleted successfully'}), 200
         
     except Exception as e:
@@ -164,8 +205,25 @@ def delete_user(user_id):
 @jwt_required()
 def get_technicians():
     try:
-        technicians = User.query.filter_by(role='technician', status='active').all()
-        return jsonify({'technicians': [tech.to_dict() for tech in technicians]}), 200
+        validators = technicians_validators()
+        not_modified = validators.not_modified()
+        if not_modified is not None:
+            return not_modified
+        
+        technicians = USER.all(User.role == 'technician', User.status == 'active')
+        workloads = technician_workloads()
+        now = datetime.utcnow()
+        
+        results = []
+        for tech_data in technicians:
+            workload = workloads.get(tech_data['id']) or empty_workload()
+            tech_data['open_tickets'] = workload['open_tickets']
+            tech_data['open_by_priority'] = workload['by_priority']
+            tech_data['oldest_open_at'] = workload['oldest_open_at'].isoformat() if workload['oldest_open_at'] else None
+            tech_data['oldest_open_age_seconds'] = age_seconds(workload['oldest_open_at'], now)
+            results.append(tech_data)
+        
+        return validators.apply(jsonify({'technicians': results}))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,32 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before it is imported
+_db_dir = tempfile.mkdtemp(prefix='customer-care-tests-')
+os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(_db_dir, "test.db")}'
+os.environ.setdefault('SLA_SCHEDULER_ENABLED', 'false')
+os.environ.setdefault('ARCHIVE_ENABLED', 'false')
+os.environ.setdefault('ACTIVITY_RETENTION_ENABLED', 'false')
+
+from app import app as flask_app  # noqa: E402
+from utils.seed_data import seed_database  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    seed_database()
+    with flask_app.app_context():
+        yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def agent_headers(client):
+    response = client.post('/api/auth/login', json={'email': 'sarah.johnson@company.com', 'password': 'agent123'})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/api/activity/', '/api/activity/archive'])
+@pytest.mark.parametrize('name', ['before', 'target_id', 'user_id'])
+def test_malformed_integer_params_are_rejected(client, agent_headers, path, name):
+    response = client.get(f'{path}?target_type=ticket&{name}=abc', headers=agent_headers)
+    assert response.status_code == 400
+
+
+def test_pages_follow_next_before(client, agent_headers):
+    for title in ('Line down', 'Slow uplink', 'Router reboot'):
+        client.post('/api/tickets/', json={'title': title, 'client_id': 1}, headers=agent_headers)
+    first = client.get('/api/activity/?limit=2', headers=agent_headers).get_json()
+    second = client.get(f"/api/activity/?limit=2&before={first['next_before']}", headers=agent_headers).get_json()
+    assert second['activities']
+    assert max(entry['id'] for entry in second['activities']) < min(entry['id'] for entry in first['activities'])
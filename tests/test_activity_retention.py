@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from models import ActivityLog
+from utils.activity import log_activity
+from utils.activity_archive import ActivitySegmentStore, ActivityRetention
+from utils.schema import use_autoincrement
+
+
+def _old_entry(details, id=None):
+    entry = ActivityLog(id=id, user_id=1, action='updated', target_type='ticket', target_id=1,
+                        details=details, created_at=datetime.utcnow() - timedelta(days=400))
+    db.session.add(entry)
+    db.session.commit()
+    return entry.id
+
+
+def _retention(tmp_path):
+    return ActivityRetention(ActivitySegmentStore(str(tmp_path)), 90, 100, 3600)
+
+
+def _archived_details(retention):
+    entries, _ = retention.store.query(1000, target_type='ticket', target_id=1)
+    return {entry['details'] for entry in entries}
+
+
+def test_new_entry_after_archiving_highest_id(app, tmp_path):
+    retention = _retention(tmp_path)
+    archived_id = _old_entry('first')
+    assert retention.run_once() >= 1
+    assert db.session.get(ActivityLog, archived_id) is None
+
+    assert log_activity(1, 'created', 'ticket', 1) > archived_id
+
+
+def test_reused_id_is_archived_before_delete(app, tmp_path):
+    retention = _retention(tmp_path)
+    archived_id = _old_entry('first')
+    retention.run_once()
+
+    # As in a database from before activity_logs used AUTOINCREMENT
+    _old_entry('second', id=archived_id)
+    assert retention.run_once() == 1
+
+    assert db.session.get(ActivityLog, archived_id) is None
+    assert {'first', 'second'} <= _archived_details(retention)
+
+
+def test_migration_starts_sequence_above_segment_files(app, tmp_path):
+    retention = _retention(tmp_path)
+    archived_id = _old_entry('first')
+    retention.run_once()
+    db.session.execute(text("DELETE FROM sqlite_sequence WHERE name = 'activity_logs'"))
+    db.session.commit()
+
+    with db.engine.begin() as connection:
+        use_autoincrement(connection, ActivityLog.__table__, archived_id=retention.store.high_water_mark())
+
+    assert log_activity(1, 'created', 'ticket', 1) > archived_id
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import db
+from models import Ticket, TicketComment, ArchivedTicket
+from utils.archive import archive_completed_tickets
+from utils.schema import use_autoincrement
+
+
+def _archive_newest_ticket():
+    ticket = Ticket.query.order_by(Ticket.id.desc()).first()
+    ticket.status = 'completed'
+    ticket.completed_at = datetime.utcnow() - timedelta(days=365)
+    db.session.add(TicketComment(ticket_id=ticket.id, user_id=ticket.created_by_id, comment='Done'))
+    db.session.commit()
+    ticket_id = ticket.id
+    assert archive_completed_tickets(180) >= 1
+    assert db.session.get(ArchivedTicket, ticket_id) is not None
+    return ticket_id
+
+
+def test_new_ticket_after_archiving_highest_id(client, agent_headers):
+    archived_id = _archive_newest_ticket()
+
+    response = client.post('/api/tickets/', json={'title': 'Line down', 'client_id': 1}, headers=agent_headers)
+    assert response.status_code == 201
+    assert response.get_json()['ticket']['id'] > archived_id
+
+    # The archived ticket is still the one served under its id
+    response = client.get(f'/api/tickets/{archived_id}', headers=agent_headers)
+    assert response.get_json()['ticket']['status'] == 'completed'
+
+    # And archiving the new ticket does not collide with it
+    _archive_newest_ticket()
+
+
+def test_migration_starts_sequence_above_archived_ids(app):
+    archived_id = _archive_newest_ticket()
+    # As in a database created before tickets used AUTOINCREMENT
+    db.session.execute(text("DELETE FROM sqlite_sequence WHERE name = 'tickets'"))
+    db.session.commit()
+
+    with db.engine.begin() as connection:
+        use_autoincrement(connection, Ticket.__table__, ArchivedTicket.__table__)
+
+    ticket = Ticket(title='Line down', client_id=1, created_by_id=1)
+    db.session.add(ticket)
+    db.session.commit()
+    assert ticket.id > archived_id
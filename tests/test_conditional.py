@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from app import db
+from models import Ticket, User
+
+
+def test_new_comment_refreshes_last_modified(client, agent_headers):
+    ticket = Ticket.query.order_by(Ticket.id).first()
+    # Every stamp the ticket response depends on is well in the past
+    past = datetime.utcnow() - timedelta(days=1)
+    ticket.updated_at = past
+    for user in User.query.all():
+        user.updated_at = past
+    ticket.client.updated_at = past
+    db.session.commit()
+
+    url = f'/api/tickets/{ticket.id}'
+    last_modified = client.get(url, headers=agent_headers).headers['Last-Modified']
+    assert client.get(url, headers={**agent_headers, 'If-Modified-Since': last_modified}).status_code == 304
+
+    response = client.post(f'{url}/comments', json={'comment': 'On site now'}, headers=agent_headers)
+    assert response.status_code == 201
+    db.session.execute(db.update(Ticket).where(Ticket.id == ticket.id).values(updated_at=past))
+    db.session.commit()
+
+    response = client.get(url, headers={**agent_headers, 'If-Modified-Since': last_modified})
+    assert response.status_code == 200
+    assert 'On site now' in str(response.get_json())
@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, func
+
+import routes.analytics
+from app import app as flask_app, db
+from benchmarks.query_plans import hot_queries, check
+from models import Ticket
+
+QUERIES = {name: (statement, indexes) for name, statement, indexes in hot_queries()}
+
+
+@pytest.fixture(scope='module')
+def schema():
+    # Plans only need the tables and indexes, not seed data
+    with flask_app.app_context():
+        yield
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_hot_query_uses_its_index(schema, name):
+    statement, indexes = QUERIES[name]
+    with db.engine.connect() as connection:
+        ok, plan = check(connection, statement, indexes)
+    assert ok, '\n'.join(plan)
+
+
+def test_check_follows_the_route_builders(schema, monkeypatch):
+    # Comparing a function of the column cannot use ix_tickets_created_at
+    monkeypatch.setattr(routes.analytics, 'created_between_query', lambda start, end: select(
+        func.count(Ticket.id)).where(func.date(Ticket.created_at) == datetime.utcnow().date()))
+    statement, indexes = next((s, i) for name, s, i in hot_queries() if name == 'dashboard: tickets today')
+    with db.engine.connect() as connection:
+        ok, _ = check(connection, statement, indexes)
+    assert not ok
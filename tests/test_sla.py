@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from app import db
+from models import Ticket
+
+
+def _breached_ticket(client, agent_headers, age):
+    response = client.post('/api/tickets/', json={'title': 'Line down', 'client_id': 1, 'priority': 'critical'},
+                           headers=agent_headers)
+    ticket = db.session.get(Ticket, response.get_json()['ticket']['id'])
+    ticket.created_at = datetime.utcnow() - age
+    ticket.sla_state = 'breached'
+    ticket.sla_breached_at = datetime.utcnow()
+    db.session.commit()
+    return ticket.id
+
+
+def _change_priority(client, agent_headers, ticket_id, priority):
+    response = client.put(f'/api/tickets/{ticket_id}', json={'priority': priority}, headers=agent_headers)
+    assert response.status_code == 200
+    return response.get_json()['ticket']
+
+
+def test_priority_change_clears_breach_when_deadlines_move_ahead(client, agent_headers):
+    ticket_id = _breached_ticket(client, agent_headers, timedelta(hours=1))
+
+    ticket = _change_priority(client, agent_headers, ticket_id, 'low')
+    assert ticket['sla_state'] == 'ok'
+    assert ticket['sla_breached_at'] is None
+
+
+def test_priority_change_keeps_breach_when_new_deadline_passed(client, agent_headers):
+    ticket_id = _breached_ticket(client, agent_headers, timedelta(days=4))
+
+    ticket = _change_priority(client, agent_headers, ticket_id, 'high')
+    assert ticket['sla_state'] == 'breached'
+    assert ticket['sla_breached_at'] is not None
@@ -0,0 +1,22 @@
+import pytest
+
+from utils.static_manifest import HASHED_NAME
+
+
+@pytest.mark.parametrize('path', [
+    'static/js/main.3f2a9c1e.js',
+    'static/js/787.c1d4e2f1.chunk.js',
+    'assets/index-BxK2c9aQ.css',
+])
+def test_hashed_assets(path):
+    assert HASHED_NAME.search(path)
+
+
+@pytest.mark.parametrize('path', [
+    'asset-manifest.json',
+    'logo-horizontal.svg',
+    'favicon.ico',
+    'backup-20240101.json',
+])
+def test_unhashed_names(path):
+    assert not HASHED_NAME.search(path)
@@ -0,0 +1,83 @@
+from datetime import datetime
+from sqlalchemy import select, insert
+from app import db
+from models import ActivityLog, User
+from utils.group_commit import group_writer
+
+MAX_PAGE_SIZE = 200
+
+
+def activity_page_query(limit, before=None, target_type=None, target_id=None, user_id=None):
+    """Up to `limit` (entry, user name) rows older than `before`, newest first."""
+    query = select(ActivityLog, User.name).outerjoin(User, User.id == ActivityLog.user_id)
+    if target_type is not None:
+        query = query.where(ActivityLog.target_type == target_type)
+        if target_id is not None:
+            query = query.where(ActivityLog.target_id == target_id)
+    if user_id is not None:
+        query = query.where(ActivityLog.user_id == user_id)
+    if before is not None:
+        query = query.where(ActivityLog.id < before)
+    return query.order_by(ActivityLog.id.desc()).limit(limit)
+
+
+def activity_page(limit, before=None, target_type=None, target_id=None, user_id=None):
+    """Newest-first activity entries, keyset-paginated on id.
+
+    A single filter (a target, a target type or a user) is a range scan on
+    a composite index ending in id, so a page costs O(limit) regardless of
+    table size. With both a user and a target, SQLite walks one of those
+    indexes and checks the other column on each entry, so a page costs as
+    many entries as it skips. User names come from the same statement via
+    an outer join.
+    Returns (entries, next_before); next_before is None on the last page.
+    """
+    rows = db.session.execute(activity_page_query(limit + 1, before, target_type, target_id, user_id)).all()
+    entries = [serialize_activity(activity, user_name) for activity, user_name in rows[:limit]]
+    next_before = rows[limit - 1][0].id if len(rows) > limit else None
+    return entries, next_before
+
+
+def serialize_activity(activity, user_name):
+    return {
+        'id': activity.id,
+        'user_id': activity.user_id,
+        'user_name': user_name,
+        'action': activity.action,
+        'target_type': activity.target_type,
+        'target_id': activity.target_id,
+        'details': activity.details,
+        'created_at': activity.created_at.isoformat() if activity.created_at else None
+    }
+
+
+def log_activity(user_id, action, target_type, target_id, details=None):
+    """Record an activity entry in its own short transaction.
+
+    With SQLITE_WRITE_MODE=group the insert is funnelled through the
+    group-commit writer (and this call waits for it to be durable);
+    otherwise it is added and committed on the request's session.
+    """
+    if group_writer.enabled:
+        values = {
+            'user_id': user_id,
+            'action': action,
+            'target_type': target_type,
+            'target_id': target_id,
+            'details': details,
+            'created_at': datetime.utcnow()
+        }
+        return group_writer.execute(
+            lambda connection: connection.execute(insert(ActivityLog.__table__).values(**values)).inserted_primary_key[0]
+        )
+
+    activity = ActivityLog(
+        user_id=user_id,
+        action=action,
+        target_type=target_type,
+        target_id=target_id,
+        details=details
+    )
+    db.session.add(activity)
+    db.session.commit()
+    return activity.id
@@ -0,0 +1,358 @@
+import fcntl
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import click
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from app import app, db
+from models import ActivityLog, User
+from utils.activity import serialize_activity
+
+# Activity entries older than the retention window live in monthly segment files:
+#   activity-YYYY-MM.ndjson.gz   concatenated gzip members, one per block of entries
+#   activity-YYYY-MM.idx         one JSON line per block (sparse index)
+# Both files are append-only; a block is only referenced once its index line is written.
+
+BLOCK_SIZE = 256
+BLOOM_BITS = 2048
+BLOOM_HASHES = 3
+
+_SEGMENT_NAME = re.compile(r'activity-(\d{4})-(\d{2})\.idx$')
+
+
+def _bloom_positions(key):
+    digest = hashlib.blake2b(key.encode(), digest_size=4 * BLOOM_HASHES).digest()
+    return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'big') % BLOOM_BITS for i in range(BLOOM_HASHES)]
+
+
+def _bloom_keys(entry):
+    return (f"{entry['target_type']}:{entry['target_id']}", f"user:{entry['user_id']}")
+
+
+def _build_bloom(entries):
+    bits = 0
+    for entry in entries:
+        for key in _bloom_keys(entry):
+            for position in _bloom_positions(key):
+                bits |= 1 << position
+    return format(bits, 'x')
+
+
+def _bloom_may_contain(bloom, key):
+    bits = int(bloom, 16)
+    return all(bits >> position & 1 for position in _bloom_positions(key))
+
+
+class ActivitySegmentStore:
+    """Monthly gzip NDJSON segments of archived activity entries with a sparse block index."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _paths(self, month):
+        base = os.path.join(self.directory, f'activity-{month}')
+        return base + '.ndjson.gz', base + '.idx'
+
+    def months(self):
+        months = []
+        for path in glob.glob(os.path.join(self.directory, 'activity-*.idx')):
+            match = _SEGMENT_NAME.search(path)
+            if match:
+                months.append(f'{match.group(1)}-{match.group(2)}')
+        return sorted(months)
+
+    # Writing
+
+    def append(self, month, entries):
+        """Append entries (already ordered by id) to a month's segment as gzip blocks."""
+        os.makedirs(self.directory, exist_ok=True)
+        data_path, index_path = self._paths(month)
+        index_lines = []
+
+        with open(data_path, 'ab') as data_file:
+            data_file.seek(0, os.SEEK_END)
+            for start in range(0, len(entries), BLOCK_SIZE):
+                block = entries[start:start + BLOCK_SIZE]
+                payload = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in block)
+                compressed = gzip.compress(payload.encode(), compresslevel=6)
+                offset = data_file.tell()
+                data_file.write(compressed)
+                index_lines.append(json.dumps({
+                    'offset': offset,
+                    'length': len(compressed),
+                    'count': len(block),
+                    'min_id': block[0]['id'],
+                    'max_id': block[-1]['id'],
+                    'min_at': min(entry['created_at'] or '' for entry in block),
+                    'max_at': max(entry['created_at'] or '' for entry in block),
+                    'bloom': _build_bloom(block)
+                }, separators=(',', ':')))
+            data_file.flush()
+            os.fsync(data_file.fileno())
+
+        with open(index_path, 'a') as index_file:
+            index_file.write(''.join(line + '\n' for line in index_lines))
+            index_file.flush()
+            os.fsync(index_file.fileno())
+
+    def high_water_mark(self):
+        """Largest entry id already stored in any segment (0 if none)."""
+        mark = 0
+        for month in self.months():
+            for block in self._read_index(month):
+                mark = max(mark, block['max_id'])
+        return mark
+
+    def stored_keys(self, min_id, max_id):
+        """(id, created_at) of every stored entry with an id in [min_id, max_id]."""
+        keys = set()
+        for month in self.months():
+            blocks = [block for block in self._read_index(month) if block['min_id'] <= max_id and block['max_id'] >= min_id]
+            if not blocks:
+                continue
+            data_path, _ = self._paths(month)
+            with open(data_path, 'rb') as data_file:
+                for block in blocks:
+                    keys.update((entry['id'], entry['created_at']) for entry in self._read_block(data_file, block))
+        return keys
+
+    # Reading
+
+    def _read_index(self, month):
+        _, index_path = self._paths(month)
+        try:
+            size = os.path.getsize(index_path)
+        except OSError:
+            return []
+
+        with self._lock:
+            cached = self._indexes.get(month)
+            if cached and cached[0] == size:
+                return cached[1]
+
+        blocks = []
+        with open(index_path) as index_file:
+            for line in index_file:
+                line = line.strip()
+                if line:
+                    blocks.append(json.loads(line))
+
+        with self._lock:
+            self._indexes[month] = (size, blocks)
+            while len(self._indexes) > 120:
+                self._indexes.popitem(last=False)
+        return blocks
+
+    def _read_block(self, data_file, block):
+        data_file.seek(block['offset'])
+        payload = gzip.decompress(data_file.read(block['length']))
+        return [json.loads(line) for line in payload.decode().splitlines() if line]
+
+    def query(self, limit, start=None, end=None, target_type=None, target_id=None, user_id=None, before=None):
+        """Newest-first archived entries matching the filters.
+
+        Only months overlapping [start, end) are opened, and within them only
+        blocks whose id/time range and bloom filter can match are decompressed.
+        Returns (entries, next_before) like utils.activity.activity_page.
+        """
+        start_at = start.isoformat() if start else None
+        end_at = end.isoformat() if end else None
+        target_key = f'{target_type}:{target_id}' if target_type and target_id is not None else None
+        user_key = f'user:{user_id}' if user_id is not None else None
+
+        def matches(entry):
+            if before is not None and entry['id'] >= before:
+                return False
+            if start_at and (entry['created_at'] or '') < start_at:
+                return False
+            if end_at and (entry['created_at'] or '') >= end_at:
+                return False
+            if target_type and entry['target_type'] != target_type:
+                return False
+            if target_id is not None and entry['target_id'] != target_id:
+                return False
+            return user_id is None or entry['user_id'] == user_id
+
+        results = []
+        for month in reversed(self.months()):
+            if start and month < start.strftime('%Y-%m'):
+                break
+            if end and month > end.strftime('%Y-%m'):
+                continue
+
+            candidates = []
+            for block in self._read_index(month):
+                if before is not None and block['min_id'] >= before:
+                    continue
+                if start_at and block['max_at'] < start_at:
+                    continue
+                if end_at and block['min_at'] >= end_at:
+                    continue
+                if target_key and not _bloom_may_contain(block['bloom'], target_key):
+                    continue
+                if user_key and not _bloom_may_contain(block['bloom'], user_key):
+                    continue
+                candidates.append(block)
+            if not candidates:
+                continue
+
+            data_path, _ = self._paths(month)
+            with open(data_path, 'rb') as data_file:
+                for block in sorted(candidates, key=lambda b: b['max_id'], reverse=True):
+                    for entry in reversed(self._read_block(data_file, block)):
+                        if matches(entry):
+                            results.append(entry)
+                    if len(results) > limit:
+                        break
+            if len(results) > limit:
+                break
+
+        results.sort(key=lambda entry: entry['id'], reverse=True)
+        next_before = results[limit - 1]['id'] if len(results) > limit else None
+        return results[:limit], next_before
+
+
+def last_expired_id_query(cutoff):
+    """The newest id among entries created before cutoff, read from the created_at index."""
+    # max(id + 0), not max(id): SQLite would answer that by walking the table back from the newest entry
+    return select(func.max(ActivityLog.id + 0)).where(ActivityLog.created_at < cutoff)
+
+
+def expired_activity_query(cutoff, last_id, limit):
+    """The oldest `limit` (entry, user name) rows created before cutoff with ids up to last_id, in id order."""
+    # The id bound keeps each batch a range read on the primary key instead of a scan
+    return (
+        select(ActivityLog, User.name)
+        .outerjoin(User, User.id == ActivityLog.user_id)
+        .where(ActivityLog.created_at < cutoff, ActivityLog.id <= last_id)
+        .order_by(ActivityLog.id)
+        .limit(limit)
+    )
+
+
+class ActivityRetention:
+    """Moves activity entries older than `retention_days` from the table into segment files.
+
+    Runs in a background thread per worker; an exclusive file lock on the
+    segment directory makes sure only one process writes at a time. Rows are
+    deleted only after their block is durably written; rows at or below the
+    store's high-water mark that a segment already holds (left behind by a
+    crash between the two steps) are deleted without being written again.
+    """
+
+    def __init__(self, store, retention_days, batch_size, interval_seconds):
+        self.store = store
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.archived = 0
+
+    def _batch(self, cutoff, last_id, high_water_mark):
+        rows = db.session.execute(expired_activity_query(cutoff, last_id, self.batch_size)).all()
+        if not rows:
+            db.session.rollback()
+            return 0, high_water_mark
+
+        # Ids at or below the mark are only skipped if that very entry is in a segment
+        stored = set()
+        if rows[0][0].id <= high_water_mark:
+            stored = self.store.stored_keys(rows[0][0].id, high_water_mark)
+
+        by_month = OrderedDict()
+        for activity, user_name in rows:
+            entry = serialize_activity(activity, user_name)
+            if (entry['id'], entry['created_at']) in stored:
+                continue
+            month = activity.created_at.strftime('%Y-%m')
+            by_month.setdefault(month, []).append(entry)
+        for month, entries in by_month.items():
+            self.store.append(month, entries)
+
+        ids = [activity.id for activity, _ in rows]
+        db.session.execute(delete(ActivityLog).where(ActivityLog.id.in_(ids)))
+        db.session.commit()
+        return len(ids), max(high_water_mark, ids[-1])
+
+    def run_once(self):
+        os.makedirs(self.store.directory, exist_ok=True)
+        with open(os.path.join(self.store.directory, '.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            cutoff = datetime.utcnow() - timedelta(days=max(self.retention_days, 1))
+            last_id = db.session.execute(last_expired_id_query(cutoff)).scalar()
+            high_water_mark = self.store.high_water_mark()
+            total = 0
+            while last_id is not None:
+                moved, high_water_mark = self._batch(cutoff, last_id, high_water_mark)
+                total += moved
+                if moved < self.batch_size:
+                    break
+                time.sleep(0.05)
+
+        self.runs += 1
+        self.archived += total
+        if total:
+            app.logger.info('Moved %s activity entries to segment files', total)
+        return total
+
+    def _run(self):
+        while True:
+            try:
+                with app.app_context():
+                    self.run_once()
+            except Exception:
+                app.logger.exception('Activity retention failed')
+            time.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='activity-retention', daemon=True)
+                    self._thread.start()
+
+    def stats(self):
+        return {'runs': self.runs, 'archived': self.archived}
+
+
+segment_store = ActivitySegmentStore(
+    app.config.get('ACTIVITY_ARCHIVE_DIR') or os.path.join(app.instance_path, 'activity_archive')
+)
+
+activity_retention = ActivityRetention(
+    segment_store,
+    app.config.get('ACTIVITY_RETENTION_DAYS', 90),
+    app.config.get('ACTIVITY_RETENTION_BATCH_SIZE', 5000),
+    app.config.get('ACTIVITY_RETENTION_INTERVAL_SECONDS', 3600)
+)
+
+
+def start_activity_retention():
+    """before_request hook: start the retention thread in each serving process."""
+    if app.config.get('ACTIVITY_RETENTION_ENABLED', False):
+        activity_retention.start()
+
+
+@click.command('archive-activity')
+@click.option('--days', type=int, default=None, help='Move entries older than this many days')
+def archive_activity_command(days):
+    """Move old activity entries into the compressed segment files."""
+    if days is not None:
+        activity_retention.retention_days = days
+    moved = activity_retention.run_once()
+    click.echo(f'Moved {moved} activity entries to {segment_store.directory}')
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import click
+from sqlalchemy import select, insert, update, delete, and_, func, literal
+from app import app, db
+from models import Ticket, TicketComment, ArchivedTicket, ArchivedTicketComment, TicketRollup
+
+tickets = Ticket.__table__
+comments = TicketComment.__table__
+tickets_archive = ArchivedTicket.__table__
+comments_archive = ArchivedTicketComment.__table__
+rollups = TicketRollup.__table__
+
+# Columns copied verbatim from the hot tables; archived_at is stamped on the way
+TICKET_COLUMNS = [column.name for column in tickets_archive.columns if column.name != 'archived_at']
+COMMENT_COLUMNS = [column.name for column in comments_archive.columns]
+
+
+def _apply_rollups(rows):
+    totals = defaultdict(lambda: [0, 0])
+    for _, completed_at, tech_id, priority, time_spent in rows:
+        total = totals[(completed_at.date(), tech_id or 0, priority)]
+        total[0] += 1
+        total[1] += time_spent or 0
+
+    for (day, tech_id, priority), (count, time_spent) in totals.items():
+        key = and_(rollups.c.day == day, rollups.c.tech_id == tech_id, rollups.c.priority == priority)
+        result = db.session.execute(
+            update(rollups).where(key).values(
+                completed_count=rollups.c.completed_count + count,
+                time_spent_sum=rollups.c.time_spent_sum + time_spent
+            )
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(rollups).values(
+                day=day, tech_id=tech_id, priority=priority,
+                completed_count=count, time_spent_sum=time_spent
+            ))
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to batch_size tickets completed before cutoff, with their comments, in one transaction.
+
+    Returns the number of tickets moved. The final DELETE re-checks the
+    status, so a ticket reopened concurrently aborts the batch instead of
+    being archived.
+    """
+    rows = db.session.execute(
+        select(tickets.c.id, tickets.c.completed_at, tickets.c.assigned_tech_id,
+               tickets.c.priority, tickets.c.time_spent)
+        .where(tickets.c.status == 'completed', tickets.c.completed_at < cutoff)
+        .order_by(tickets.c.completed_at)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    ids = [row[0] for row in rows]
+    try:
+        db.session.execute(insert(tickets_archive).from_select(
+            TICKET_COLUMNS + ['archived_at'],
+            select(*[tickets.c[name] for name in TICKET_COLUMNS], literal(datetime.utcnow()))
+            .where(tickets.c.id.in_(ids))
+        ))
+        db.session.execute(insert(comments_archive).from_select(
+            COMMENT_COLUMNS,
+            select(*[comments.c[name] for name in COMMENT_COLUMNS]).where(comments.c.ticket_id.in_(ids))
+        ))
+        db.session.execute(delete(comments).where(comments.c.ticket_id.in_(ids)))
+        result = db.session.execute(
+            delete(tickets).where(tickets.c.id.in_(ids), tickets.c.status == 'completed')
+        )
+        if result.rowcount != len(ids):
+            db.session.rollback()
+            return 0
+
+        _apply_rollups(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(ids)
+
+
+def archive_completed_tickets(older_than_days, batch_size=500, pause_seconds=0.0):
+    """Archive every ticket completed more than older_than_days ago, batch by batch."""
+    cutoff = datetime.utcnow() - timedelta(days=max(older_than_days, 1))
+    total = 0
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+        # Let request handlers at the database between batches
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+
+class TicketArchiver:
+    """Background thread that runs archive_completed_tickets every `interval_seconds`."""
+
+    def __init__(self, older_than_days, batch_size, interval_seconds):
+        self.older_than_days = older_than_days
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self._thread = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.archived = 0
+        self.last_run_at = None
+
+    def run_once(self):
+        moved = archive_completed_tickets(self.older_than_days, self.batch_size, pause_seconds=0.05)
+        self.runs += 1
+        self.archived += moved
+        self.last_run_at = datetime.utcnow()
+        if moved:
+            app.logger.info('Archived %s completed tickets', moved)
+        return moved
+
+    def _run(self):
+        while True:
+            try:
+                with app.app_context():
+                    self.run_once()
+            except Exception:
+                app.logger.exception('Ticket archival failed')
+            time.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='ticket-archiver', daemon=True)
+                    self._thread.start()
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'archived': self.archived,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None
+        }
+
+
+archiver = TicketArchiver(
+    app.config.get('ARCHIVE_AFTER_DAYS', 180),
+    app.config.get('ARCHIVE_BATCH_SIZE', 500),
+    app.config.get('ARCHIVE_INTERVAL_SECONDS', 3600)
+)
+
+
+def start_archiver():
+    """before_request hook: start the archival thread in each serving process."""
+    if app.config.get('ARCHIVE_ENABLED', False):
+        archiver.start()
+
+
+@click.command('archive-tickets')
+@click.option('--days', type=int, default=None, help='Archive tickets completed more than this many days ago')
+@click.option('--batch-size', type=int, default=None)
+def archive_command(days, batch_size):
+    """Move old completed tickets into the archive tables."""
+    moved = archive_completed_tickets(
+        days if days is not None else archiver.older_than_days,
+        batch_size or archiver.batch_size
+    )
+    click.echo(f'Archived {moved} tickets')
+
+
+# Read helpers: hot table first, archive as fallback
+
+def find_ticket(ticket_id):
+    """Ticket by id from the hot table, falling through to the archive."""
+    return Ticket.query.get(ticket_id) or ArchivedTicket.query.get(ticket_id)
+
+
+def archived_totals_by_priority():
+    rows = db.session.execute(
+        select(rollups.c.priority, func.sum(rollups.c.completed_count)).group_by(rollups.c.priority)
+    ).all()
+    return {priority: count or 0 for priority, count in rows}
+
+
+def archived_totals_by_tech(since=None):
+    """{tech_id: (completed tickets, time spent)} from the rollups, optionally since a date."""
+    query = select(
+        rollups.c.tech_id, func.sum(rollups.c.completed_count), func.sum(rollups.c.time_spent_sum)
+    ).where(rollups.c.tech_id != 0).group_by(rollups.c.tech_id)
+    if since is not None:
+        query = query.where(rollups.c.day >= since.date())
+    return {tech_id: (count or 0, time_spent or 0) for tech_id, count, time_spent in db.session.execute(query)}
@@ -0,0 +1,28 @@
+from sqlalchemy import select, update, insert
+from datetime import datetime
+from app import db
+from models import CacheVersion
+
+cache_versions = CacheVersion.__table__
+
+
+def get_version(key):
+    """Current version of a cache key (0 if it has never been bumped)."""
+    version = db.session.execute(
+        select(cache_versions.c.version).where(cache_versions.c.key == key)
+    ).scalar()
+    return version or 0
+
+
+def bump_version(key, connection=None):
+    """Increment a cache key inside the caller's transaction."""
+    executor = connection if connection is not None else db.session
+    now = datetime.utcnow()
+
+    result = executor.execute(
+        update(cache_versions)
+        .where(cache_versions.c.key == key)
+        .values(version=cache_versions.c.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        executor.execute(insert(cache_versions).values(key=key, version=1, updated_at=now))
@@ -0,0 +1,316 @@
+import hashlib
+import math
+import threading
+from collections import OrderedDict, defaultdict
+from sqlalchemy import event, inspect, select, update, delete, insert, func
+from sqlalchemy.orm import Session
+from app import app, db
+from models import Site, SiteCluster, SiteTileVersion, CacheVersion
+from utils.cache_versions import cache_versions, bump_version
+
+# Each tile is split into a 2^CELL_BITS x 2^CELL_BITS grid (32px cells on a 256px tile)
+CELL_BITS = 3
+MAX_CLUSTER_ZOOM = 16
+MAX_MERCATOR_LAT = 85.05112878
+
+# Cells are stored for every CLUSTER_ZOOM_STEP-th zoom only (16, 12, 8, 4, 0); tiles at the
+# zooms in between group the cells of the next finer stored level, so a site write
+# updates 5 cluster rows instead of 17
+CLUSTER_ZOOM_STEP = 4
+STORED_ZOOMS = tuple(range(MAX_CLUSTER_ZOOM, -1, -CLUSTER_ZOOM_STEP))
+
+# Site edits invalidate cached tiles per tile at this zoom (about 150 km across), see tile_version()
+TILE_VERSION_ZOOM = 8
+
+# Bumped only by rebuild_clusters(), which invalidates every tile
+CACHE_KEY = 'site_clusters'
+
+site_clusters = SiteCluster.__table__
+site_tile_versions = SiteTileVersion.__table__
+
+
+def finest_cell(lat, lng):
+    """Grid cell of a point at the deepest clustering level."""
+    n = 1 << (MAX_CLUSTER_ZOOM + CELL_BITS)
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    lat_rad = math.radians(lat)
+
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def stored_zoom(zoom):
+    """The finest-or-equal stored level whose cells a tile at `zoom` groups."""
+    return MAX_CLUSTER_ZOOM - (MAX_CLUSTER_ZOOM - zoom) // CLUSTER_ZOOM_STEP * CLUSTER_ZOOM_STEP
+
+
+def cell_path(lat, lng):
+    """Yield (zoom, cell_x, cell_y) for every stored level; each cell nests in its parent."""
+    x, y = finest_cell(lat, lng)
+    for zoom in STORED_ZOOMS:
+        shift = MAX_CLUSTER_ZOOM - zoom
+        yield zoom, x >> shift, y >> shift
+
+
+def version_tile(lat, lng):
+    """The TILE_VERSION_ZOOM tile holding a point."""
+    x, y = finest_cell(lat, lng)
+    shift = MAX_CLUSTER_ZOOM + CELL_BITS - TILE_VERSION_ZOOM
+    return x >> shift, y >> shift
+
+
+def _add_site(deltas, lat, lng, site_type, status, sign):
+    for zoom, x, y in cell_path(lat, lng):
+        delta = deltas[(zoom, x, y, site_type, status)]
+        delta[0] += sign
+        delta[1] += sign * lat
+        delta[2] += sign * lng
+
+
+def _apply_deltas(connection, deltas):
+    for (zoom, x, y, site_type, status), (count, lat_sum, lng_sum) in deltas.items():
+        if count == 0 and lat_sum == 0 and lng_sum == 0:
+            continue
+
+        key = db.and_(
+            site_clusters.c.zoom == zoom,
+            site_clusters.c.cell_x == x,
+            site_clusters.c.cell_y == y,
+            site_clusters.c.site_type == site_type,
+            site_clusters.c.status == status
+        )
+        result = connection.execute(
+            update(site_clusters).where(key).values(
+                site_count=site_clusters.c.site_count + count,
+                lat_sum=site_clusters.c.lat_sum + lat_sum,
+                lng_sum=site_clusters.c.lng_sum + lng_sum
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(site_clusters).values(
+                zoom=zoom, cell_x=x, cell_y=y, site_type=site_type, status=status,
+                site_count=count, lat_sum=lat_sum, lng_sum=lng_sum
+            ))
+        elif count < 0:
+            connection.execute(delete(site_clusters).where(key, site_clusters.c.site_count <= 0))
+
+
+def _bump_tile_versions(connection, tiles):
+    # One row per touched region, so writers elsewhere on the map do not wait on it
+    for tile_x, tile_y in sorted(tiles):
+        key = db.and_(site_tile_versions.c.tile_x == tile_x, site_tile_versions.c.tile_y == tile_y)
+        result = connection.execute(
+            update(site_tile_versions).where(key).values(version=site_tile_versions.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(site_tile_versions).values(tile_x=tile_x, tile_y=tile_y, version=1))
+
+
+def apply_site_changes(connection, added=(), removed=()):
+    """Apply (lat, lng, site_type, status) tuples to the cluster grid and bump the versions of their tiles."""
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    tiles = set()
+    for lat, lng, site_type, status in added:
+        _add_site(deltas, lat, lng, site_type, status, 1)
+        tiles.add(version_tile(lat, lng))
+    for lat, lng, site_type, status in removed:
+        _add_site(deltas, lat, lng, site_type, status, -1)
+        tiles.add(version_tile(lat, lng))
+
+    if deltas:
+        _apply_deltas(connection, deltas)
+        _bump_tile_versions(connection, tiles)
+
+
+def rebuild_clusters(connection):
+    """Recompute every level from the sites table, finest level first."""
+    connection.execute(delete(site_clusters))
+
+    level = defaultdict(lambda: [0, 0.0, 0.0])
+    rows = connection.execute(select(Site.latitude, Site.longitude, Site.site_type, Site.status))
+    for lat, lng, site_type, status in rows:
+        x, y = finest_cell(lat, lng)
+        cell = level[(x, y, site_type, status)]
+        cell[0] += 1
+        cell[1] += lat
+        cell[2] += lng
+
+    for zoom in range(MAX_CLUSTER_ZOOM, -1, -1):
+        if level and zoom in STORED_ZOOMS:
+            connection.execute(insert(site_clusters), [
+                {'zoom': zoom, 'cell_x': x, 'cell_y': y, 'site_type': site_type, 'status': status,
+                 'site_count': count, 'lat_sum': lat_sum, 'lng_sum': lng_sum}
+                for (x, y, site_type, status), (count, lat_sum, lng_sum) in level.items()
+            ])
+
+        parent = defaultdict(lambda: [0, 0.0, 0.0])
+        for (x, y, site_type, status), (count, lat_sum, lng_sum) in level.items():
+            cell = parent[(x >> 1, y >> 1, site_type, status)]
+            cell[0] += count
+            cell[1] += lat_sum
+            cell[2] += lng_sum
+        level = parent
+
+    if inspect(connection).has_table(CacheVersion.__tablename__):
+        bump_version(CACHE_KEY, connection)
+
+
+@event.listens_for(SiteCluster.__table__, 'after_create')
+def _populate_clusters(target, connection, **kw):
+    # Databases created before clustering existed already have sites to aggregate
+    if inspect(connection).has_table(Site.__tablename__):
+        rebuild_clusters(connection)
+
+
+def _site_values(state, current):
+    values = []
+    for attr in ('latitude', 'longitude', 'site_type', 'status'):
+        history = state.attrs[attr].history
+        if current:
+            value = getattr(state.object, attr)
+        elif history.deleted:
+            value = history.deleted[0]
+        else:
+            value = history.unchanged[0] if history.unchanged else getattr(state.object, attr)
+
+        if value is None and attr in ('site_type', 'status'):
+            # Column default not applied yet on pending objects
+            value = Site.__table__.c[attr].default.arg
+        values.append(value)
+    return tuple(values)
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_site_writes(session, flush_context, instances):
+    added, removed = [], []
+
+    for obj in session.new:
+        if isinstance(obj, Site):
+            added.append(_site_values(inspect(obj), current=True))
+
+    for obj in session.dirty:
+        if isinstance(obj, Site) and session.is_modified(obj, include_collections=False):
+            state = inspect(obj)
+            old, new = _site_values(state, current=False), _site_values(state, current=True)
+            if old != new:
+                removed.append(old)
+                added.append(new)
+
+    for obj in session.deleted:
+        if isinstance(obj, Site):
+            removed.append(_site_values(inspect(obj), current=False))
+
+    if added or removed:
+        apply_site_changes(session.connection(), added, removed)
+
+
+def parse_tile(z, x, y):
+    z, x, y = int(z), int(x), int(y)
+    if not 0 <= z <= MAX_CLUSTER_ZOOM:
+        raise ValueError(f'z must be between 0 and {MAX_CLUSTER_ZOOM}')
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise ValueError('x and y must be valid tile coordinates for zoom z')
+    return z, x, y
+
+
+def tile_clusters(z, x, y):
+    """Clusters inside map tile z/x/y, one per occupied grid cell."""
+    size = 1 << CELL_BITS
+    zoom = stored_zoom(z)
+    shift = zoom - z
+    # Ordered so every worker sums the floats the same way and renders identical bytes
+    rows = db.session.execute(
+        select(site_clusters).where(
+            site_clusters.c.zoom == zoom,
+            site_clusters.c.cell_x.between((x * size) << shift, ((x + 1) * size << shift) - 1),
+            site_clusters.c.cell_y.between((y * size) << shift, ((y + 1) * size << shift) - 1),
+            site_clusters.c.site_count > 0
+        ).order_by(site_clusters.c.cell_x, site_clusters.c.cell_y, site_clusters.c.site_type, site_clusters.c.status)
+    )
+
+    cells = OrderedDict()
+    for row in rows:
+        cell = cells.setdefault((row.cell_x >> shift, row.cell_y >> shift), {
+            'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0, 'types': {}, 'statuses': {}
+        })
+        cell['count'] += row.site_count
+        cell['lat_sum'] += row.lat_sum
+        cell['lng_sum'] += row.lng_sum
+        cell['types'][row.site_type] = cell['types'].get(row.site_type, 0) + row.site_count
+        cell['statuses'][row.status] = cell['statuses'].get(row.status, 0) + row.site_count
+
+    return [{
+        'lat': round(cell['lat_sum'] / cell['count'], 6),
+        'lng': round(cell['lng_sum'] / cell['count'], 6),
+        'count': cell['count'],
+        'types': cell['types'],
+        'statuses': cell['statuses']
+    } for cell in cells.values()]
+
+
+class TileCache:
+    """LRU of rendered tiles, each valid for one tile_version()."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, version, etag, body):
+        with self._lock:
+            self._tiles[key] = (version, etag, body)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_size:
+                self._tiles.popitem(last=False)
+
+    def stats(self):
+        return {'size': len(self._tiles), 'hits': self.hits, 'misses': self.misses}
+
+
+tile_cache = TileCache(app.config.get('CLUSTER_TILE_CACHE_SIZE', 2048))
+
+
+def tile_version(z, x, y):
+    """(rebuilds, edits) for tile z/x/y: the edit counters of the version tiles it overlaps, summed."""
+    if z >= TILE_VERSION_ZOOM:
+        shift = z - TILE_VERSION_ZOOM
+        region = [site_tile_versions.c.tile_x == x >> shift, site_tile_versions.c.tile_y == y >> shift]
+    else:
+        shift = TILE_VERSION_ZOOM - z
+        region = [
+            site_tile_versions.c.tile_x.between(x << shift, ((x + 1) << shift) - 1),
+            site_tile_versions.c.tile_y.between(y << shift, ((y + 1) << shift) - 1)
+        ]
+    rebuilds = select(cache_versions.c.version).where(cache_versions.c.key == CACHE_KEY).scalar_subquery()
+    edits = select(func.coalesce(func.sum(site_tile_versions.c.version), 0)).where(*region).scalar_subquery()
+    row = db.session.execute(select(rebuilds, edits)).one()
+    return row[0] or 0, row[1]
+
+
+def render_tile(z, x, y, dumps):
+    """Return (etag, body) for a tile, reusing the cached bytes while its version is unchanged."""
+    version = tile_version(z, x, y)
+    cached = tile_cache.get((z, x, y), version)
+    if cached:
+        return cached
+
+    body = dumps({'z': z, 'x': x, 'y': y, 'clusters': tile_clusters(z, x, y)})
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    # Content-derived so every worker produces the same validator for the same tile
+    etag = hashlib.sha1(body).hexdigest()
+    tile_cache.put((z, x, y), version, etag, body)
+    return etag, body
@@ -0,0 +1,147 @@
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+# Compressible response types unless COMPRESS_MIMETYPES says otherwise
+DEFAULT_MIMETYPES = (
+    'application/json', 'application/geo+json', 'application/javascript', 'application/xml',
+    'text/html', 'text/css', 'text/csv', 'text/plain', 'text/javascript', 'image/svg+xml',
+)
+
+# Precompressed static siblings, best first: (Content-Encoding, file suffix)
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        # A sync flush per chunk keeps a streamed response streaming
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def _closing(chunks, iterable):
+    # Replacing response.response would otherwise skip the original iterable's close() (stream_with_context teardown)
+    try:
+        yield from chunks
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+class Compressor:
+    """Compresses responses (gzip, or brotli when installed) in an after_request hook.
+
+    Only allowlisted content types at least COMPRESS_MIN_SIZE bytes long are
+    compressed; streamed responses are compressed chunk by chunk and stay
+    streamed. Files sent straight from disk (direct passthrough) and
+    responses that already carry a Content-Encoding are left alone; client
+    assets use their precompressed siblings (see utils/static_manifest.py).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.min_size = 500
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+        self.gzip_level = 6
+        self.brotli_quality = 4
+        self.responses = {'gzip': 0, 'br': 0, 'identity': 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.mimetypes = frozenset(app.config.get('COMPRESS_MIMETYPES') or DEFAULT_MIMETYPES)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        if self.enabled:
+            app.after_request(self.after_request)
+
+    @property
+    def encodings(self):
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def choose(self):
+        """The best encoding the client accepts, or None."""
+        return request.accept_encodings.best_match(self.encodings)
+
+    def _compressible(self, response):
+        return (
+            200 <= response.status_code < 300
+            and response.status_code != 204
+            and request.method != 'HEAD'
+            and not response.direct_passthrough
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in self.mimetypes
+        )
+
+    def after_request(self, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            iterable = response.response
+            if encoding == 'br':
+                chunks = _brotli_stream(iterable, self.brotli_quality)
+            else:
+                chunks = _gzip_stream(iterable, self.gzip_level)
+            response.response = _closing(chunks, iterable)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                self.responses['identity'] += 1
+                return response
+            if encoding == 'br':
+                compressed = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+                compressed = compressor.compress(data) + compressor.flush()
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        self.responses[encoding] += 1
+        # The compressed body is a different representation of the same resource
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'brotli': brotli is not None,
+            'responses': dict(self.responses),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out
+        }
+
+
+compressor = Compressor()
+
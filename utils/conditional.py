@@ -0,0 +1,128 @@
+import hashlib
+from sqlalchemy import select, func
+from sqlalchemy.orm import aliased
+from flask import request, current_app, make_response
+from app import db
+from models import Ticket, TicketComment, Client, User, ArchivedTicket, CacheVersion
+from utils.workload import OPEN_STATUSES
+from utils.settings_cache import CACHE_KEY as SETTINGS_CACHE_KEY
+
+
+class Validators:
+    """ETag and Last-Modified for a GET response, computed before the body is built.
+
+    `parts` are cheap values that change whenever the response would
+    (updated_at stamps, counts, version counters); they are hashed together
+    with the path and query string, so ?fields= variants get distinct tags.
+    `max_age` > 0 lets clients reuse the response for that long; otherwise
+    they must revalidate on every use (Cache-Control: no-cache), which costs
+    a 304 when nothing changed.
+    """
+
+    def __init__(self, *parts, last_modified=None, max_age=0):
+        key = repr((request.path, request.query_string, parts)).encode()
+        self.etag = hashlib.sha1(key).hexdigest()[:32]
+        self.last_modified = last_modified.replace(microsecond=0) if last_modified else None
+        self.max_age = max_age
+
+    def is_fresh(self):
+        # If-None-Match wins over If-Modified-Since; compression weakens tags, so compare weakly
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(self.etag)
+        since = request.if_modified_since
+        return since is not None and self.last_modified is not None and self.last_modified <= since.replace(tzinfo=None)
+
+    def not_modified(self):
+        """A 304 response when the client's copy is current, else None."""
+        if not self.is_fresh():
+            return None
+        return self.apply(make_response('', 304))
+
+    def apply(self, response):
+        response = make_response(response)
+        response.set_etag(self.etag)
+        if self.last_modified is not None:
+            response.last_modified = self.last_modified
+        response.cache_control.private = True
+        if self.max_age:
+            response.cache_control.max_age = self.max_age
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+
+def _latest(*stamps):
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else None
+
+
+def ticket_validators(ticket_id):
+    """Validators for GET /api/tickets/<id> from one indexed lookup, or None if there is no such ticket.
+
+    Covers the ticket row, the names joined from the client and users, and
+    the comments (count, newest id and time, and their authors' names).
+    """
+    client = aliased(Client)
+    assigned_tech = aliased(User)
+    creator = aliased(User)
+    comments = select(
+        func.count(TicketComment.id), func.max(TicketComment.id), func.max(User.updated_at),
+        func.max(TicketComment.created_at)
+    ).select_from(TicketComment).outerjoin(User, User.id == TicketComment.user_id).where(
+        TicketComment.ticket_id == ticket_id
+    ).subquery()
+
+    row = db.session.execute(
+        select(Ticket.updated_at, client.updated_at, assigned_tech.updated_at, creator.updated_at, *comments.c)
+        .outerjoin(client, client.id == Ticket.client_id)
+        .outerjoin(assigned_tech, assigned_tech.id == Ticket.assigned_tech_id)
+        .outerjoin(creator, creator.id == Ticket.created_by_id)
+        .join(comments, db.true())
+        .where(Ticket.id == ticket_id)
+    ).first()
+    if row is not None:
+        return Validators('ticket', *row, last_modified=_latest(row[0], row[1], row[2], row[3], row[6], row[7]))
+
+    # Archived tickets never change once archived
+    archived_at = db.session.execute(
+        select(ArchivedTicket.archived_at).where(ArchivedTicket.id == ticket_id)
+    ).scalar()
+    if archived_at is None:
+        return None
+    return Validators('archived', archived_at, last_modified=archived_at)
+
+
+def client_validators(client_id):
+    updated_at = db.session.execute(select(Client.updated_at).where(Client.id == client_id)).first()
+    if updated_at is None:
+        return None
+    return Validators(updated_at[0], last_modified=updated_at[0])
+
+
+def technicians_validators():
+    """Active technicians and their open tickets: counts plus newest updated_at of each.
+
+    Any assignment or status change stamps the ticket's updated_at, so the
+    tag moves with every change to the workloads. oldest_open_age_seconds
+    is as of the response the client holds; oldest_open_at stays exact.
+    No Last-Modified: a ticket closing leaves the open set without moving
+    any remaining timestamp, which only the ETag's counts notice.
+    """
+    users = db.session.execute(
+        select(func.count(User.id), func.max(User.updated_at)).where(User.role == 'technician')
+    ).first()
+    tickets = db.session.execute(
+        select(func.count(Ticket.id), func.max(Ticket.updated_at)).where(
+            Ticket.assigned_tech_id.isnot(None), Ticket.status.in_(OPEN_STATUSES)
+        )
+    ).first()
+    return Validators(*users, *tickets)
+
+
+def settings_validators():
+    """From the shared settings version (see utils/settings_cache.py)."""
+    row = db.session.execute(
+        select(CacheVersion.version, CacheVersion.updated_at).where(CacheVersion.key == SETTINGS_CACHE_KEY)
+    ).first()
+    version, updated_at = row if row is not None else (0, None)
+    return Validators(version, last_modified=updated_at, max_age=current_app.config.get('REFERENCE_MAX_AGE', 0))
@@ -0,0 +1,419 @@
+import bisect
+import math
+import random
+import time
+import click
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from app import app, db
+from models import User, Client, Ticket, TicketComment, Router, Site, ActivityLog
+from utils.schema import upgrade_schema, create_indexes, analyze
+from utils.clustering import rebuild_clusters
+from utils.settings_cache import DEFAULT_SLA_POLICIES
+from utils.seed_data import DEFAULT_USERS
+
+# Every generated (non-default) user logs in with this password
+GENERATED_PASSWORD = 'password123'
+
+# Population centres that clients and sites cluster around: (name, lat, lng, weight)
+CITIES = [
+    ('Nairobi', -1.2921, 36.8219, 40), ('Mombasa', -4.0435, 39.6682, 14), ('Kisumu', -0.0917, 34.7680, 9),
+    ('Nakuru', -0.3031, 36.0800, 8), ('Eldoret', 0.5143, 35.2698, 7), ('Thika', -1.0333, 37.0693, 6),
+    ('Malindi', -3.2192, 40.1169, 4), ('Kisii', -0.6817, 34.7667, 4), ('Nyeri', -0.4201, 36.9476, 4),
+    ('Machakos', -1.5177, 37.2634, 4),
+]
+# Sites outside any city are spread over this box: (min_lat, max_lat, min_lng, max_lng)
+REGION = (-4.6, 4.5, 34.0, 41.8)
+
+FIRST_NAMES = ['John', 'Halima', 'Robert', 'Alice', 'Bob', 'Emily', 'Michael', 'Jessica', 'Daniel', 'Laura',
+               'Peter', 'Grace', 'James', 'Mary', 'Samuel', 'Faith', 'David', 'Ann', 'Joseph', 'Esther']
+LAST_NAMES = ['Kimani', 'Aisha', 'Ouko', 'Wanjohi', 'Kiptoo', 'Mueni', 'Wanjala', 'Mogaka', 'Ouma', 'Kemunto',
+              'Otieno', 'Njoroge', 'Mutua', 'Cheruiyot', 'Achieng', 'Kamau', 'Wafula', 'Nyambura', 'Barasa', 'Omondi']
+STREETS = ['Main St', 'Park Ave', 'Oak Rd', 'Pine St', 'Cedar Ave', 'Maple Rd', 'Birch St', 'Walnut Ave', 'Moi Ave',
+           'Kenyatta Ave']
+ISSUES = [
+    ('Internet Connection Issue', 'Connection drops several times a day.'),
+    ('Router Configuration', 'Router needs port forwarding and a new SSID.'),
+    ('Slow Internet Speed', 'Speeds far below the subscribed plan in the evening.'),
+    ('WiFi Signal Weak', 'Weak signal in the back rooms of the premises.'),
+    ('DNS Configuration', 'Some websites fail to resolve.'),
+    ('Network Security Setup', 'Firewall rules and guest network requested.'),
+    ('Hardware Installation', 'New access point to be mounted and configured.'),
+    ('Software Update Required', 'Router firmware is several versions behind.'),
+    ('Intermittent Outage', 'Service goes down for minutes at a time after rain.'),
+    ('Billing Line Down', 'Point-of-sale terminals cannot reach the payment gateway.'),
+]
+COMMENTS = ['Called the client to confirm the details.', 'Scheduled a site visit.', 'Replaced the patch cable.',
+            'Rebooted the router remotely.', 'Escalated to the network team.', 'Client confirmed the fix works.',
+            'Waiting for the client to be on site.', 'Updated the firmware.']
+ROUTER_MODELS = ['TP-Link Archer C7', 'Netgear Nighthawk R7000', 'Asus RT-AC86U', 'Linksys EA7500', 'Google Nest Wifi',
+                 'D-Link DIR-882', 'Ubiquiti AmpliFi HD', 'Synology RT2600ac', 'MikroTik hAP ac2', 'Cisco RV340']
+PRIORITIES = (('low', 30), ('medium', 40), ('high', 20), ('critical', 10))
+SITE_TYPES = (('office', 15), ('branch', 20), ('datacenter', 3), ('warehouse', 10), ('remote', 30), ('customer', 22))
+
+# Tables whose secondary indexes are dropped during the load and built once at the end
+DEFERRED_INDEX_TABLES = (Ticket.__table__, TicketComment.__table__, ActivityLog.__table__, Router.__table__)
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+class ChunkWriter:
+    """Buffers rows for one table and inserts them `chunk_size` at a time, one transaction per chunk."""
+
+    def __init__(self, connection, table, chunk_size):
+        self.connection = connection
+        self.table = table
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.connection.execute(insert(self.table), self.rows)
+            self.connection.commit()
+            self.count += len(self.rows)
+            self.rows = []
+
+
+class DataGenerator:
+    """Builds a synthetic dataset of the given size, the same for the same seed and `until`.
+
+    Tickets are spread over `days` of history with volume growing towards
+    `until`, and over clients with a Zipf(`skew`) distribution, so a few
+    clients own most tickets. Status, response and completion times depend
+    on a ticket's age and priority (SLA deadlines use the default policies).
+    Routers get a history of outages (offline or maintenance, then back
+    online), recorded as "Updated router status" activity entries like the
+    API writes, since there is no separate heartbeat table; last_seen is
+    the last time a router was online.
+    Sites cluster around towns in the region.
+
+    Rows go in through Core executemany inserts with explicit ids, in
+    chunked transactions on one connection; on SQLite with synchronous=OFF,
+    and with the big tables' secondary indexes built after the load.
+    Password hashes are computed once per distinct password.
+    """
+
+    def __init__(self, tickets=100000, clients=None, technicians=50, agents=20, comments=2.0,
+                 routers_per_client=1.5, outages=3.0, sites=2000, days=730, skew=1.1,
+                 seed=42, until=None, chunk_size=20000):
+        self.tickets = tickets
+        self.clients = clients or max(tickets // 50, 10)
+        self.technicians = technicians
+        self.agents = agents
+        self.comments = comments
+        self.routers_per_client = routers_per_client
+        self.outages = outages
+        self.sites = sites
+        self.days = days
+        self.skew = skew
+        self.seed = seed
+        self.until = until or datetime.utcnow()
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.counts = {}
+
+    # Helpers
+
+    def _name(self):
+        return f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def _ago(self, days):
+        return self.until - timedelta(days=days)
+
+    def _between(self, start, end):
+        return start + (end - start) * self.rng.random()
+
+    def _count(self, mean):
+        """A non-negative count with the given mean and a long tail."""
+        return int(self.rng.expovariate(1 / mean) + 0.5) if mean > 0 else 0
+
+    # Phases
+
+    def _users(self, connection):
+        hashes = {}
+
+        def password_hash(password):
+            if password not in hashes:
+                hashes[password] = generate_password_hash(password)
+            return hashes[password]
+
+        created_at = self._ago(self.days + 30)
+        rows = [
+            {'name': user['name'], 'email': user['email'], 'password_hash': password_hash(user['password']),
+             'role': user['role'], 'status': 'active', 'created_at': created_at, 'updated_at': created_at}
+            for user in DEFAULT_USERS
+        ]
+        for role, count in (('technician', self.technicians), ('agent', self.agents)):
+            for n in range(count):
+                name = self._name()
+                rows.append({
+                    'name': name, 'email': f"{name.lower().replace(' ', '.')}.{role[0]}{n}@company.com",
+                    'password_hash': password_hash(GENERATED_PASSWORD), 'role': role,
+                    'status': 'active' if self.rng.random() < 0.95 else 'inactive',
+                    'created_at': created_at, 'updated_at': created_at
+                })
+        for user_id, row in enumerate(rows, 1):
+            row['id'] = user_id
+        connection.execute(insert(User.__table__), rows)
+        connection.commit()
+
+        self.tech_ids = [row['id'] for row in rows if row['role'] == 'technician' and row['status'] == 'active']
+        self.agent_ids = [row['id'] for row in rows if row['role'] in ('agent', 'admin')]
+        return len(rows)
+
+    def _clients(self, connection):
+        writer = ChunkWriter(connection, Client.__table__, self.chunk_size)
+        for client_id in range(1, self.clients + 1):
+            name = self._name()
+            city = _weighted(self.rng, [(city[0], city[3]) for city in CITIES])
+            created_at = self._ago(self.days + self.rng.uniform(0, 30))
+            writer.add({
+                'id': client_id, 'name': name, 'email': f"{name.lower().replace(' ', '.')}.{client_id}@example.com",
+                'phone': f'+254-7{self.rng.randint(0, 99):02d}-{self.rng.randint(0, 999):03d}-{self.rng.randint(0, 999):03d}',
+                'address': f'{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}, {city}',
+                'status': 'active' if self.rng.random() < 0.95 else 'inactive',
+                'created_at': created_at, 'updated_at': created_at
+            })
+        writer.flush()
+
+        # Zipf weights: client 1 has the most tickets
+        total = 0.0
+        self.client_weights = []
+        for rank in range(1, self.clients + 1):
+            total += 1 / rank ** self.skew
+            self.client_weights.append(total)
+        return writer.count
+
+    def _sites(self, connection):
+        writer = ChunkWriter(connection, Site.__table__, self.chunk_size)
+        weights = [(city, city[3]) for city in CITIES]
+        for site_id in range(1, self.sites + 1):
+            site_type = _weighted(self.rng, SITE_TYPES)
+            if self.rng.random() < 0.1:
+                name = 'Rural'
+                lat = self.rng.uniform(REGION[0], REGION[1])
+                lng = self.rng.uniform(REGION[2], REGION[3])
+            else:
+                name, city_lat, city_lng, _ = _weighted(self.rng, weights)
+                lat = city_lat + self.rng.gauss(0, 0.08)
+                lng = city_lng + self.rng.gauss(0, 0.08)
+            created_at = self._ago(self.rng.uniform(0, self.days))
+            writer.add({
+                'id': site_id, 'name': f'{name} {site_type.title()} {site_id}',
+                'description': f'{site_type.title()} site', 'latitude': round(lat, 6), 'longitude': round(lng, 6),
+                'site_type': site_type, 'status': _weighted(self.rng, (('active', 85), ('maintenance', 10), ('inactive', 5))),
+                'address': f'{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}, {name}',
+                'contact': f'+254-700-{self.rng.randint(0, 999):03d}-{self.rng.randint(0, 999):03d}',
+                'created_at': created_at, 'updated_at': created_at
+            })
+        writer.flush()
+        rebuild_clusters(connection)
+        connection.commit()
+        return writer.count
+
+    def _routers(self, connection, activity):
+        writer = ChunkWriter(connection, Router.__table__, self.chunk_size)
+        router_id = 0
+        for client_id in range(1, self.clients + 1):
+            for _ in range(max(1, self._count(self.routers_per_client))):
+                router_id += 1
+                model = self.rng.choice(ROUTER_MODELS)
+                created_at = self._ago(self.rng.uniform(0, self.days))
+
+                # Status history: outages and maintenance windows, each followed by recovery
+                # unless it is still going on at `until`
+                changes = []
+                for started_at in sorted(self._between(created_at, self.until) for _ in range(self._count(self.outages))):
+                    if changes and started_at < changes[-1][1]:
+                        continue
+                    changes.append(('offline' if self.rng.random() < 0.8 else 'maintenance', started_at))
+                    changes.append(('online', started_at + timedelta(minutes=self.rng.expovariate(1 / 120))))
+                if self.rng.random() < 0.06:
+                    # Down right now, for up to a few days
+                    changes.append(('offline', self.until - timedelta(hours=self.rng.expovariate(1 / 24))))
+                status, updated_at, last_seen = 'online', created_at, None
+                for next_status, changed_at in changes:
+                    if changed_at < updated_at or changed_at > self.until:
+                        continue
+                    if next_status != 'online':
+                        last_seen = changed_at
+                    status, updated_at = next_status, changed_at
+                    activity.add({
+                        'user_id': self.rng.choice(self.tech_ids or self.agent_ids),
+                        'action': 'Updated router status', 'target_type': 'router', 'target_id': router_id,
+                        'details': f'Changed router status to {status}: {model}', 'created_at': changed_at
+                    })
+                if status == 'online':
+                    last_seen = self.until - timedelta(seconds=self.rng.randint(0, 300))
+
+                writer.add({
+                    'id': router_id, 'model': model, 'serial_number': f'SN-{self.seed}-{router_id:08d}',
+                    'status': status, 'client_id': client_id,
+                    'location': f'{self.rng.randint(1, 999)} {self.rng.choice(STREETS)}',
+                    'last_seen': last_seen, 'created_at': created_at, 'updated_at': updated_at
+                })
+        writer.flush()
+        return writer.count
+
+    def _ticket_status(self, age_days):
+        if age_days < 1:
+            weights = (30, 40, 30)
+        elif age_days < 7:
+            weights = (15, 25, 60)
+        elif age_days < 30:
+            weights = (5, 10, 85)
+        else:
+            weights = (1, 2, 97)
+        return self.rng.choices(('pending', 'in-progress', 'completed'), weights)[0]
+
+    def _tickets(self, connection, activity):
+        tickets = ChunkWriter(connection, Ticket.__table__, self.chunk_size)
+        comments = ChunkWriter(connection, TicketComment.__table__, self.chunk_size)
+        rng = self.rng
+        comment_id = 0
+        for ticket_id in range(1, self.tickets + 1):
+            # Density grows linearly towards `until`
+            age_days = self.days * (1 - math.sqrt(rng.random()))
+            created_at = self._ago(age_days)
+            priority = _weighted(rng, PRIORITIES)
+            policy = DEFAULT_SLA_POLICIES[priority]
+            response_due_at = created_at + timedelta(minutes=policy['response_minutes'])
+            due_at = created_at + timedelta(minutes=policy['resolution_minutes'])
+            status = self._ticket_status(age_days)
+            title, description = rng.choice(ISSUES)
+            client_id = bisect.bisect_left(self.client_weights, rng.random() * self.client_weights[-1]) + 1
+            created_by_id = rng.choice(self.agent_ids)
+
+            tech_id = None
+            if self.tech_ids and (status != 'pending' or rng.random() < 0.3):
+                tech_id = rng.choice(self.tech_ids)
+
+            first_response_at = completed_at = None
+            time_spent = 0
+            if status != 'pending':
+                first_response_at = min(
+                    created_at + timedelta(minutes=rng.expovariate(2 / policy['response_minutes'])), self.until
+                )
+            if status == 'completed':
+                # Resolution time is log-normal around 40% of the SLA
+                hours = rng.lognormvariate(math.log(policy['resolution_minutes'] * 0.4 / 60), 0.8)
+                completed_at = min(created_at + timedelta(hours=hours), self.until)
+                time_spent = int(min(hours * 60, 600) * rng.uniform(0.2, 0.6))
+            elif status == 'in-progress':
+                time_spent = rng.randint(0, 120)
+
+            end = completed_at or self.until
+            if end > due_at:
+                sla_state, sla_breached_at = 'breached', due_at
+            else:
+                sla_state, sla_breached_at = 'ok', None
+
+            tickets.add({
+                'id': ticket_id, 'title': title, 'description': description, 'priority': priority, 'status': status,
+                'client_id': client_id, 'assigned_tech_id': tech_id, 'created_by_id': created_by_id,
+                'time_spent': time_spent, 'created_at': created_at, 'updated_at': completed_at or first_response_at or created_at,
+                'completed_at': completed_at, 'response_due_at': response_due_at, 'due_at': due_at,
+                'first_response_at': first_response_at, 'sla_state': sla_state, 'sla_breached_at': sla_breached_at,
+                'duplicate_of_id': None
+            })
+
+            for _ in range(self._count(self.comments)):
+                comment_id += 1
+                comments.add({
+                    'id': comment_id, 'ticket_id': ticket_id,
+                    'user_id': tech_id if tech_id and rng.random() < 0.7 else created_by_id,
+                    'comment': rng.choice(COMMENTS), 'created_at': self._between(created_at, end)
+                })
+
+            activity.add({
+                'user_id': created_by_id, 'action': 'Created ticket', 'target_type': 'ticket',
+                'target_id': ticket_id, 'details': f'Created ticket: {title}', 'created_at': created_at
+            })
+            if completed_at is not None:
+                activity.add({
+                    'user_id': tech_id or created_by_id, 'action': 'Updated ticket', 'target_type': 'ticket',
+                    'target_id': ticket_id, 'details': f'Updated ticket: {title}', 'created_at': completed_at
+                })
+        tickets.flush()
+        comments.flush()
+        self.counts['ticket_comments'] = comments.count
+        return tickets.count
+
+    def run(self, echo=print):
+        """Drop every table, recreate the schema and fill it; returns {table: rows}."""
+        started = time.perf_counter()
+
+        def phase(name, build, *args):
+            phase_started = time.perf_counter()
+            count = build(*args)
+            self.counts[name] = count
+            echo(f'{name:>16}: {count:>10,} rows in {time.perf_counter() - phase_started:6.1f} s')
+
+        db.drop_all()
+        upgrade_schema()
+        with db.engine.connect() as connection:
+            if connection.dialect.name == 'sqlite':
+                # A throwaway load: durability per chunk is not worth the fsyncs
+                connection.exec_driver_sql('PRAGMA synchronous=OFF')
+                connection.exec_driver_sql('PRAGMA cache_size=-65536')
+            for table in DEFERRED_INDEX_TABLES:
+                for index in table.indexes:
+                    index.drop(connection, checkfirst=True)
+            connection.commit()
+
+            activity = ChunkWriter(connection, ActivityLog.__table__, self.chunk_size)
+            phase('users', self._users, connection)
+            phase('clients', self._clients, connection)
+            phase('sites', self._sites, connection)
+            phase('routers', self._routers, connection, activity)
+            phase('tickets', self._tickets, connection, activity)
+            activity.flush()
+            self.counts['activity_logs'] = activity.count
+            echo(f'{"ticket_comments":>16}: {self.counts["ticket_comments"]:>10,} rows')
+            echo(f'{"activity_logs":>16}: {activity.count:>10,} rows')
+
+            index_started = time.perf_counter()
+            create_indexes(connection, *[index.name for table in DEFERRED_INDEX_TABLES for index in table.indexes])
+            analyze(connection, *[table.name for table in db.metadata.sorted_tables])
+            connection.commit()
+            echo(f'{"indexes":>16}: built and analyzed in {time.perf_counter() - index_started:6.1f} s')
+
+        # Pooled connections must not keep synchronous=OFF
+        db.engine.dispose()
+        echo(f'Generated {sum(self.counts.values()):,} rows in {time.perf_counter() - started:.1f} s (seed {self.seed})')
+        return self.counts
+
+
+@click.command('generate-data')
+@click.option('--tickets', type=int, default=100000, show_default=True)
+@click.option('--clients', type=int, default=None, help='Default: one per 50 tickets (at least 10)')
+@click.option('--technicians', type=int, default=50, show_default=True)
+@click.option('--agents', type=int, default=20, show_default=True)
+@click.option('--comments', type=float, default=2.0, show_default=True, help='Average comments per ticket')
+@click.option('--routers-per-client', type=float, default=1.5, show_default=True)
+@click.option('--outages', type=float, default=3.0, show_default=True,
+              help='Average outages in each router\'s status history')
+@click.option('--sites', type=int, default=2000, show_default=True)
+@click.option('--days', type=int, default=730, show_default=True, help='Days of history')
+@click.option('--skew', type=float, default=1.1, show_default=True, help='Zipf exponent of tickets per client')
+@click.option('--seed', type=int, default=42, show_default=True)
+@click.option('--until', type=click.DateTime(formats=['%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']), default=None,
+              help='End of the history (default: now); fix it for byte-identical datasets')
+@click.option('--chunk-size', type=int, default=20000, show_default=True, help='Rows per insert transaction')
+@click.option('--yes', is_flag=True, help='Do not ask before dropping the existing data')
+def generate_data_command(yes, **options):
+    """Replace the database with a generated dataset of the given size."""
+    with app.app_context():
+        if not yes:
+            click.confirm(f'This drops every table in {db.engine.url.render_as_string()}. Continue?', abort=True)
+        DataGenerator(**options).run(click.echo)
@@ -0,0 +1,209 @@
+import bisect
+import threading
+import time
+from sqlalchemy import event, exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Like utils/db_routing.py this module must not import app: engine options are built before db exists.
+
+# Upper bounds (ms) of the checkout wait histogram; the last bucket is +Inf
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Counters and a checkout-wait histogram for one engine's pool."""
+
+    def __init__(self, name):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def observe_wait(self, wait_ms):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+            self.wait_sum_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def snapshot(self):
+        pool = self.pool
+        data = {
+            'pool_class': type(pool).__name__ if pool is not None else None,
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'connects': self.connects,
+            'invalidations': self.invalidations,
+            'wait_ms': {
+                'buckets': [
+                    {'le': bound if bound is not None else '+Inf', 'count': count}
+                    for bound, count in zip(WAIT_BUCKETS_MS + (None,), self.wait_buckets)
+                ],
+                'sum': round(self.wait_sum_ms, 3),
+                'max': round(self.wait_max_ms, 3),
+                'avg': round(self.wait_sum_ms / self.checkouts, 3) if self.checkouts else 0
+            }
+        }
+        if isinstance(pool, QueuePool):
+            data.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'idle': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow
+            })
+        return data
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe_wait((time.perf_counter() - started) * 1000)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+
+def engine_options(url, config):
+    """SQLAlchemy create_engine options for one database URL from the DB_* settings."""
+    url = make_url(url)
+    options = {'pool_pre_ping': config.get('DB_POOL_PRE_PING', True)}
+    in_memory = url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+    if not in_memory:
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+            'pool_use_lifo': True
+        })
+
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    if url.get_backend_name() == 'sqlite':
+        # Seconds to wait on a locked database before "database is locked"
+        options['connect_args'] = {'timeout': config.get('SQLITE_BUSY_TIMEOUT', 5.0)}
+    elif url.get_backend_name() == 'postgresql' and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+
+def parse_pragmas(value):
+    """'journal_mode=WAL,synchronous=NORMAL' -> [('journal_mode', 'WAL'), ('synchronous', 'NORMAL')]"""
+    pragmas = []
+    for item in (value or '').split(','):
+        if '=' in item:
+            name, setting = item.split('=', 1)
+            if name.strip().replace('_', '').isalnum() and setting.strip().replace('-', '').replace('_', '').isalnum():
+                pragmas.append((name.strip(), setting.strip()))
+    return pragmas
+
+
+def add_sqlite_pragmas(engine, pragmas):
+    """Run `PRAGMA name=value` on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, setting in pragmas:
+            cursor.execute(f'PRAGMA {name}={setting}')
+        cursor.close()
+
+
+def add_sqlite_statement_timeout(engine, timeout_ms):
+    """Abort SQLite statements running longer than timeout_ms (SQLite has no statement_timeout)."""
+    if engine.dialect.name != 'sqlite' or not timeout_ms:
+        return
+    limit = timeout_ms / 1000.0
+
+    @event.listens_for(engine, 'connect')
+    def _install_handler(dbapi_connection, connection_record):
+        state = connection_record.info
+        state['statement_started'] = None
+
+        def check():
+            started = state.get('statement_started')
+            # Non-zero aborts the statement with "interrupted"
+            return 1 if started is not None and time.monotonic() - started > limit else 0
+
+        dbapi_connection.set_progress_handler(check, 10000)
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _start(connection, cursor, statement, parameters, context, executemany):
+        connection.connection.info['statement_started'] = time.monotonic()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _stop(connection, cursor, statement, parameters, context, executemany):
+        connection.connection.info['statement_started'] = None
+
+
+class PoolRegistry:
+    """Instruments every engine of the app and reports their pool state."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def instrument(self, name, engine, config):
+        metrics = self.metrics.get(name)
+        if metrics is None:
+            metrics = self.metrics[name] = PoolMetrics(name)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.metrics = metrics
+        metrics.pool = engine.pool
+
+        event.listen(engine, 'connect', lambda *args: setattr(metrics, 'connects', metrics.connects + 1))
+        event.listen(engine, 'invalidate', lambda *args: setattr(metrics, 'invalidations', metrics.invalidations + 1))
+        add_sqlite_pragmas(engine, parse_pragmas(config.get('SQLITE_PRAGMAS')))
+        add_sqlite_statement_timeout(engine, config.get('DB_STATEMENT_TIMEOUT_MS', 0))
+
+    def stats(self):
+        return {name: metrics.snapshot() for name, metrics in self.metrics.items()}
+
+    def ping(self, engines):
+        """Round-trip `SELECT 1` on each engine: {name: {'ok', 'ms'[, 'error']}}."""
+        results = {}
+        for name, engine in engines.items():
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                results[name] = {'ok': True, 'ms': round((time.perf_counter() - started) * 1000, 3)}
+            except Exception as e:
+                results[name] = {'ok': False, 'ms': round((time.perf_counter() - started) * 1000, 3), 'error': str(e)}
+        return results
+
+
+pool_registry = PoolRegistry()
+
+
+def init_engines(app, db):
+    """Instrument the primary and replica engines; call once after db is created."""
+    with app.app_context():
+        for key, engine in db.engines.items():
+            pool_registry.instrument(key or 'primary', engine, app.config)
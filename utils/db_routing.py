@@ -0,0 +1,258 @@
+import itertools
+import click
+import sqlite3
+import os
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request, current_app
+from flask.cli import with_appcontext
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, select, literal, exc
+
+# Deliberately independent of app.py: RoutingSession must exist before db is created.
+
+READ_METHODS = ('GET', 'HEAD')
+STICKY_COOKIE = 'db_primary_until'
+
+
+class ReplicaRouter:
+    """Chooses a healthy read replica for read-only requests.
+
+    Replicas are the SQLALCHEMY_BINDS entries named replica_<n> (built from
+    DATABASE_REPLICA_URLS). A background thread probes each with a trivial
+    query against the users table every `health_interval` seconds and pick()
+    only reads the cached results, so a hanging replica never stalls requests;
+    connection errors raised while serving a query mark it unhealthy straight
+    away. Until the first probe, or with no healthy replica, every query simply
+    goes to the primary.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.sticky_seconds = 5
+        self.health_interval = 10
+        self._health = {}
+        self._sticky = {}
+        self._cycle = None
+        self._lock = threading.Lock()
+        self._monitor = None
+        self._app = None
+        self._db = None
+        self.reads = {'primary': 0, 'replica': 0, 'fallbacks': 0}
+
+    def init_app(self, app, db):
+        self._app = app
+        self._db = db
+        self.keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica_'))
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+        self.health_interval = app.config.get('REPLICA_HEALTH_INTERVAL', 10)
+        self._cycle = itertools.cycle(self.keys) if self.keys else None
+
+        if not self.keys:
+            return
+        with app.app_context():
+            for key in self.keys:
+                event.listen(db.engines[key], 'handle_error', self._on_error(key))
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    @property
+    def enabled(self):
+        return bool(self.keys)
+
+    # Health
+
+    def _on_error(self, key):
+        def handle_error(context):
+            if context.is_disconnect or isinstance(context.original_exception, exc.OperationalError):
+                self._health[key] = (False, time.monotonic())
+        return handle_error
+
+    def _probe(self, key):
+        engine = self._db.engines[key]
+        if engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:'):
+            # Connecting would silently create an empty database file
+            if not os.path.exists(engine.url.database):
+                return False
+        try:
+            from models import User
+            with engine.connect() as connection:
+                connection.execute(select(literal(1)).select_from(User.__table__).limit(1))
+            return True
+        except Exception:
+            return False
+
+    def probe_all(self):
+        for key in self.keys:
+            self._health[key] = (self._probe(key), time.monotonic())
+
+    def _run_monitor(self):
+        while True:
+            with self._app.app_context():
+                self.probe_all()
+            time.sleep(self.health_interval)
+
+    def start_monitor(self):
+        if self._monitor is None:
+            with self._lock:
+                if self._monitor is None:
+                    self._monitor = threading.Thread(target=self._run_monitor, name='replica-health', daemon=True)
+                    self._monitor.start()
+
+    def is_healthy(self, key):
+        return self._health.get(key, (False, 0.0))[0]
+
+    def pick(self):
+        """A healthy replica bind key (round robin), or None."""
+        with self._lock:
+            for _ in range(len(self.keys)):
+                key = next(self._cycle)
+                if self.is_healthy(key):
+                    return key
+        return None
+
+    def fall_back(self, key):
+        """A query failed on replica `key`: mark it down and serve the rest of the request from the primary."""
+        self._health[key] = (False, time.monotonic())
+        g.db_replica = None
+        self.reads['fallbacks'] += 1
+
+    # Read-your-writes stickiness
+
+    def _identity(self):
+        try:
+            verify_jwt_in_request(optional=True)
+            return get_jwt_identity()
+        except Exception:
+            return None
+
+    def _is_sticky(self, identity):
+        now = time.time()
+        try:
+            if float(request.cookies.get(STICKY_COOKIE, 0)) > now:
+                return True
+        except ValueError:
+            pass
+        return identity is not None and self._sticky.get(identity, 0) > now
+
+    def mark_write(self, identity):
+        until = time.time() + self.sticky_seconds
+        if identity is not None:
+            self._sticky[identity] = until
+            if len(self._sticky) > 10000:
+                now = time.time()
+                self._sticky = {key: value for key, value in self._sticky.items() if value > now}
+        return until
+
+    # Request hooks
+
+    def before_request(self):
+        # Started per serving process, like the other background threads
+        self.start_monitor()
+        g.db_replica = None
+        if request.method not in READ_METHODS:
+            return None
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'use_primary', False) or self._is_sticky(self._identity()):
+            return None
+        g.db_replica = self.pick()
+        return None
+
+    def after_request(self, response):
+        if request.method not in READ_METHODS and request.method != 'OPTIONS' and response.status_code < 400:
+            until = self.mark_write(self._identity())
+            response.set_cookie(STICKY_COOKIE, str(int(until) + 1), max_age=self.sticky_seconds + 1,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def stats(self):
+        return {
+            'replicas': {key: self._health.get(key, (None, 0.0))[0] for key in self.keys},
+            'reads': dict(self.reads),
+            'sticky_users': len(self._sticky)
+        }
+
+
+replica_router = ReplicaRouter()
+
+
+def use_primary(view):
+    """Mark a GET view as needing fresh data from the primary."""
+    view.use_primary = True
+    return view
+
+
+@contextmanager
+def read_only():
+    """Route the enclosed queries to a replica inside a non-GET request (e.g. a report built on POST)."""
+    if not has_request_context() or not replica_router.enabled:
+        yield
+        return
+    previous = g.get('db_replica')
+    g.db_replica = previous or replica_router.pick()
+    try:
+        yield
+    finally:
+        g.db_replica = previous
+
+
+class RoutingSession(Session):
+    """Sends reads to the replica picked for the current request; writes always go to the primary.
+
+    Once the session flushes or executes DML the rest of the request stays on
+    the primary, so a request never reads around its own writes. A read that
+    fails on the replica is retried on the primary instead of failing the request.
+    """
+
+    def execute(self, statement, *args, **kwargs):
+        key = g.get('db_replica') if has_request_context() else None
+        try:
+            return super().execute(statement, *args, **kwargs)
+        except exc.DBAPIError as error:
+            # Only reads that were actually sent to the replica (a write has already reset it)
+            if key is None or g.get('db_replica') != key:
+                raise
+            if not (error.connection_invalidated or isinstance(error, exc.OperationalError)):
+                raise
+            replica_router.fall_back(key)
+            return super().execute(statement, *args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            key = g.get('db_replica')
+            if key is not None:
+                is_write = self._flushing or (clause is not None and getattr(clause, 'is_dml', False))
+                if is_write:
+                    g.db_replica = None
+                else:
+                    replica_router.reads['replica'] += 1
+                    return self._db.engines[key]
+        replica_router.reads['primary'] += 1
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@click.command('sync-replicas')
+@with_appcontext
+def sync_replicas_command():
+    """Copy the primary SQLite database onto every SQLite replica (local stand-in for replication)."""
+    db = replica_router._db
+    primary = db.engine
+    if primary.dialect.name != 'sqlite':
+        raise click.ClickException('sync-replicas only copies SQLite databases')
+    for key in replica_router.keys:
+        engine = db.engines[key]
+        if engine.dialect.name != 'sqlite':
+            click.echo(f'{key}: skipped ({engine.dialect.name})')
+            continue
+        engine.dispose()
+        source = sqlite3.connect(primary.url.database)
+        target = sqlite3.connect(engine.url.database)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+        replica_router._health.pop(key, None)
+        click.echo(f'{key}: copied to {engine.url.database}')
@@ -0,0 +1,231 @@
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from sqlalchemy import select
+from app import app, db
+from models import Ticket
+
+OPEN_STATUSES = ('pending', 'in-progress')
+
+SHINGLE_SIZE = 4
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS  # ~0.5 Jaccard at the LSH threshold
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(20240601)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def shingles(text):
+    """Character shingles over normalised words, hashed to 32 bits."""
+    normalised = ' '.join(_TOKEN.findall((text or '').lower()))
+    if len(normalised) <= SHINGLE_SIZE:
+        return {zlib.crc32(normalised.encode())} if normalised else set()
+    return {
+        zlib.crc32(normalised[i:i + SHINGLE_SIZE].encode())
+        for i in range(len(normalised) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(hashes):
+    if not hashes:
+        return None
+    return tuple(
+        min((a * h + b) % MERSENNE_PRIME for h in hashes) & MAX_HASH
+        for a, b in PERMUTATIONS
+    )
+
+
+def ticket_signature(title, description):
+    return minhash(shingles(f'{title or ""} {description or ""}'))
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERMUTATIONS
+
+
+def _bands(signature):
+    for band in range(BANDS):
+        yield band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+
+
+def open_tickets_query(client_id, *columns):
+    """Id, updated_at and `columns` of a client's open tickets."""
+    return select(Ticket.id, Ticket.updated_at, *columns).where(
+        Ticket.client_id == client_id,
+        Ticket.status.in_(OPEN_STATUSES)
+    )
+
+
+class ClientIndex:
+    """LSH buckets over the open tickets of one client."""
+
+    def __init__(self):
+        self.signatures = {}
+        self.titles = {}
+        self.versions = {}
+        self.buckets = defaultdict(set)
+        self.loaded_at = time.monotonic()
+
+    def add(self, ticket_id, title, signature, updated_at=None):
+        self.remove(ticket_id)
+        self.versions[ticket_id] = updated_at
+        if signature is None:
+            return
+        self.signatures[ticket_id] = signature
+        self.titles[ticket_id] = title
+        for key in _bands(signature):
+            self.buckets[key].add(ticket_id)
+
+    def remove(self, ticket_id):
+        self.versions.pop(ticket_id, None)
+        signature = self.signatures.pop(ticket_id, None)
+        self.titles.pop(ticket_id, None)
+        if signature is None:
+            return
+        for key in _bands(signature):
+            bucket = self.buckets.get(key)
+            if bucket:
+                bucket.discard(ticket_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def query(self, signature, threshold, limit):
+        candidates = set()
+        for key in _bands(signature):
+            candidates |= self.buckets.get(key, set())
+
+        matches = []
+        for ticket_id in candidates:
+            score = similarity(signature, self.signatures[ticket_id])
+            if score >= threshold:
+                matches.append({'id': ticket_id, 'title': self.titles[ticket_id], 'similarity': round(score, 3)})
+        matches.sort(key=lambda match: (-match['similarity'], match['id']))
+        return matches[:limit]
+
+
+class DuplicateIndex:
+    """Per-client MinHash/LSH indexes, loaded on first use and kept up to date by ticket routes.
+
+    Lookups touch only the candidate buckets, never the whole set of open
+    tickets. Client indexes older than `ttl_seconds` are refreshed so tickets
+    opened, edited or closed by other workers are picked up; the refresh reads
+    ids and `updated_at` stamps and only re-hashes tickets that changed. At
+    most `max_clients` indexes are kept (least recently used are dropped).
+    """
+
+    def __init__(self, threshold, ttl_seconds, max_clients):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _load(self, client_id):
+        index = ClientIndex()
+        for ticket_id, updated_at, title, description in db.session.execute(
+                open_tickets_query(client_id, Ticket.title, Ticket.description)):
+            index.add(ticket_id, title, ticket_signature(title, description), updated_at)
+        return index
+
+    def _refresh(self, client_id, index):
+        """Bring an expired index up to date, hashing only tickets changed since it was built."""
+        with self._lock:
+            known = dict(index.versions)
+
+        current = dict(db.session.execute(open_tickets_query(client_id)).all())
+        changed = [
+            ticket_id for ticket_id, updated_at in current.items()
+            if ticket_id not in known or known[ticket_id] != updated_at
+        ]
+        rows = []
+        if changed:
+            rows = db.session.execute(
+                open_tickets_query(client_id, Ticket.title, Ticket.description).where(Ticket.id.in_(changed))
+            ).all()
+        signed = [
+            (ticket_id, updated_at, title, ticket_signature(title, description))
+            for ticket_id, updated_at, title, description in rows
+        ]
+
+        with self._lock:
+            # Entries tracked by this worker while we read are newer than our rows
+            for ticket_id, updated_at in known.items():
+                if ticket_id not in current and index.versions.get(ticket_id, updated_at) == updated_at:
+                    index.remove(ticket_id)
+            for ticket_id, updated_at, title, signature in signed:
+                if index.versions.get(ticket_id) == known.get(ticket_id):
+                    index.add(ticket_id, title, signature, updated_at)
+
+    def _client(self, client_id):
+        with self._lock:
+            index = self._clients.get(client_id)
+            if index is not None:
+                self._clients.move_to_end(client_id)
+                if time.monotonic() - index.loaded_at < self.ttl_seconds:
+                    return index
+                # Concurrent lookups keep using this index while one request refreshes it
+                index.loaded_at = time.monotonic()
+
+        if index is not None:
+            self._refresh(client_id, index)
+            return index
+
+        index = self._load(client_id)
+        with self._lock:
+            self._clients[client_id] = index
+            self._clients.move_to_end(client_id)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return index
+
+    def find(self, client_id, title, description, limit=5, signature=None):
+        signature = signature or ticket_signature(title, description)
+        if signature is None:
+            return []
+        index = self._client(client_id)
+        with self._lock:
+            return index.query(signature, self.threshold, limit)
+
+    def track(self, ticket, signature=None):
+        """Add, refresh or drop a ticket after it was created or updated."""
+        with self._lock:
+            index = self._clients.get(ticket.client_id)
+            if index is None:
+                return
+            if ticket.status in OPEN_STATUSES:
+                index.add(ticket.id, ticket.title, signature or ticket_signature(ticket.title, ticket.description),
+                          ticket.updated_at)
+            else:
+                index.remove(ticket.id)
+
+    def forget(self, client_id, ticket_id):
+        with self._lock:
+            index = self._clients.get(client_id)
+            if index is not None:
+                index.remove(ticket_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'tickets': sum(len(index.signatures) for index in self._clients.values())
+            }
+
+
+duplicate_index = DuplicateIndex(
+    app.config.get('DUPLICATE_THRESHOLD', 0.5),
+    app.config.get('DUPLICATE_INDEX_TTL_SECONDS', 300),
+    app.config.get('DUPLICATE_INDEX_MAX_CLIENTS', 5000)
+)
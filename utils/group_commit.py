@@ -0,0 +1,152 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app import app, db
+from utils.db_pool import add_sqlite_pragmas
+
+# Applied to every new SQLite connection when SQLITE_WRITE_MODE=group
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', '5000'),
+    ('temp_store', 'MEMORY'),
+    ('cache_size', '-16000'),
+)
+
+
+def configure_sqlite(engine):
+    """Enable WAL and the pragmas above on every connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    add_sqlite_pragmas(engine, SQLITE_PRAGMAS)
+    # Connections opened before the listener existed would miss the pragmas
+    engine.dispose()
+    return True
+
+
+class GroupCommitWriter:
+    """Single writer thread that commits short write units from many requests together.
+
+    A unit is a callable taking a SQLAlchemy Connection. The writer waits at
+    most `max_delay_ms` after the first queued unit (or until `max_batch`
+    units are queued), runs each unit inside its own SAVEPOINT and commits
+    the whole group with one fsync. A failing unit is rolled back to its
+    savepoint and only its caller sees the error; if the group commit itself
+    fails every caller in the group gets that error.
+    """
+
+    def __init__(self, max_batch, max_delay_ms):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self.enabled = False
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._engine = None
+        self.groups = 0
+        self.units = 0
+        self.failed_units = 0
+
+    def start(self, engine):
+        with self._lock:
+            if self._thread is None:
+                self._engine = engine
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+                self.enabled = True
+
+    def submit(self, unit):
+        future = Future()
+        self._queue.put((unit, future))
+        return future
+
+    def execute(self, unit, timeout=30):
+        """Run a write unit through the writer and return its result (or raise its error)."""
+        return self.submit(unit).result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _commit_group(self, connection, batch):
+        outcomes = []
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
+        try:
+            for unit, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                connection.exec_driver_sql('SAVEPOINT unit')
+                try:
+                    outcomes.append((future, unit(connection), None))
+                    connection.exec_driver_sql('RELEASE SAVEPOINT unit')
+                except Exception as e:
+                    connection.exec_driver_sql('ROLLBACK TO SAVEPOINT unit')
+                    connection.exec_driver_sql('RELEASE SAVEPOINT unit')
+                    outcomes.append((future, None, e))
+            connection.exec_driver_sql('COMMIT')
+        except Exception as e:
+            try:
+                connection.exec_driver_sql('ROLLBACK')
+            except Exception:
+                pass
+            for unit, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.groups += 1
+        for future, result, error in outcomes:
+            self.units += 1
+            if error is not None:
+                self.failed_units += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _run(self):
+        # Transactions are issued by hand so SAVEPOINTs behave under pysqlite
+        connection = self._engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        while True:
+            batch = self._collect()
+            try:
+                self._commit_group(connection, batch)
+            except Exception as e:
+                app.logger.exception('Group commit failed')
+                for unit, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                connection.close()
+                connection = self._engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'groups': self.groups,
+            'units': self.units,
+            'failed_units': self.failed_units,
+            'avg_group_size': round(self.units / self.groups, 2) if self.groups else 0,
+            'queued': self._queue.qsize()
+        }
+
+
+group_writer = GroupCommitWriter(
+    app.config.get('GROUP_COMMIT_MAX_BATCH', 64),
+    app.config.get('GROUP_COMMIT_MAX_DELAY_MS', 2)
+)
+
+
+def init_write_mode():
+    """Enable WAL pragmas and the group-commit writer when SQLITE_WRITE_MODE=group."""
+    if app.config.get('SQLITE_WRITE_MODE', 'default') != 'group':
+        return
+    if configure_sqlite(db.engine):
+        group_writer.start(db.engine)
@@ -0,0 +1,82 @@
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+# Like utils/db_pool.py this module must not import app: the provider is installed right after app is created.
+
+
+def _default(o):
+    """Types neither encoder handles natively; dates are ISO 8601 like the to_dict methods."""
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider with ISO 8601 dates (instead of HTTP dates) and unsorted keys."""
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """orjson-backed provider; responses are encoded straight to bytes.
+
+    Naive datetimes come out exactly as datetime.isoformat() would write
+    them, so serializers can hand raw row values to jsonify.
+    """
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+    def _option(self, indent=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # Callers asking for json.dumps-specific arguments get the stdlib encoder
+        if set(kwargs) - {'indent', 'separators'}:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._option(bool(kwargs.get('indent')))).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._option(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def provider_class(name='auto'):
+    """JSON_PROVIDER setting -> provider class; 'auto' and 'orjson' fall back to the stdlib without orjson."""
+    if name == 'stdlib' or orjson is None:
+        return StdlibJSONProvider
+    return OrjsonProvider
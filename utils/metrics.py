@@ -0,0 +1,347 @@
+import atexit
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from flask import g, request
+
+# Like utils/query_stats.py this module does not import app; call request_metrics.init_app(app).
+
+# Upper bounds (seconds) of the request latency histogram; the last bucket is +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PREFIX = 'customer_care'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HELP = {
+    f'{PREFIX}_http_requests_total': 'Requests by blueprint, route, method and status.',
+    f'{PREFIX}_http_request_duration_seconds': 'Request latency by blueprint, route and method.',
+    f'{PREFIX}_http_requests_in_flight': 'Requests being handled right now.',
+}
+
+_UNSAFE = re.compile(r'[^a-zA-Z0-9_]')
+_FILE = re.compile(r'^metrics_(\d+)\.json$')
+
+
+def _metric_name(*parts):
+    return _UNSAFE.sub('_', '_'.join(str(part) for part in parts if part != '')).lower()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+def flatten(prefix, stats, label=None):
+    """A subsystem's stats() dict as (type, name, labels, value) samples.
+
+    Nested keys are joined into the metric name; numbers and booleans
+    become gauges, strings and None are skipped, and a {'buckets': [{'le',
+    'count'}], 'sum'} dict (the pool wait histogram) becomes a histogram.
+    With `label`, the top-level keys are values of that label instead
+    (one series per pool, endpoint or technician).
+    """
+    samples = []
+
+    def walk(name, value, labels):
+        if isinstance(value, bool):
+            samples.append(('gauge', name, labels, int(value)))
+        elif isinstance(value, (int, float)):
+            samples.append(('gauge', name, labels, value))
+        elif isinstance(value, dict) and isinstance(value.get('buckets'), list) and 'sum' in value:
+            bounds = [float('inf') if b['le'] == '+Inf' else b['le'] for b in value['buckets']]
+            samples.append(('histogram', name, labels, {
+                'bounds': bounds, 'counts': [b['count'] for b in value['buckets']], 'sum': value['sum']
+            }))
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                walk(_metric_name(name, key), item, labels)
+
+    if label is None:
+        walk(_metric_name(PREFIX, prefix), stats, {})
+    else:
+        for key, value in stats.items():
+            walk(_metric_name(PREFIX, prefix), value, {label: key})
+    return samples
+
+
+class _Shard:
+    """One thread's counters. Only that thread writes them, so recording takes no lock."""
+
+    __slots__ = ('thread', 'requests', 'latency', 'in_flight')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.requests = {}
+        self.latency = {}
+        self.in_flight = 0
+
+
+class RequestMetrics:
+    """Request counts, latency histograms and subsystem stats in Prometheus text format.
+
+    Every request is counted by blueprint, route rule, method and status,
+    and its latency goes into the fixed LATENCY_BUCKETS histogram. Each
+    thread records into its own shard, so the hot path is a few dict
+    updates without a lock; shards are summed when metrics are read, and
+    the shards of finished threads are folded into one retired total.
+
+    Gunicorn runs one copy of this per worker. With `multiproc_dir` set,
+    every worker writes its totals to <dir>/metrics_<pid>.json (atomically,
+    every `flush_interval` seconds and at exit) and render() merges all the
+    files: counters and histograms are summed over every worker that ever
+    wrote one, in-flight requests over live workers only, and subsystem
+    stats (pools, caches, background jobs) are reported per live worker
+    with a pid label. Empty the directory when deploying, as with
+    prometheus_client's PROMETHEUS_MULTIPROC_DIR.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.multiproc_dir = None
+        self.flush_interval = 5.0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._collectors = []
+        self._flusher = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        if not self.enabled:
+            return
+        self.multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR') or None
+        self.flush_interval = app.config.get('METRICS_FLUSH_SECONDS', 5.0)
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            atexit.register(self.flush)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+
+    def add_collector(self, prefix, source, label=None):
+        """Export `source()` (a subsystem's stats()) as customer_care_<prefix>_* gauges."""
+        self._collectors.append((prefix, source, label))
+
+    # Recording (hot path)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def before_request(self):
+        if self.multiproc_dir and self._flusher is None:
+            self.start_flusher()
+        self._shard().in_flight += 1
+        g.metrics_started = time.perf_counter()
+
+    def after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        key = (request.blueprint or '', rule, request.method)
+
+        shard = self._shard()
+        status_key = key + (str(response.status_code),)
+        shard.requests[status_key] = shard.requests.get(status_key, 0) + 1
+        histogram = shard.latency.get(key)
+        if histogram is None:
+            # Bucket counts, then the sum of observed seconds
+            histogram = shard.latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        histogram[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        histogram[-1] += elapsed
+        return response
+
+    def teardown_request(self, exc):
+        if g.pop('metrics_started', None) is not None:
+            self._shard().in_flight -= 1
+
+    # Collecting
+
+    def _totals(self):
+        """Sum of every shard in this process: (requests, latency, in_flight)."""
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self._fold_into(self._retired.requests, self._retired.latency, shard)
+            self._shards = live
+            requests = dict(self._retired.requests)
+            latency = {key: list(values) for key, values in self._retired.latency.items()}
+            in_flight = 0
+            for shard in live:
+                self._fold_into(requests, latency, shard)
+                in_flight += shard.in_flight
+        return requests, latency, in_flight
+
+    @staticmethod
+    def _fold_into(requests, latency, shard):
+        # list() copies under the GIL, so the owning thread may keep recording meanwhile
+        for key, count in list(shard.requests.items()):
+            requests[key] = requests.get(key, 0) + count
+        for key, values in list(shard.latency.items()):
+            total = latency.get(key)
+            if total is None:
+                latency[key] = list(values)
+            else:
+                for index, value in enumerate(values):
+                    total[index] += value
+
+    def snapshot(self):
+        """This process's metrics: 'shared' samples add up across workers, 'process' ones stay per worker."""
+        requests, latency, in_flight = self._totals()
+        shared = [
+            ('counter', f'{PREFIX}_http_requests_total',
+             {'blueprint': bp, 'route': rule, 'method': method, 'status': status}, count)
+            for (bp, rule, method, status), count in sorted(requests.items())
+        ]
+        shared += [
+            ('histogram', f'{PREFIX}_http_request_duration_seconds',
+             {'blueprint': bp, 'route': rule, 'method': method},
+             {'bounds': list(LATENCY_BUCKETS) + [float('inf')], 'counts': values[:-1], 'sum': values[-1]})
+            for (bp, rule, method), values in sorted(latency.items())
+        ]
+        shared.append(('gauge', f'{PREFIX}_http_requests_in_flight', {}, in_flight))
+
+        process = []
+        for prefix, source, label in self._collectors:
+            try:
+                process += flatten(prefix, source(), label)
+            except Exception:
+                # A failing collector must not take the whole scrape down
+                continue
+        return {'pid': os.getpid(), 'written_at': time.time(), 'shared': shared, 'process': process}
+
+    # Multiprocess directory
+
+    def _path(self, pid):
+        return os.path.join(self.multiproc_dir, f'metrics_{pid}.json')
+
+    def flush(self):
+        """Write this worker's snapshot to the multiprocess directory (write, then rename)."""
+        if not self.multiproc_dir:
+            return
+        snapshot = self.snapshot()
+        path = self._path(snapshot['pid'])
+        temp = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(temp, path)
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                continue
+
+    def start_flusher(self):
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name='metrics-flusher', daemon=True)
+            self._flusher.start()
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _snapshots(self):
+        if not self.multiproc_dir:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for name in sorted(os.listdir(self.multiproc_dir)):
+            match = _FILE.match(name)
+            if not match:
+                continue
+            try:
+                with open(os.path.join(self.multiproc_dir, name)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshot['alive'] = self._alive(int(match.group(1)))
+            snapshots.append(snapshot)
+        return snapshots
+
+    # Exposition
+
+    def collect(self):
+        """{name: (type, {labels tuple: value})} merged over this process or every worker."""
+        snapshots = self._snapshots()
+        multiprocess = self.multiproc_dir is not None
+        metrics = {}
+
+        def add(kind, name, labels, value):
+            series = metrics.setdefault(name, (kind, {}))[1]
+            key = tuple(labels.items())
+            if kind != 'histogram':
+                series[key] = series.get(key, 0) + value
+                return
+            total = series.get(key)
+            if total is None:
+                series[key] = {'bounds': value['bounds'], 'counts': list(value['counts']), 'sum': value['sum']}
+            else:
+                total['counts'] = [a + b for a, b in zip(total['counts'], value['counts'])]
+                total['sum'] += value['sum']
+
+        for snapshot in snapshots:
+            alive = snapshot.get('alive', True)
+            for kind, name, labels, value in snapshot['shared']:
+                # A dead worker's requests still happened; its in-flight count no longer applies
+                if kind != 'gauge' or alive:
+                    add(kind, name, labels, value)
+            if alive:
+                for kind, name, labels, value in snapshot['process']:
+                    add(kind, name, {**labels, 'pid': snapshot['pid']} if multiprocess else labels, value)
+        return metrics
+
+    def render(self):
+        lines = []
+        for name, (kind, series) in self.collect().items():
+            lines.append(f'# HELP {name} {HELP.get(name, "From the subsystem stats().")}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in series.items():
+                labels = dict(key)
+                if kind != 'histogram':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(value['bounds'], value['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, le=_number(float(bound)))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(float(value["sum"]))}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
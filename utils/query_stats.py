@@ -0,0 +1,244 @@
+import heapq
+import json
+import re
+import threading
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Like utils/db_routing.py this module does not import app; call query_stats.init_app(app, db).
+
+_IN_LIST = re.compile(r'\(\s*(\?|%\(\w+\)s|%s|:\w+)(\s*,\s*(\?|%\(\w+\)s|%s|:\w+))+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """SQL with whitespace collapsed and IN (?, ?, ...) lists folded, so repeats compare equal."""
+    return _IN_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+class TimedCursor:
+    """DBAPI cursor proxy that reports a statement's time once its rows have been fetched.
+
+    SQLite runs a query step by step as rows are fetched, so the time to
+    after_cursor_execute leaves out most of a scan. The engine hooks below
+    swap this proxy in for the execution context's cursor; each callback gets
+    the time up to the end of execute plus the time spent in fetch calls, once
+    SQLAlchemy closes the cursor (when the result is exhausted or closed).
+    """
+
+    __slots__ = ('_cursor', '_fetch_ms', '_callbacks')
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._fetch_ms = 0.0
+        self._callbacks = []
+
+    @classmethod
+    def on_done(cls, context, execute_ms, callback):
+        """Call callback(elapsed_ms) when the statement of `context` has been fetched and closed."""
+        cursor = context.cursor
+        if not isinstance(cursor, cls):
+            cursor = context.cursor = cls(cursor)
+        cursor._callbacks.append((execute_ms, callback))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._fetch_ms += (time.perf_counter() - started) * 1000
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def close(self):
+        callbacks, self._callbacks = self._callbacks, []
+        try:
+            self._cursor.close()
+        finally:
+            for execute_ms, callback in callbacks:
+                callback(execute_ms + self._fetch_ms)
+
+
+class RequestQueries:
+    """What one request sent to the database."""
+
+    __slots__ = ('started', 'count', 'total_ms', 'shapes', 'slowest')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+
+    def record(self, statement, elapsed_ms, keep):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if len(self.slowest) < keep:
+            heapq.heappush(self.slowest, (elapsed_ms, shape))
+        elif elapsed_ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (elapsed_ms, shape))
+
+    def repeated(self, threshold):
+        """(shape, times) for statements run at least `threshold` times: likely N+1 loops."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+
+class EndpointTotals:
+    __slots__ = ('requests', 'queries', 'sql_ms', 'max_queries', 'n_plus_one')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.max_queries = 0
+        self.n_plus_one = 0
+
+
+class QueryInstrumentation:
+    """Per-request SQL counting on engine cursor events, reported from Flask request hooks.
+
+    Each request gets its query count, total SQL time (execute plus fetching
+    the rows, see TimedCursor), its slowest
+    statements and any statement shape repeated `n_plus_one_threshold` or
+    more times (flagged as a likely N+1). In debug mode (or with
+    QUERY_SERVER_TIMING) this goes out as a Server-Timing header; flagged
+    requests are logged as one JSON line, and every request is added to
+    per-endpoint totals (see stats()). Queries outside a request
+    (background threads, CLI) are not counted.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.server_timing = False
+        self.n_plus_one_threshold = 5
+        self.slowest_kept = 3
+        self.log_min_queries = 50
+        self._logger = None
+        self._lock = threading.Lock()
+        self.endpoints = {}
+
+    def init_app(self, app, db):
+        self.enabled = app.config.get('QUERY_STATS_ENABLED', True)
+        if not self.enabled:
+            return
+        server_timing = app.config.get('QUERY_SERVER_TIMING')
+        self.server_timing = app.debug if server_timing is None else server_timing
+        self.n_plus_one_threshold = app.config.get('QUERY_N_PLUS_ONE_THRESHOLD', 5)
+        self.slowest_kept = app.config.get('QUERY_SLOWEST_PER_REQUEST', 3)
+        self.log_min_queries = app.config.get('QUERY_LOG_MIN_QUERIES', 50)
+        self._logger = app.logger
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+
+    # Engine events
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'query_started', None)
+        if started is None or not has_request_context():
+            return
+        queries = g.get('queries')
+        if queries is not None:
+            # Counted once the rows are fetched: that is when SQLite does most of the work
+            TimedCursor.on_done(
+                context, (time.perf_counter() - started) * 1000,
+                lambda elapsed_ms: queries.record(statement, elapsed_ms, self.slowest_kept)
+            )
+
+    # Request hooks
+
+    def before_request(self):
+        g.queries = RequestQueries()
+
+    def after_request(self, response):
+        queries = g.pop('queries', None)
+        if queries is None:
+            return response
+        elapsed_ms = (time.perf_counter() - queries.started) * 1000
+        repeated = queries.repeated(self.n_plus_one_threshold)
+        endpoint = request.endpoint or 'unmatched'
+
+        with self._lock:
+            totals = self.endpoints.get(endpoint)
+            if totals is None:
+                totals = self.endpoints[endpoint] = EndpointTotals()
+            totals.requests += 1
+            totals.queries += queries.count
+            totals.sql_ms += queries.total_ms
+            totals.max_queries = max(totals.max_queries, queries.count)
+            if repeated:
+                totals.n_plus_one += 1
+
+        if self.server_timing:
+            response.headers['Server-Timing'] = self._server_timing(queries, elapsed_ms, repeated)
+        if repeated or queries.count >= self.log_min_queries:
+            self._logger.warning(json.dumps({
+                'event': 'query_stats',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': endpoint,
+                'status': response.status_code,
+                'duration_ms': round(elapsed_ms, 2),
+                'queries': queries.count,
+                'sql_ms': round(queries.total_ms, 2),
+                'n_plus_one': [{'statement': shape[:500], 'times': times} for shape, times in repeated],
+                'slowest': [
+                    {'statement': shape[:500], 'ms': round(ms, 2)}
+                    for ms, shape in sorted(queries.slowest, reverse=True)
+                ]
+            }))
+        return response
+
+    def _server_timing(self, queries, elapsed_ms, repeated):
+        def describe(text):
+            return text.replace('"', "'").encode('ascii', 'replace').decode()[:100]
+
+        metrics = [
+            f'db;dur={queries.total_ms:.2f};desc="{queries.count} queries"',
+            f'app;dur={elapsed_ms:.2f}'
+        ]
+        for index, (ms, shape) in enumerate(sorted(queries.slowest, reverse=True)):
+            metrics.append(f'sql-{index + 1};dur={ms:.2f};desc="{describe(shape)}"')
+        for index, (shape, times) in enumerate(repeated):
+            metrics.append(f'n-plus-one-{index + 1};desc="{times}x {describe(shape)}"')
+        return ', '.join(metrics)
+
+    def stats(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    'requests': totals.requests,
+                    'queries': totals.queries,
+                    'avg_queries': round(totals.queries / totals.requests, 2),
+                    'max_queries': totals.max_queries,
+                    'sql_ms': round(totals.sql_ms, 2),
+                    'n_plus_one_requests': totals.n_plus_one
+                }
+                for endpoint, totals in self.endpoints.items()
+            }
+
+
+query_stats = QueryInstrumentation()
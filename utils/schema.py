@@ -0,0 +1,203 @@
+import click
+from datetime import datetime
+from sqlalchemy import inspect, text, select, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateTable
+from app import db
+from models import SchemaMigration, Ticket, TicketComment, ArchivedTicket, ArchivedTicketComment, ActivityLog
+from utils.activity_archive import segment_store
+from utils.clustering import site_clusters, STORED_ZOOMS
+from utils.spatial import install_spatial_index
+
+migrations_table = SchemaMigration.__table__
+
+
+def _column_ddl(connection, column):
+    column_type = column.type.compile(dialect=connection.dialect)
+    ddl = f'ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column_type}'
+    default = column.server_default
+    if default is not None:
+        ddl += f' DEFAULT {default.arg}'
+    return ddl
+
+
+def add_missing_columns(connection, tables=None):
+    """Add model columns the database lacks; they must be nullable or have a server default."""
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if tables is not None and table.name not in tables:
+            continue
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                connection.execute(text(_column_ddl(connection, column)))
+
+
+def create_indexes(connection, *names):
+    """Create indexes declared in models.py by name, skipping any that exist."""
+    indexes = {index.name: index for table in db.metadata.sorted_tables for index in table.indexes}
+    for name in names:
+        indexes[name].create(connection, checkfirst=True)
+
+
+def analyze(connection, *tables):
+    """Refresh planner statistics so new indexes are chosen; skipped on empty SQLite tables."""
+    for table in tables:
+        if connection.dialect.name == 'sqlite':
+            if connection.execute(text(f'SELECT 1 FROM {table} LIMIT 1')).first() is None:
+                continue
+        connection.execute(text(f'ANALYZE {table}'))
+
+
+def use_autoincrement(connection, table, archive_table=None, archived_id=0):
+    """Rebuild a SQLite table with AUTOINCREMENT so ids are never reused.
+
+    Rows moved to `archive_table` (or to files, up to `archived_id`) keep
+    their ids, so the sequence starts above the highest id archived or left
+    in the table.
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    name = table.name
+    created = connection.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': name}
+    ).scalar()
+    if 'AUTOINCREMENT' not in created.upper():
+        # Other tables reference this one; check those keys at commit, after the rename
+        connection.execute(text('PRAGMA defer_foreign_keys = ON'))
+        existing = {column['name'] for column in inspect(connection).get_columns(name)}
+        columns = ', '.join(column.name for column in table.columns if column.name in existing)
+        ddl = str(CreateTable(table).compile(dialect=connection.dialect)).strip()
+        connection.execute(text(ddl.replace(f'CREATE TABLE {name} ', f'CREATE TABLE _{name}_new ', 1)))
+        connection.execute(text(f'INSERT INTO _{name}_new ({columns}) SELECT {columns} FROM {name}'))
+        connection.execute(text(f'DROP TABLE {name}'))
+        connection.execute(text(f'ALTER TABLE _{name}_new RENAME TO {name}'))
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    highest = max(archived_id, connection.execute(text(f'SELECT coalesce(max(id), 0) FROM {name}')).scalar())
+    if archive_table is not None:
+        highest = max(highest, connection.execute(
+            text(f'SELECT coalesce(max(id), 0) FROM {archive_table.name}')
+        ).scalar())
+    connection.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': name})
+    connection.execute(text('INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)'),
+                       {'name': name, 'seq': highest})
+
+
+# Migrations
+#
+# Each runs once per database, in version order, inside one transaction that also
+# records it in schema_migrations. New databases get every table, column and index
+# from db.create_all() first, so migrations must be safe to run against them too
+# (checkfirst, IF NOT EXISTS). Never edit an applied migration; add a new version.
+
+def _baseline(connection):
+    # Everything upgrade_schema() used to add on startup before migrations were versioned
+    add_missing_columns(connection)
+    create_indexes(
+        connection,
+        'ix_tickets_status_due_at',
+        'ix_tickets_status_response_due_at',
+        'ix_tickets_status_priority_created_at',
+        'ix_tickets_status_completed_at',
+        'ix_ticket_comments_ticket_id_id',
+        'ix_sites_latitude_longitude',
+        'ix_activity_logs_target_type_target_id_id',
+        'ix_activity_logs_user_id_id',
+        'ix_activity_logs_created_at',
+        'ix_tickets_archive_client_id',
+        'ix_ticket_comments_archive_ticket_id',
+    )
+
+
+def _hot_query_indexes(connection):
+    # Checked by benchmarks/query_plans.py
+    create_indexes(
+        connection,
+        'ix_tickets_assigned_tech_id_status_completed_at',
+        'ix_tickets_client_id_status',
+        'ix_tickets_created_at',
+        'ix_tickets_completed_at',
+        'ix_routers_client_id',
+    )
+    analyze(connection, 'tickets', 'routers')
+
+
+def _sparse_cluster_levels(connection):
+    # Zooms between the stored levels are now grouped from the next finer one on read
+    connection.execute(site_clusters.delete().where(site_clusters.c.zoom.notin_(STORED_ZOOMS)))
+
+
+def _never_reuse_ticket_ids(connection):
+    # Archived tickets keep their ids; a reused id collides in tickets_archive
+    use_autoincrement(connection, Ticket.__table__, ArchivedTicket.__table__)
+    use_autoincrement(connection, TicketComment.__table__, ArchivedTicketComment.__table__)
+
+
+def _never_reuse_activity_ids(connection):
+    # Retention treats ids at or below the segment files' high-water mark as already archived
+    use_autoincrement(connection, ActivityLog.__table__, archived_id=segment_store.high_water_mark())
+
+
+def _activity_type_index(connection):
+    # /api/activity?target_type= on its own pages through every entry of that type
+    create_indexes(connection, 'ix_activity_logs_target_type_id')
+    analyze(connection, 'activity_logs')
+
+
+def _site_rtree(connection):
+    # Installed here rather than by the first bbox/nearby request, which may be on a replica
+    install_spatial_index(connection)
+
+
+MIGRATIONS = (
+    (1, 'Columns and indexes from before versioned migrations', _baseline),
+    (2, 'Indexes for technician, client, router and date-window queries', _hot_query_indexes),
+    (3, 'Cluster cells for every fourth zoom only', _sparse_cluster_levels),
+    (4, 'Never reuse ticket and comment ids', _never_reuse_ticket_ids),
+    (5, 'Never reuse activity log ids', _never_reuse_activity_ids),
+    (6, 'Index activity by target type alone', _activity_type_index),
+    (7, 'R*Tree index and triggers for site locations', _site_rtree),
+)
+
+
+def applied_migrations():
+    """{version: applied_at} for this database."""
+    with db.engine.connect() as connection:
+        return dict(connection.execute(select(migrations_table.c.version, migrations_table.c.applied_at)).all())
+
+
+def upgrade_schema():
+    """Create missing tables, then apply pending migrations in order; returns the versions applied."""
+    db.create_all()
+
+    done = applied_migrations()
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            with db.engine.begin() as connection:
+                # Claiming the version first serialises workers starting at the same time
+                connection.execute(insert(migrations_table).values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                ))
+                migrate(connection)
+        except IntegrityError:
+            # Another process applied it first
+            continue
+        applied.append(version)
+    return applied
+
+
+@click.command('schema-migrations')
+def schema_migrations_command():
+    """List schema migrations and when each was applied to this database."""
+    done = applied_migrations()
+    for version, name, _ in MIGRATIONS:
+        applied_at = done.get(version)
+        status = applied_at.strftime('%Y-%m-%d %H:%M:%S') if applied_at else 'pending'
+        click.echo(f'{version:>4}  {status:<19}  {name}')
@@ -4,6 +4,16 @@ from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 import random
 
+# Also created by utils/datagen.py, so these logins work on generated datasets too
+DEFAULT_USERS = [
+    {'name': 'Admin User', 'email': 'admin@company.com', 'password': 'admin123', 'role': 'admin'},
+    {'name': 'Sarah Johnson', 'email': 'sarah.johnson@company.com', 'password': 'agent123', 'role': 'agent'},
+    {'name': 'Mike Wilson', 'email': 'mike.wilson@company.com', 'password': 'tech123', 'role': 'technician'},
+    {'name': 'Lisa Chen', 'email': 'lisa.chen@company.com', 'password': 'agent123', 'role': 'agent'},
+    {'name': 'David Kim', 'email': 'david.kim@company.com', 'password': 'tech123', 'role': 'technician'},
+    {'name': 'Emily Brown', 'email': 'emily.brown@company.com', 'password': 'tech123', 'role': 'technician'},
+]
+
 def seed_database():
     with app.app_context():
         # Clear existing data   
@@ -11,17 +21,8 @@ def seed_database():
         db.create_all()
         
         # Create users
-        users_data = [
-            {'name': 'Admin User', 'email': 'admin@company.com', 'password': 'admin123', 'role': 'admin'},
-            {'name': 'Sarah Johnson', 'email': 'sarah.johnson@company.com', 'password': 'agent123', 'role': 'agent'},
-            {'name': 'Mike Wilson', 'email': 'mike.wilson@company.com', 'password': 'tech123', 'role': 'technician'},
-            {'name': 'Lisa Chen', 'email': 'lisa.chen@company.com', 'password': 'agent123', 'role': 'agent'},
-            {'name': 'David Kim', 'email': 'david.kim@company.com', 'password': 'tech123', 'role': 'technician'},
-            {'name': 'Emily Brown', 'email': 'emily.brown@company.com', 'password': 'tech123', 'role': 'technician'},
-        ]
-        
         users = []
-        for user_data in users_data:
+        for user_data in DEFAULT_USERS:
             user = User(
                 name=user_data['name'],
                 email=user_data['email'],
@@ -0,0 +1,233 @@
+from sqlalchemy import select, literal
+from sqlalchemy.orm import aliased
+from app import db
+from models import User, Client, Ticket, TicketComment, Router, Site, ArchivedTicket, ArchivedTicketComment
+
+
+MAX_CACHED_VIEWS = 256
+
+
+def _names(value):
+    """'a, b,a' -> ('a', 'b'); None when the parameter is absent."""
+    if value is None:
+        return None
+    return tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+
+class Serializer:
+    """Declarative, precompiled serializer for one model.
+
+    `fields` lists (name, column expression, join key or None) in output
+    order; `joins` maps a join key to the (target, onclause) outer join
+    that its fields need; `nested` maps a name to (child serializer,
+    foreign key column) for one-to-many collections. Rows come back as
+    plain tuples (no ORM objects are hydrated) and each becomes a dict by
+    zipping with the field names. Datetimes are left as-is for the JSON
+    provider to write as ISO 8601.
+
+    A sparse fieldset (?fields=, ?expand=) compiles its own select with
+    only those columns and only the joins they need; compiled selects are
+    cached per fieldset.
+    """
+
+    def __init__(self, model, fields, joins=None, nested=None):
+        self.model = model
+        self.fields = fields
+        self.joins = joins or {}
+        self.nested = nested or {}
+        self.names = tuple(name for name, _, _ in fields)
+        self._views = {}
+        self.statement = self._view(None, None)[1]
+
+    def fieldset(self, args, extra_fields=()):
+        """{'fields', 'expand'} from request args; ValueError names anything unknown.
+
+        Without ?fields= every field is returned; without ?expand= every
+        collection is, unless ?fields= was given. `extra_fields` are names
+        accepted here that only some other serializer fills in.
+        """
+        fields = _names(args.get('fields'))
+        expand = _names(args.get('expand'))
+        if fields is not None and not fields:
+            raise ValueError('fields must name at least one field')
+
+        unknown = [name for name in fields or () if name not in self.names and name not in extra_fields]
+        unknown += [name for name in expand or () if name not in self.nested]
+        if unknown:
+            allowed = ', '.join(self.names + tuple(extra_fields))
+            expandable = ', '.join(self.nested) or 'none'
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Fields: {allowed}. Expand: {expandable}")
+        return {'fields': fields, 'expand': expand}
+
+    def _view(self, fields, expand):
+        key = (frozenset(fields) if fields is not None else None, frozenset(expand) if expand is not None else None)
+        view = self._views.get(key)
+        if view is not None:
+            return view
+
+        if expand is None:
+            expand = () if fields is not None else tuple(self.nested)
+        selected = [field for field in self.fields if fields is None or field[0] in fields]
+        # Collections are matched on the parent id, which is dropped again if it was not asked for
+        hide_id = (bool(expand) or not selected) and not any(name == 'id' for name, _, _ in selected)
+        if hide_id:
+            selected.insert(0, ('id', self.model.id, None))
+
+        statement = select(*[column.label(name) for name, column, _ in selected]).select_from(self.model)
+        for join in dict.fromkeys(join for _, _, join in selected if join):
+            target, onclause = self.joins[join]
+            statement = statement.outerjoin(target, onclause)
+        view = (
+            tuple(name for name, _, _ in selected),
+            statement.order_by(self.model.id),
+            [(name, *self.nested[name]) for name in self.nested if name in expand],
+            hide_id
+        )
+
+        if len(self._views) >= MAX_CACHED_VIEWS:
+            self._views.clear()
+        self._views[key] = view
+        return view
+
+    def select(self, *criteria, fields=None, expand=None):
+        """The statement all() runs for these criteria and fieldset."""
+        return self._view(fields, expand)[1].where(*criteria)
+
+    def nested_select(self, name, *criteria):
+        """The statement that loads collection `name` for the parents matching criteria."""
+        child, foreign_key = self.nested[name]
+        # The parents' own criteria select the children, so a list costs one extra query however long it is
+        parent_ids = select(self.model.id).where(*criteria)
+        return child.statement.add_columns(foreign_key).where(foreign_key.in_(parent_ids))
+
+    def all(self, *criteria, fields=None, expand=None):
+        """Every matching row as a dict, ordered by id; each expanded collection costs one more query."""
+        names, statement, nested, hide_id = self._view(fields, expand)
+        results = [dict(zip(names, row)) for row in db.session.execute(statement.where(*criteria))]
+        if results:
+            for name, child, _ in nested:
+                self._attach(results, name, child, criteria)
+            if hide_id:
+                for result in results:
+                    del result['id']
+        return results
+
+    def one(self, id, fields=None, expand=None):
+        results = self.all(self.model.id == id, fields=fields, expand=expand)
+        return results[0] if results else None
+
+    def _attach(self, results, name, child, criteria):
+        names = child.names
+        grouped = {}
+        for row in db.session.execute(self.nested_select(name, *criteria)):
+            grouped.setdefault(row[-1], []).append(dict(zip(names, row)))
+        for result in results:
+            result[name] = grouped.get(result['id'], [])
+
+
+def _ticket_serializer(model, comment_model, extra_fields=()):
+    client = aliased(Client, name='client')
+    assigned_tech = aliased(User, name='assigned_tech')
+    creator = aliased(User, name='creator')
+    comment_user = aliased(User, name='comment_user')
+
+    comments = Serializer(comment_model, [
+        ('id', comment_model.id, None),
+        ('ticket_id', comment_model.ticket_id, None),
+        ('user_id', comment_model.user_id, None),
+        ('user_name', comment_user.name, 'user'),
+        ('comment', comment_model.comment, None),
+        ('created_at', comment_model.created_at, None),
+    ], joins={'user': (comment_user, comment_user.id == comment_model.user_id)})
+
+    return Serializer(model, [
+        ('id', model.id, None),
+        ('title', model.title, None),
+        ('description', model.description, None),
+        ('priority', model.priority, None),
+        ('status', model.status, None),
+        ('client_id', model.client_id, None),
+        ('client_name', client.name, 'client'),
+        ('assigned_tech_id', model.assigned_tech_id, None),
+        ('assigned_tech_name', assigned_tech.name, 'assigned_tech'),
+        ('created_by_id', model.created_by_id, None),
+        ('created_by_name', creator.name, 'creator'),
+        ('time_spent', model.time_spent, None),
+        ('created_at', model.created_at, None),
+        ('updated_at', model.updated_at, None),
+        ('completed_at', model.completed_at, None),
+        ('response_due_at', model.response_due_at, None),
+        ('due_at', model.due_at, None),
+        ('first_response_at', model.first_response_at, None),
+        ('sla_state', model.sla_state, None),
+        ('sla_breached_at', model.sla_breached_at, None),
+        ('duplicate_of_id', model.duplicate_of_id, None),
+        *extra_fields,
+    ], joins={
+        'client': (client, client.id == model.client_id),
+        'assigned_tech': (assigned_tech, assigned_tech.id == model.assigned_tech_id),
+        'creator': (creator, creator.id == model.created_by_id),
+    }, nested={'comments': (comments, comment_model.ticket_id)})
+
+
+# Full output is the same as the models' to_dict, which stays for single objects returned after writes
+
+TICKET = _ticket_serializer(Ticket, TicketComment)
+
+ARCHIVED_TICKET = _ticket_serializer(ArchivedTicket, ArchivedTicketComment, extra_fields=(
+    ('archived', literal(True), None),
+    ('archived_at', ArchivedTicket.archived_at, None),
+))
+
+# Accepted in ?fields= wherever archived tickets may be returned; hot tickets simply lack them
+ARCHIVED_ONLY_FIELDS = ('archived', 'archived_at')
+
+_router_client = aliased(Client, name='client')
+
+ROUTER = Serializer(Router, [
+    ('id', Router.id, None),
+    ('model', Router.model, None),
+    ('serial_number', Router.serial_number, None),
+    ('status', Router.status, None),
+    ('client_id', Router.client_id, None),
+    ('client_name', _router_client.name, 'client'),
+    ('location', Router.location, None),
+    ('last_seen', Router.last_seen, None),
+    ('created_at', Router.created_at, None),
+    ('updated_at', Router.updated_at, None),
+], joins={'client': (_router_client, _router_client.id == Router.client_id)})
+
+CLIENT = Serializer(Client, [
+    ('id', Client.id, None),
+    ('name', Client.name, None),
+    ('email', Client.email, None),
+    ('phone', Client.phone, None),
+    ('address', Client.address, None),
+    ('status', Client.status, None),
+    ('created_at', Client.created_at, None),
+    ('updated_at', Client.updated_at, None),
+])
+
+SITE = Serializer(Site, [
+    ('id', Site.id, None),
+    ('name', Site.name, None),
+    ('description', Site.description, None),
+    ('lat', Site.latitude, None),
+    ('lng', Site.longitude, None),
+    ('type', Site.site_type, None),
+    ('status', Site.status, None),
+    ('address', Site.address, None),
+    ('contact', Site.contact, None),
+    ('created_at', Site.created_at, None),
+    ('updated_at', Site.updated_at, None),
+])
+
+USER = Serializer(User, [
+    ('id', User.id, None),
+    ('name', User.name, None),
+    ('email', User.email, None),
+    ('role', User.role, None),
+    ('status', User.status, None),
+    ('created_at', User.created_at, None),
+    ('updated_at', User.updated_at, None),
+])
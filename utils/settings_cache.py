@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from flask import request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from sqlalchemy import select
+from app import app, db
+from models import SystemSettings, User
+from utils.cache_versions import get_version, bump_version
+
+CACHE_KEY = 'system_settings'
+
+
+def parse_bool(value):
+    return str(value).strip().lower() in ('true', '1', 'yes', 'on')
+
+
+# Minutes to first response / resolution per ticket priority
+DEFAULT_SLA_POLICIES = {
+    'critical': {'response_minutes': 15, 'resolution_minutes': 240},
+    'high': {'response_minutes': 60, 'resolution_minutes': 480},
+    'medium': {'response_minutes': 240, 'resolution_minutes': 1440},
+    'low': {'response_minutes': 480, 'resolution_minutes': 4320}
+}
+
+
+def parse_sla_policies(value):
+    policies = json.loads(value) if isinstance(value, str) else value
+    if not isinstance(policies, dict):
+        raise ValueError('sla_policies must be an object keyed by priority')
+
+    merged = {priority: dict(policy) for priority, policy in DEFAULT_SLA_POLICIES.items()}
+    for priority, policy in policies.items():
+        if not isinstance(policy, dict):
+            raise ValueError(f'SLA policy for {priority} must be an object')
+        target = merged.setdefault(priority, {})
+        for field in ('response_minutes', 'resolution_minutes'):
+            if field in policy:
+                minutes = int(policy[field])
+                if minutes <= 0:
+                    raise ValueError(f'{field} must be positive')
+                target[field] = minutes
+    return merged
+
+
+# Known settings: (parser, default). Unknown keys are kept as strings.
+SETTING_TYPES = {
+    'enable_tech_site_add': (parse_bool, True),
+    'maintenance_mode': (parse_bool, False),
+    'enable_notifications': (parse_bool, True),
+    'auto_save_interval': (int, 5),
+    'max_file_size': (int, 10),
+    'session_timeout': (int, 60),
+    'backup_frequency': (str, 'daily'),
+    'email_notifications': (parse_bool, False),
+    'sla_policies': (parse_sla_policies, DEFAULT_SLA_POLICIES),
+    'sla_warning_percent': (int, 80)
+}
+
+
+def parse_setting(key, value):
+    parser, default = SETTING_TYPES.get(key, (str, None))
+    try:
+        return parser(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def serialize_setting(value):
+    """Store structured values as JSON and scalars as their string form."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+class SettingsSnapshot:
+    """Parsed, immutable view of the system_settings table at one version."""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.values = {key: default for key, (_, default) in SETTING_TYPES.items()}
+        for key, value in rows:
+            self.values[key] = parse_setting(key, value)
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def __getitem__(self, key):
+        return self.values[key]
+
+
+class SettingsCache:
+    """Per-process settings snapshot revalidated against the shared version counter.
+
+    At most one version lookup per `revalidate_seconds`; the table itself is
+    only re-read when another worker (or this one) has bumped the version.
+    """
+
+    def __init__(self, revalidate_seconds):
+        self.revalidate_seconds = revalidate_seconds
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.revalidations = 0
+
+    def _load(self, version):
+        rows = db.session.execute(select(SystemSettings.key, SystemSettings.value)).all()
+        self.reloads += 1
+        return SettingsSnapshot(version, rows)
+
+    def get(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._checked_at < self.revalidate_seconds:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and now - self._checked_at < self.revalidate_seconds:
+                return snapshot
+
+            version = get_version(CACHE_KEY)
+            self.revalidations += 1
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(version)
+                self._snapshot = snapshot
+            self._checked_at = now
+            return snapshot
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def stats(self):
+        return {
+            'version': self._snapshot.version if self._snapshot else None,
+            'reloads': self.reloads,
+            'revalidations': self.revalidations
+        }
+
+
+settings_cache = SettingsCache(app.config.get('SETTINGS_REVALIDATE_SECONDS', 2.0))
+
+
+def get_settings():
+    return settings_cache.get()
+
+
+def upsert_settings(data, describe, categorize):
+    """Create or update many settings with one SELECT, bumping the shared version.
+
+    The caller commits; the local snapshot is invalidated so the next read
+    picks up the new version.
+    """
+    keys = list(data.keys())
+    existing = {
+        setting.key: setting
+        for setting in SystemSettings.query.filter(SystemSettings.key.in_(keys)).all()
+    } if keys else {}
+
+    updated = []
+    for key, value in data.items():
+        setting = existing.get(key)
+        if setting:
+            setting.value = serialize_setting(value)
+        else:
+            setting = SystemSettings(
+                key=key,
+                value=serialize_setting(value),
+                description=describe(key),
+                category=categorize(key)
+            )
+            db.session.add(setting)
+        updated.append(setting)
+
+    if updated:
+        bump_version(CACHE_KEY)
+    settings_cache.invalidate()
+    return updated
+
+
+def current_user_role():
+    """Role of the authenticated user, or None for anonymous/invalid tokens."""
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        return None
+    if identity is None:
+        return None
+    # Query.get hits the identity map, so the route's own lookup is free afterwards
+    user = User.query.get(int(identity))
+    return user.role if user else None
+
+
+MAINTENANCE_EXEMPT_PATHS = ('/api/health', '/api/auth/login', '/api/metrics')
+
+
+def enforce_maintenance_mode():
+    """Only admins may use the API while maintenance_mode is on."""
+    if request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+    if request.path.rstrip('/') in MAINTENANCE_EXEMPT_PATHS:
+        return None
+    if not get_settings()['maintenance_mode']:
+        return None
+
+    if current_user_role() != 'admin':
+        return jsonify({'error': 'System is under maintenance'}), 503
+    return None
@@ -0,0 +1,343 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, union_all, or_, and_, func, case
+from app import app, db
+from models import Ticket
+from utils.settings_cache import get_settings
+
+OPEN_STATUSES = ('pending', 'in-progress')
+
+
+def compute_deadlines(ticket, policies=None):
+    """Set response/resolution deadlines on a ticket from its priority's policy.
+
+    A ticket whose new deadlines are all still ahead goes back to 'ok', so it
+    is scheduled and warned again.
+    """
+    policies = policies or get_settings()['sla_policies']
+    policy = policies.get(ticket.priority) or policies.get('medium') or {}
+    if ticket.created_at is None:
+        ticket.created_at = datetime.utcnow()
+    start = ticket.created_at
+
+    ticket.response_due_at = start + timedelta(minutes=policy['response_minutes']) if policy.get('response_minutes') else None
+    ticket.due_at = start + timedelta(minutes=policy['resolution_minutes']) if policy.get('resolution_minutes') else None
+
+    # A warning or breach only stands if one of the new deadlines has also been missed
+    now = datetime.utcnow()
+    if ticket.first_response_at is None:
+        response_missed = ticket.response_due_at is not None and ticket.response_due_at <= now
+    else:
+        response_missed = ticket.response_due_at is not None and ticket.first_response_at > ticket.response_due_at
+    missed = response_missed or (ticket.due_at is not None and ticket.due_at <= now)
+    if ticket.sla_state is None or not missed:
+        ticket.sla_state = 'ok'
+        ticket.sla_breached_at = None
+
+
+def record_response(ticket, when=None):
+    """Mark the first response (status change or comment) if not already set."""
+    if ticket.first_response_at is None:
+        ticket.first_response_at = when or datetime.utcnow()
+
+
+def _warning_time(start, deadline, percent):
+    if start is None or deadline is None:
+        return None
+    return start + (deadline - start) * (percent / 100.0)
+
+
+class SLAScheduler:
+    """Fires SLA warning/breach events from a min-heap of upcoming deadlines.
+
+    Only tickets with a deadline inside `horizon` are held; they are loaded
+    with an index range scan on (status, due_at) / (status, response_due_at)
+    every `reload_seconds`, and routes push changes directly via `schedule`.
+    Heap entries are validated against `_deadlines` when popped, and state
+    transitions are conditional UPDATEs so several workers never double-fire.
+    """
+
+    def __init__(self, horizon_seconds, reload_seconds, max_events=500):
+        self.horizon = timedelta(seconds=horizon_seconds)
+        self.reload_seconds = reload_seconds
+        self._heap = []
+        self._deadlines = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._loaded_at = None
+        self.events = deque(maxlen=max_events)
+        self.listeners = []
+        self.fired = {'warning': 0, 'breach': 0}
+
+    # Scheduling
+
+    def schedule(self, ticket, warning_percent=None):
+        """(Re)schedule a ticket's pending SLA events after it was created or changed."""
+        if warning_percent is None:
+            warning_percent = get_settings()['sla_warning_percent']
+
+        key = (ticket.response_due_at, ticket.due_at, ticket.first_response_at, ticket.status, ticket.sla_state)
+        with self._lock:
+            if self._deadlines.get(ticket.id) == key:
+                return
+            self._deadlines[ticket.id] = key
+
+            if ticket.status not in OPEN_STATUSES or ticket.sla_state == 'breached':
+                self._deadlines.pop(ticket.id, None)
+                return
+
+            now = datetime.utcnow()
+            limit = now + self.horizon
+            targets = [('resolution', ticket.due_at)]
+            if ticket.first_response_at is None:
+                targets.append(('response', ticket.response_due_at))
+
+            for kind, deadline in targets:
+                if deadline is None or deadline > limit:
+                    continue
+                if ticket.sla_state == 'ok' and deadline > now:
+                    warn_at = _warning_time(ticket.created_at, deadline, warning_percent)
+                    if warn_at is not None:
+                        heapq.heappush(self._heap, (warn_at, next(self._seq), ticket.id, kind, 'warning', key))
+                heapq.heappush(self._heap, (deadline, next(self._seq), ticket.id, kind, 'breach', key))
+
+        self._wakeup.set()
+
+    def forget(self, ticket_id):
+        with self._lock:
+            self._deadlines.pop(ticket_id, None)
+
+    def load_window(self):
+        """Schedule every open ticket whose deadline falls inside the horizon."""
+        limit = datetime.utcnow() + self.horizon
+        tickets = Ticket.query.filter(
+            Ticket.status.in_(OPEN_STATUSES),
+            or_(
+                Ticket.due_at <= limit,
+                and_(Ticket.response_due_at <= limit, Ticket.first_response_at.is_(None))
+            ),
+            or_(Ticket.sla_state.is_(None), Ticket.sla_state != 'breached')
+        ).all()
+
+        warning_percent = get_settings()['sla_warning_percent']
+        for ticket in tickets:
+            self.schedule(ticket, warning_percent)
+        self._loaded_at = time.monotonic()
+
+    def backfill(self, batch_size=500):
+        """Compute deadlines for open tickets created before SLA tracking existed."""
+        policies = get_settings()['sla_policies']
+        last_id = 0
+        while True:
+            tickets = Ticket.query.filter(
+                Ticket.id > last_id,
+                Ticket.status.in_(OPEN_STATUSES),
+                Ticket.due_at.is_(None)
+            ).order_by(Ticket.id).limit(batch_size).all()
+            if not tickets:
+                return
+            for ticket in tickets:
+                compute_deadlines(ticket, policies)
+            last_id = tickets[-1].id
+            db.session.commit()
+
+    # Firing
+
+    def _transition(self, ticket_id, kind, event, now):
+        """Conditionally move a ticket to warning/breached; True if this call won."""
+        deadline = Ticket.due_at if kind == 'resolution' else Ticket.response_due_at
+        conditions = [Ticket.id == ticket_id, Ticket.status.in_(OPEN_STATUSES)]
+        if kind == 'response':
+            conditions.append(Ticket.first_response_at.is_(None))
+
+        if event == 'breach':
+            conditions += [deadline <= now, or_(Ticket.sla_state.is_(None), Ticket.sla_state != 'breached')]
+            values = {'sla_state': 'breached', 'sla_breached_at': now}
+        else:
+            conditions.append(or_(Ticket.sla_state.is_(None), Ticket.sla_state == 'ok'))
+            values = {'sla_state': 'warning'}
+
+        result = db.session.execute(update(Ticket).where(*conditions).values(**values))
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _emit(self, ticket_id, kind, event, deadline):
+        payload = {
+            'ticket_id': ticket_id,
+            'kind': kind,
+            'event': event,
+            'deadline': deadline.isoformat(),
+            'fired_at': datetime.utcnow().isoformat()
+        }
+        self.events.append(payload)
+        self.fired[event] += 1
+        app.logger.warning('SLA %s: ticket %s %s deadline %s', event, ticket_id, kind, payload['deadline'])
+        for listener in list(self.listeners):
+            try:
+                listener(payload)
+            except Exception:
+                app.logger.exception('SLA listener failed')
+
+    def _pop_due(self, now):
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, _, ticket_id, kind, event, key = heapq.heappop(self._heap)
+                if self._deadlines.get(ticket_id) == key:
+                    due.append((ticket_id, kind, event, key))
+        return due
+
+    def _next_wait(self):
+        with self._lock:
+            if not self._heap:
+                return self.reload_seconds
+            delay = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+        return max(0.0, min(delay, self.reload_seconds))
+
+    def tick(self):
+        """Reload the window if due and fire every event whose time has come."""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.reload_seconds:
+            self.load_window()
+
+        now = datetime.utcnow()
+        for ticket_id, kind, event, key in self._pop_due(now):
+            deadline = key[1] if kind == 'resolution' else key[0]
+            if self._transition(ticket_id, kind, event, now):
+                self._emit(ticket_id, kind, event, deadline)
+            if event == 'breach':
+                self.forget(ticket_id)
+
+    def _run(self):
+        with app.app_context():
+            self.backfill()
+        while True:
+            try:
+                with app.app_context():
+                    self.tick()
+            except Exception:
+                app.logger.exception('SLA scheduler tick failed')
+            self._wakeup.wait(self._next_wait())
+            self._wakeup.clear()
+
+    def start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='sla-scheduler', daemon=True)
+                    self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {'scheduled': len(self._heap), 'tracked_tickets': len(self._deadlines), **self.fired}
+
+
+sla_scheduler = SLAScheduler(
+    app.config.get('SLA_HORIZON_SECONDS', 3600),
+    app.config.get('SLA_RELOAD_SECONDS', 60)
+)
+
+
+def start_sla_scheduler():
+    """before_request hook: start the scheduler thread in each serving process."""
+    if app.config.get('SLA_SCHEDULER_ENABLED', True):
+        sla_scheduler.start()
+
+
+def at_risk_query(limit_at, limit, tech_id=None):
+    """(id, next deadline) of open tickets with a deadline up to limit_at, soonest first."""
+    # One index range scan per open status and deadline, on (status, due_at) and
+    # (status, response_due_at), each read in index order and cut to `limit` in SQL,
+    # so the overdue backlog is never loaded. A ticket's next deadline is the earlier
+    # of its two, so the first `limit` by that are among the first `limit` of some scan.
+    tech = [Ticket.assigned_tech_id == tech_id] if tech_id is not None else []
+    scans = []
+    for status in OPEN_STATUSES:
+        scans.append(select(Ticket.id, Ticket.due_at.label('deadline')).where(
+            Ticket.status == status, Ticket.due_at <= limit_at, *tech
+        ).order_by(Ticket.due_at).limit(limit).subquery())
+        scans.append(select(Ticket.id, Ticket.response_due_at.label('deadline')).where(
+            Ticket.status == status, Ticket.response_due_at <= limit_at,
+            Ticket.first_response_at.is_(None), *tech
+        ).order_by(Ticket.response_due_at).limit(limit).subquery())
+    candidates = union_all(*[select(scan) for scan in scans]).subquery()
+
+    deadline = func.min(candidates.c.deadline)
+    return select(candidates.c.id, deadline).group_by(candidates.c.id).order_by(deadline, candidates.c.id).limit(limit)
+
+
+def at_risk_tickets(within_minutes, limit, tech_id=None):
+    """Open tickets breached or due within the window, soonest deadline first."""
+    now = datetime.utcnow()
+    rows = db.session.execute(at_risk_query(now + timedelta(minutes=within_minutes), limit, tech_id)).all()
+    tickets = {ticket.id: ticket for ticket in Ticket.query.filter(Ticket.id.in_([row[0] for row in rows]))}
+    return [(tickets[ticket_id], next_deadline) for ticket_id, next_deadline in rows], now
+
+
+def sla_compliance_query(start_date, now):
+    """Per priority: tickets created since start_date, then met and missed resolution and response deadlines."""
+    resolved_in_time = case(
+        (and_(Ticket.completed_at.isnot(None), Ticket.completed_at <= Ticket.due_at), 1), else_=0
+    )
+    resolved_late = case(
+        (and_(Ticket.completed_at.isnot(None), Ticket.completed_at > Ticket.due_at), 1), else_=0
+    )
+    open_overdue = case(
+        (and_(Ticket.completed_at.is_(None), Ticket.due_at < now), 1), else_=0
+    )
+    responded_in_time = case(
+        (and_(Ticket.first_response_at.isnot(None), Ticket.first_response_at <= Ticket.response_due_at), 1), else_=0
+    )
+    response_missed = case(
+        (or_(Ticket.first_response_at > Ticket.response_due_at,
+             and_(Ticket.first_response_at.is_(None), Ticket.response_due_at < now)), 1), else_=0
+    )
+
+    return select(
+        Ticket.priority,
+        func.count(Ticket.id),
+        func.sum(resolved_in_time),
+        func.sum(resolved_late),
+        func.sum(open_overdue),
+        func.sum(responded_in_time),
+        func.sum(response_missed)
+    ).where(
+        Ticket.created_at >= start_date,
+        Ticket.due_at.isnot(None)
+    ).group_by(Ticket.priority)
+
+
+def sla_compliance(start_date):
+    """Per-priority SLA compliance for tickets created since start_date, in one grouped query."""
+    rows = db.session.execute(sla_compliance_query(start_date, datetime.utcnow())).all()
+
+    def rate(met, missed):
+        total = met + missed
+        return round(met / total * 100, 2) if total else None
+
+    by_priority = []
+    totals = [0, 0, 0, 0, 0, 0]
+    for priority, count, in_time, late, overdue, responded, missed in rows:
+        values = [count, in_time or 0, late or 0, overdue or 0, responded or 0, missed or 0]
+        totals = [a + b for a, b in zip(totals, values)]
+        by_priority.append({
+            'priority': priority,
+            'tickets': values[0],
+            'resolved_in_time': values[1],
+            'resolved_late': values[2],
+            'open_overdue': values[3],
+            'resolution_compliance': rate(values[1], values[2] + values[3]),
+            'response_compliance': rate(values[4], values[5])
+        })
+
+    return {
+        'tickets': totals[0],
+        'resolution_compliance': rate(totals[1], totals[2] + totals[3]),
+        'response_compliance': rate(totals[4], totals[5]),
+        'by_priority': by_priority
+    }
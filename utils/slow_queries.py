@@ -0,0 +1,225 @@
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date, datetime
+from decimal import Decimal
+from flask import has_request_context, request
+from sqlalchemy import event
+from utils.query_stats import statement_shape, TimedCursor
+
+# Like utils/query_stats.py this module does not import app; call slow_query_log.init_app(app, db).
+
+EXPLAINABLE = ('select', 'with')
+MAX_CACHED_PLANS = 256
+
+
+def _redact_value(value):
+    # Ids, numbers and dates say which rows were touched; strings may be names, emails or hashes
+    if value is None or isinstance(value, (bool, int, float, Decimal)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return f'<str:{len(value)}>'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<bytes:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def redact(parameters):
+    if isinstance(parameters, dict):
+        return {key: _redact_value(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_value(value) for value in parameters]
+    return _redact_value(parameters)
+
+
+def _sqlite_plan(rows):
+    """EXPLAIN QUERY PLAN rows (id, parent, notused, detail) as indented lines."""
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def explain_plan(connection, statement, parameters=()):
+    """The plan of a DBAPI-level statement as text lines: EXPLAIN QUERY PLAN on SQLite, EXPLAIN elsewhere."""
+    if connection.dialect.name == 'sqlite':
+        return _sqlite_plan(connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all())
+    rows = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).all()
+    return [' '.join(str(value) for value in row) for row in rows]
+
+
+def full_scans(dialect, plan):
+    """Tables the plan reads in full: what a missing index looks like."""
+    tables = []
+    for line in plan:
+        line = line.strip()
+        if dialect == 'sqlite' and line.startswith('SCAN ') and ' USING ' not in line:
+            tables.append(line.split()[1])
+        elif 'Seq Scan on ' in line:
+            tables.append(line.split('Seq Scan on ', 1)[1].split()[0])
+    return tables
+
+
+class SlowQueryLog:
+    """Statements slower than SLOW_QUERY_MS, kept in a ring buffer with their plans.
+
+    A statement's time runs from execute until its rows have been fetched
+    (see utils/query_stats.py TimedCursor), not just to the end of execute.
+
+    Each entry has the statement's shape (see utils/query_stats.py), its
+    parameters with strings and bytes redacted, and the route (or
+    background thread) that ran it. SELECTs are explained after the fact by
+    one background thread on a connection of the same engine (EXPLAIN QUERY
+    PLAN on SQLite, EXPLAIN elsewhere; never ANALYZE, so nothing is run
+    twice), which fills in `plan` and the tables it scans in full. Plans are
+    cached per shape and the explain queue is bounded: when it is full the
+    entry is kept without a plan.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.threshold_ms = 200
+        self.explain = True
+        self.entries = deque(maxlen=200)
+        self.recorded = 0
+        self.explained = 0
+        self.explain_errors = 0
+        self.explain_dropped = 0
+        self._logger = None
+        self._lock = threading.Lock()
+        self._plans = OrderedDict()
+        self._queue = queue.Queue(maxsize=100)
+        self._worker = None
+
+    def init_app(self, app, db):
+        self.threshold_ms = app.config.get('SLOW_QUERY_MS', 200)
+        self.enabled = self.threshold_ms > 0
+        if not self.enabled:
+            return
+        self.explain = app.config.get('SLOW_QUERY_EXPLAIN', True)
+        self.entries = deque(maxlen=app.config.get('SLOW_QUERY_BUFFER_SIZE', 200))
+        self._logger = app.logger
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    # Engine events
+
+    def _before_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, connection, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'slow_query_started', None)
+        if started is None or threading.current_thread() is self._worker:
+            return
+        engine = connection.engine
+
+        def done(elapsed_ms):
+            if elapsed_ms >= self.threshold_ms:
+                self.record(engine, statement, parameters, executemany, elapsed_ms)
+
+        # Timed through fetching the rows, where SQLite does most of a scan's work
+        TimedCursor.on_done(context, (time.perf_counter() - started) * 1000, done)
+
+    # Recording
+
+    def record(self, engine, statement, parameters, executemany, elapsed_ms):
+        shape = statement_shape(statement)
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'ms': round(elapsed_ms, 2),
+            'statement': shape,
+            'parameters': redact(parameters[0] if executemany and parameters else parameters),
+            'batch_size': len(parameters) if executemany else None,
+            'database': engine.url.database if engine.dialect.name == 'sqlite' else engine.url.host,
+            'dialect': engine.dialect.name,
+            'plan': None,
+            'plan_status': 'skipped',
+            'full_scans': []
+        }
+        if has_request_context():
+            entry.update({'method': request.method, 'path': request.path, 'endpoint': request.endpoint})
+        else:
+            entry['thread'] = threading.current_thread().name
+
+        if self.explain and not executemany and shape.lstrip('( ').lower().startswith(EXPLAINABLE):
+            cached = self._plans.get(shape)
+            if cached is not None:
+                entry.update(plan=cached, plan_status='cached', full_scans=full_scans(entry['dialect'], cached))
+            else:
+                entry['plan_status'] = 'pending'
+                try:
+                    self._queue.put_nowait((entry, engine, statement, parameters))
+                    self._ensure_worker()
+                except queue.Full:
+                    entry['plan_status'] = 'dropped'
+                    self.explain_dropped += 1
+
+        with self._lock:
+            self.entries.append(entry)
+            self.recorded += 1
+        self._logger.warning(json.dumps({
+            'event': 'slow_query',
+            'ms': entry['ms'],
+            'endpoint': entry.get('endpoint'),
+            'statement': shape[:500]
+        }))
+
+    # Explaining (background thread)
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='slow-query-explain', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            entry, engine, statement, parameters = self._queue.get()
+            try:
+                plan = self._plans.get(entry['statement'])
+                if plan is None:
+                    with engine.connect() as connection:
+                        plan = explain_plan(connection, statement, parameters)
+                    self._plans[entry['statement']] = plan
+                    if len(self._plans) > MAX_CACHED_PLANS:
+                        self._plans.popitem(last=False)
+                    self.explained += 1
+                entry.update(plan=plan, plan_status='done', full_scans=full_scans(engine.dialect.name, plan))
+            except Exception as e:
+                self.explain_errors += 1
+                entry.update(plan_status='error', plan=[str(e)[:500]])
+
+    def recent(self, limit=None):
+        """Newest first."""
+        with self._lock:
+            # Copies: the explain thread may still be filling in a plan
+            entries = [dict(entry) for entry in self.entries]
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'threshold_ms': self.threshold_ms,
+            'recorded': self.recorded,
+            'buffered': len(self.entries),
+            'explained': self.explained,
+            'explain_errors': self.explain_errors,
+            'explain_dropped': self.explain_dropped,
+            'explain_queued': self._queue.qsize()
+        }
+
+
+slow_query_log = SlowQueryLog()
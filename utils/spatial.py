@@ -0,0 +1,224 @@
+import math
+from sqlalchemy import event, text, select, table, column
+from sqlalchemy.exc import OperationalError
+from app import db
+from models import Site
+
+EARTH_RADIUS_KM = 6371.0088
+# Must match the haversine's sphere, or the prefilter box is smaller than the radius
+KM_PER_DEGREE_LAT = math.radians(EARTH_RADIUS_KM)
+
+# SQLite R*Tree holding one degenerate box (a point) per site. It is not part of
+# the SQLAlchemy metadata, so it is created/dropped alongside the sites table (and
+# added to existing databases by a schema migration) and kept in sync by triggers,
+# which covers every writer (routes, imports, seeding).
+site_rtree = table(
+    'site_rtree',
+    column('id'),
+    column('min_lat'),
+    column('max_lat'),
+    column('min_lng'),
+    column('max_lng')
+)
+
+RTREE_TRIGGERS = ('site_rtree_insert', 'site_rtree_update', 'site_rtree_delete')
+
+RTREE_DDL = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS site_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng)',
+    '''CREATE TRIGGER IF NOT EXISTS site_rtree_insert AFTER INSERT ON sites BEGIN
+        INSERT INTO site_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS site_rtree_update AFTER UPDATE OF id, latitude, longitude ON sites BEGIN
+        DELETE FROM site_rtree WHERE id = old.id;
+        INSERT INTO site_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS site_rtree_delete AFTER DELETE ON sites BEGIN
+        DELETE FROM site_rtree WHERE id = old.id;
+    END'''
+]
+
+# Engines (by URL) whose spatial index has been detected in this process
+_ready = {}
+
+
+def _is_sqlite(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def _install_rtree(connection):
+    """Create the R*Tree and its triggers, then (re)build it from the sites table."""
+    for statement in RTREE_DDL:
+        connection.execute(text(statement))
+    connection.execute(text('DELETE FROM site_rtree'))
+    connection.execute(text(
+        'INSERT INTO site_rtree (id, min_lat, max_lat, min_lng, max_lng) '
+        'SELECT id, latitude, latitude, longitude, longitude FROM sites'
+    ))
+
+
+def _rtree_installed(connection):
+    names = connection.execute(text(
+        "SELECT name FROM sqlite_master WHERE name = 'site_rtree' OR "
+        "(type = 'trigger' AND name IN ('site_rtree_insert', 'site_rtree_update', 'site_rtree_delete'))"
+    )).scalars().all()
+    return 'site_rtree' in names and all(trigger in names for trigger in RTREE_TRIGGERS)
+
+
+def install_spatial_index(connection):
+    """Install the R*Tree on SQLite if missing; returns the strategy queries will use.
+
+    Without the R*Tree module (or on other databases) queries fall back to the
+    ix_sites_latitude_longitude B-tree index declared on Site.
+    """
+    if not _is_sqlite(connection):
+        return 'btree'
+    try:
+        if not _rtree_installed(connection):
+            _install_rtree(connection)
+        return 'rtree'
+    except OperationalError:
+        # SQLite built without the R*Tree module
+        for index in Site.__table__.indexes:
+            index.create(connection, checkfirst=True)
+        return 'btree'
+
+
+@event.listens_for(Site.__table__, 'after_create')
+def _create_spatial_index(target, connection, **kw):
+    _ready[str(connection.engine.url)] = install_spatial_index(connection)
+
+
+@event.listens_for(Site.__table__, 'before_drop')
+def _drop_spatial_index(target, connection, **kw):
+    if _is_sqlite(connection):
+        connection.execute(text('DROP TABLE IF EXISTS site_rtree'))
+    _ready.pop(str(connection.engine.url), None)
+
+
+def spatial_strategy():
+    """Return the index strategy for the current engine: 'rtree' if installed, else 'btree'."""
+    url = str(db.engine.url)
+    if url in _ready:
+        return _ready[url]
+
+    with db.engine.connect() as connection:
+        strategy = 'rtree' if _is_sqlite(connection) and _rtree_installed(connection) else 'btree'
+
+    _ready[url] = strategy
+    return strategy
+
+
+def parse_bbox(value):
+    """Parse 'minLng,minLat,maxLng,maxLat' into a tuple of floats."""
+    try:
+        min_lng, min_lat, max_lng, max_lat = [float(part) for part in value.split(',')]
+    except ValueError:
+        raise ValueError('bbox must be minLng,minLat,maxLng,maxLat')
+
+    if not all(math.isfinite(v) for v in (min_lng, min_lat, max_lng, max_lat)):
+        raise ValueError('bbox coordinates must be finite numbers')
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError('bbox latitudes must satisfy -90 <= minLat <= maxLat <= 90')
+    if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise ValueError('bbox longitudes must be between -180 and 180')
+
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def _box_filter(strategy, min_lat, max_lat, min_lng, max_lng):
+    exact = db.and_(
+        Site.latitude.between(min_lat, max_lat),
+        Site.longitude.between(min_lng, max_lng)
+    )
+    if strategy != 'rtree':
+        return exact
+
+    # R*Tree coordinates are stored as 32-bit floats and rounded outwards, so
+    # the tree gives the candidate ids and the exact predicate trims the edges.
+    candidates = select(site_rtree.c.id).where(
+        site_rtree.c.min_lat <= max_lat,
+        site_rtree.c.max_lat >= min_lat,
+        site_rtree.c.min_lng <= max_lng,
+        site_rtree.c.max_lng >= min_lng
+    )
+    return db.and_(Site.id.in_(candidates), exact)
+
+
+def _box_criterion(min_lat, max_lat, lng_ranges):
+    strategy = spatial_strategy()
+    filters = [_box_filter(strategy, min_lat, max_lat, lo, hi) for lo, hi in lng_ranges]
+    return db.or_(*filters) if len(filters) > 1 else filters[0]
+
+
+def _box_query(min_lat, max_lat, lng_ranges):
+    return Site.query.filter(_box_criterion(min_lat, max_lat, lng_ranges))
+
+
+def _bbox_ranges(min_lng, max_lng):
+    # Boxes crossing the antimeridian are split in two
+    if min_lng <= max_lng:
+        return [(min_lng, max_lng)]
+    return [(min_lng, 180.0), (-180.0, max_lng)]
+
+
+def sites_in_bbox(min_lng, min_lat, max_lng, max_lat):
+    """Sites inside a bounding box."""
+    return _box_query(min_lat, max_lat, _bbox_ranges(min_lng, max_lng)).all()
+
+
+def bbox_filter(min_lng, min_lat, max_lng, max_lat):
+    """The sites_in_bbox predicate on its own, for column-level selects (see utils/serializers.py)."""
+    return _box_criterion(min_lat, max_lat, _bbox_ranges(min_lng, max_lng))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _radius_box(lat, lng, radius_km):
+    d_lat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = max(-90.0, lat - d_lat), min(90.0, lat + d_lat)
+
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+
+    d_lng = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    min_lng, max_lng = lng - d_lng, lng + d_lng
+    if min_lng < -180:
+        return min_lat, max_lat, [(min_lng + 360, 180.0), (-180.0, max_lng)]
+    if max_lng > 180:
+        return min_lat, max_lat, [(min_lng, 180.0), (-180.0, max_lng - 360)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+def nearby_sites(lat, lng, radius_km, limit):
+    """Up to `limit` sites within `radius_km`, nearest first, as (site, distance_km) pairs.
+
+    The search box starts small and widens geometrically, so dense areas are
+    answered from a handful of index pages instead of the whole radius.
+    """
+    search_km = min(radius_km, 1.0)
+    while True:
+        min_lat, max_lat, lng_ranges = _radius_box(lat, lng, search_km)
+        candidates = _box_query(min_lat, max_lat, lng_ranges).all()
+
+        matches = []
+        for site in candidates:
+            distance = haversine_km(lat, lng, site.latitude, site.longitude)
+            if distance <= search_km:
+                matches.append((site, distance))
+
+        # Everything within search_km is inside the box, so once enough sites
+        # fall inside the circle the nearest `limit` are final.
+        if len(matches) >= limit or search_km >= radius_km:
+            matches.sort(key=lambda match: (match[1], match[0].id))
+            return matches[:limit]
+
+        search_km = min(radius_km, search_km * 4)
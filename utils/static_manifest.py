@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from flask import request, Response
+from werkzeug.wsgi import wrap_file
+from utils.compression import STATIC_ENCODINGS, DEFAULT_MIMETYPES
+
+# Build tools put a content hash in asset names (main.3f2a9c1e.js, 787.c1d4e2f1.chunk.js, index-BxK2c9aQ.css);
+# a hash mixes digits and letters, a word like asset-manifest.json or logo-horizontal.svg does not
+HASHED_NAME = re.compile(r'[.-](?=[^.]*\d)(?=[^.]*[a-zA-Z])[0-9a-zA-Z_-]{8,}(?:\.chunk)?\.[0-9a-z]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+INDEX = 'index.html'
+
+
+class StaticFile:
+    """One file of the build (or a precompressed sibling) as recorded in the manifest."""
+
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'mimetype', 'data', 'variants')
+
+    def __init__(self, path, size, mtime, etag, mimetype, data):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.mimetype = mimetype
+        self.data = data
+        self.variants = {}
+
+
+class StaticManifest:
+    """In-memory manifest of client_build, built once at startup.
+
+    Requests are answered from the manifest without touching the
+    filesystem for lookups: files up to `memory_max_bytes` (index.html
+    always) are held in memory, larger ones are opened directly. Every file
+    has a strong ETag from its content hash; hashed assets are served with
+    `Cache-Control: immutable` and everything else must revalidate, which
+    costs a 304. With `reload_interval` set the tree is re-scanned at most
+    that often and the manifest rebuilt when anything changed.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.memory_max_bytes = 256 * 1024
+        self.reload_interval = 0
+        self.files = {}
+        self.signature = None
+        self.loaded_at = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.hits = {'200': 0, '304': 0, 'fallback': 0}
+
+    def init_app(self, app):
+        self.directory = app.config.get('CLIENT_BUILD_DIR') or os.path.join(app.root_path, 'client_build')
+        self.memory_max_bytes = app.config.get('STATIC_MEMORY_MAX_BYTES', 256 * 1024)
+        self.reload_interval = app.config.get('STATIC_MANIFEST_RELOAD_SECONDS', 0)
+        self.load()
+
+    # Building
+
+    def _scan(self):
+        """{relative path: (size, mtime)} for every file under the build directory."""
+        entries = {}
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                full = os.path.join(root, name)
+                stat = os.stat(full)
+                entries[os.path.relpath(full, self.directory).replace(os.sep, '/')] = (stat.st_size, stat.st_mtime)
+        return entries
+
+    def _record(self, path, size, mtime, mimetype):
+        full = os.path.join(self.directory, path)
+        digest = hashlib.sha1()
+        data = None
+        with open(full, 'rb') as f:
+            if size <= self.memory_max_bytes or path == INDEX:
+                data = f.read()
+                digest.update(data)
+            else:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        return StaticFile(path, size, mtime, digest.hexdigest()[:32], mimetype, data)
+
+    def load(self):
+        scan = self._scan()
+        files = {}
+        for path, (size, mtime) in scan.items():
+            # Precompressed siblings are attached to the file they compress
+            if any(path.endswith(suffix) and path[:-len(suffix)] in scan for _, suffix in STATIC_ENCODINGS):
+                continue
+            mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            entry = files[path] = self._record(path, size, mtime, mimetype)
+            for encoding, suffix in STATIC_ENCODINGS:
+                if path + suffix in scan:
+                    sibling_size, sibling_mtime = scan[path + suffix]
+                    entry.variants[encoding] = self._record(path + suffix, sibling_size, sibling_mtime, mimetype)
+            if 'gzip' not in entry.variants and entry.data is not None and mimetype in DEFAULT_MIMETYPES:
+                # No sibling from the build: gzip once here (mtime=0 keeps the ETag equal across workers)
+                data = gzip.compress(entry.data, mtime=0)
+                if len(data) < entry.size:
+                    entry.variants['gzip'] = StaticFile(path + '.gz', len(data), mtime,
+                                                        hashlib.sha1(data).hexdigest()[:32], mimetype, data)
+
+        with self._lock:
+            self.files = files
+            self.signature = frozenset(scan.items())
+            self.loaded_at = time.time()
+            self._checked_at = time.monotonic()
+
+    def _maybe_reload(self):
+        if not self.reload_interval or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = time.monotonic()
+        if frozenset(self._scan().items()) != self.signature:
+            self.load()
+
+    # Serving
+
+    def is_immutable(self, path):
+        return path != INDEX and HASHED_NAME.search(path) is not None
+
+    def lookup(self, path):
+        """Manifest entry for a request path; unknown paths fall back to index.html (SPA routes)."""
+        self._maybe_reload()
+        if not path:
+            return self.files.get(INDEX)
+        entry = self.files.get(path)
+        if entry is None:
+            entry = self.files.get(INDEX)
+            if entry is not None:
+                self.hits['fallback'] += 1
+        return entry
+
+    def serve(self, path):
+        """Response for a client_build path, or None when there is no build."""
+        entry = self.lookup(path)
+        if entry is None:
+            return None
+
+        variant, encoding = entry, None
+        for candidate, _ in STATIC_ENCODINGS:
+            if candidate in entry.variants and request.accept_encodings[candidate]:
+                variant, encoding = entry.variants[candidate], candidate
+                break
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(variant.etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and int(entry.mtime) <= since.timestamp()
+
+        if not_modified:
+            response = Response(status=304)
+        elif variant.data is not None:
+            # Passthrough also tells the response compressor to leave it alone
+            response = Response(variant.data, mimetype=entry.mimetype, direct_passthrough=True)
+        else:
+            handle = open(os.path.join(self.directory, variant.path), 'rb')
+            response = Response(wrap_file(request.environ, handle), mimetype=entry.mimetype, direct_passthrough=True)
+            response.content_length = variant.size
+
+        if encoding is not None and not not_modified:
+            response.headers['Content-Encoding'] = encoding
+        if entry.variants:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(variant.etag)
+        response.last_modified = entry.mtime
+        response.cache_control.public = True
+        if self.is_immutable(entry.path):
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+
+        self.hits['304' if not_modified else '200'] += 1
+        return response
+
+    def stats(self):
+        return {
+            'files': len(self.files),
+            'in_memory_bytes': sum(
+                len(f.data) for entry in self.files.values() for f in (entry, *entry.variants.values()) if f.data
+            ),
+            'loaded_at': self.loaded_at,
+            'hits': dict(self.hits)
+        }
+
+
+client_manifest = StaticManifest()
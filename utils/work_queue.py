@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import select, update, union_all, literal, or_, func
+from app import db
+from models import Ticket
+
+# Highest priority first; each gets its own probe of ix_tickets_status_priority_created_at
+PRIORITY_ORDER = ('critical', 'high', 'medium', 'low')
+MAX_CLAIM_ATTEMPTS = 5
+
+
+class ClaimContended(Exception):
+    """Every attempt lost its race to other technicians; pending tickets may remain."""
+
+
+def _claimable(tech_id):
+    return db.and_(
+        Ticket.status == 'pending',
+        or_(Ticket.assigned_tech_id.is_(None), Ticket.assigned_tech_id == tech_id)
+    )
+
+
+def next_candidate_query(tech_id):
+    """One statement returning the best claimable ticket id.
+
+    Each priority is a LIMIT 1 seek on (status, priority, created_at); the
+    outer query only orders the (at most four) heads by priority rank.
+    """
+    heads = []
+    for rank, priority in enumerate(PRIORITY_ORDER):
+        head = select(Ticket.id, Ticket.assigned_tech_id).where(
+            _claimable(tech_id), Ticket.priority == priority
+        ).order_by(Ticket.created_at, Ticket.id).limit(1).subquery()
+        heads.append(select(head.c.id, head.c.assigned_tech_id, literal(rank).label('rank')))
+
+    candidates = union_all(*heads).subquery()
+    return select(candidates.c.id, candidates.c.assigned_tech_id).order_by(candidates.c.rank).limit(1)
+
+
+def claim_next_ticket(tech_id):
+    """Atomically assign the highest-priority, oldest pending ticket to a technician.
+
+    The claim is a conditional UPDATE that re-checks the ticket is still
+    pending and unclaimed, so two concurrent callers can never both win the
+    same row; the loser simply retries with the next candidate.
+    Returns (ticket, previous_assignee), or (None, None) when nothing is
+    claimable; raises ClaimContended after MAX_CLAIM_ATTEMPTS lost races.
+    """
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        candidate = db.session.execute(next_candidate_query(tech_id)).first()
+        if candidate is None:
+            db.session.rollback()
+            return None, None
+        candidate_id, previous_tech_id = candidate
+
+        now = datetime.utcnow()
+        result = db.session.execute(
+            update(Ticket)
+            .where(Ticket.id == candidate_id, _claimable(tech_id))
+            .values(
+                assigned_tech_id=tech_id,
+                status='in-progress',
+                first_response_at=func.coalesce(Ticket.first_response_at, now),
+                updated_at=now
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount == 1:
+            db.session.commit()
+            return db.session.get(Ticket, candidate_id), previous_tech_id
+
+        # Another technician won this row; try the next head
+        db.session.rollback()
+
+    raise ClaimContended()
@@ -0,0 +1,158 @@
+import heapq
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import select, func
+from app import app, db
+from models import Ticket, User
+
+OPEN_STATUSES = ('pending', 'in-progress')
+PRIORITIES = ('low', 'medium', 'high', 'critical')
+
+
+def open_assigned_query(*columns):
+    """`columns` over open tickets that have a technician; callers group by what they need."""
+    return select(Ticket.assigned_tech_id, *columns).where(
+        Ticket.assigned_tech_id.isnot(None),
+        Ticket.status.in_(OPEN_STATUSES)
+    )
+
+
+def workloads_query():
+    return open_assigned_query(
+        Ticket.priority, func.count(Ticket.id), func.min(Ticket.created_at)
+    ).group_by(Ticket.assigned_tech_id, Ticket.priority)
+
+
+def open_counts_query():
+    return open_assigned_query(func.count(Ticket.id)).group_by(Ticket.assigned_tech_id)
+
+
+def technician_workloads():
+    """Open-ticket counts per priority and oldest open ticket per technician, in one grouped query."""
+    rows = db.session.execute(workloads_query()).all()
+
+    workloads = {}
+    for tech_id, priority, count, oldest in rows:
+        load = workloads.setdefault(tech_id, {
+            'open_tickets': 0,
+            'by_priority': {p: 0 for p in PRIORITIES},
+            'oldest_open_at': None
+        })
+        load['open_tickets'] += count
+        load['by_priority'][priority] = load['by_priority'].get(priority, 0) + count
+        if oldest and (load['oldest_open_at'] is None or oldest < load['oldest_open_at']):
+            load['oldest_open_at'] = oldest
+    return workloads
+
+
+def empty_workload():
+    return {'open_tickets': 0, 'by_priority': {p: 0 for p in PRIORITIES}, 'oldest_open_at': None}
+
+
+class TechnicianLoadIndex:
+    """Min-heap of (open tickets, tech id) for picking the least-loaded technician.
+
+    Loads live in a dict; the heap holds (load, tech_id) entries and stale ones
+    are discarded lazily when popped, so assign/release/pick are all O(log n).
+    The whole index is rebuilt from the database every `reconcile_seconds` to
+    absorb changes made by other workers or outside the API.
+    """
+
+    def __init__(self, reconcile_seconds):
+        self.reconcile_seconds = reconcile_seconds
+        self._loads = {}
+        self._heap = []
+        self._reconciled_at = None
+        self._lock = threading.Lock()
+
+    def _push(self, tech_id):
+        heapq.heappush(self._heap, (self._loads[tech_id], tech_id))
+        # Drop superseded entries once they dominate the heap
+        if len(self._heap) > 4 * len(self._loads) + 16:
+            self._heap = [(load, tech) for tech, load in self._loads.items()]
+            heapq.heapify(self._heap)
+
+    def _reconcile_locked(self):
+        technicians = db.session.execute(
+            select(User.id).where(User.role == 'technician', User.status == 'active')
+        ).scalars().all()
+        counts = dict(db.session.execute(open_counts_query()).all())
+
+        self._loads = {tech_id: counts.get(tech_id, 0) for tech_id in technicians}
+        self._heap = [(load, tech_id) for tech_id, load in self._loads.items()]
+        heapq.heapify(self._heap)
+        self._reconciled_at = time.monotonic()
+
+    def _ensure_fresh_locked(self):
+        if self._reconciled_at is None or time.monotonic() - self._reconciled_at >= self.reconcile_seconds:
+            self._reconcile_locked()
+
+    def reconcile(self):
+        with self._lock:
+            self._reconcile_locked()
+
+    def acquire(self):
+        """Reserve one ticket slot on the least-loaded active technician and return their id."""
+        with self._lock:
+            self._ensure_fresh_locked()
+            while self._heap:
+                load, tech_id = self._heap[0]
+                if self._loads.get(tech_id) != load:
+                    heapq.heappop(self._heap)
+                    continue
+                self._loads[tech_id] = load + 1
+                heapq.heapreplace(self._heap, (load + 1, tech_id))
+                return tech_id
+            return None
+
+    def adjust(self, tech_id, delta):
+        if tech_id is None:
+            return
+        with self._lock:
+            if tech_id not in self._loads:
+                return
+            self._loads[tech_id] = max(0, self._loads[tech_id] + delta)
+            self._push(tech_id)
+
+    def assigned(self, tech_id):
+        self.adjust(tech_id, 1)
+
+    def released(self, tech_id):
+        self.adjust(tech_id, -1)
+
+    def reassigned(self, old_tech_id, new_tech_id):
+        if old_tech_id != new_tech_id:
+            self.released(old_tech_id)
+            self.assigned(new_tech_id)
+
+    def invalidate(self):
+        """Force a rebuild on next use, e.g. after technicians are added or deactivated."""
+        with self._lock:
+            self._reconciled_at = None
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._loads)
+
+
+load_index = TechnicianLoadIndex(app.config.get('WORKLOAD_RECONCILE_SECONDS', 60))
+
+
+def track_ticket_change(old_tech_id, old_status, new_tech_id, new_status):
+    """Keep the load index in step with a ticket's assignment/status transition."""
+    was_open = old_tech_id is not None and old_status in OPEN_STATUSES
+    is_open = new_tech_id is not None and new_status in OPEN_STATUSES
+
+    if was_open and is_open:
+        load_index.reassigned(old_tech_id, new_tech_id)
+    elif was_open:
+        load_index.released(old_tech_id)
+    elif is_open:
+        load_index.assigned(new_tech_id)
+
+
+def age_seconds(timestamp, now=None):
+    if timestamp is None:
+        return None
+    return int(((now or datetime.utcnow()) - timestamp).total_seconds())